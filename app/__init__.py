@@ -1,13 +1,14 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
+from app.database import engine_options, init_engine
 import os
 
 db = SQLAlchemy()
 login_manager = LoginManager()
 
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__, 
                 template_folder='../templates',
                 static_folder='../static')
@@ -15,20 +16,113 @@ def create_app():
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///shutthebox.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['DATABASE_POOL_SIZE'] = int(os.environ.get('DATABASE_POOL_SIZE', '10'))
+    app.config['DATABASE_MAX_OVERFLOW'] = int(os.environ.get('DATABASE_MAX_OVERFLOW', '30'))
+    app.config['DATABASE_POOL_TIMEOUT'] = float(os.environ.get('DATABASE_POOL_TIMEOUT', '30'))
+    app.config['DATABASE_POOL_RECYCLE'] = int(os.environ.get('DATABASE_POOL_RECYCLE', '1800'))
+    app.config['DATABASE_POOL_PRE_PING'] = os.environ.get('DATABASE_POOL_PRE_PING', '1') == '1'
+    app.config['SQLITE_JOURNAL_MODE'] = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    app.config['SQLITE_BUSY_TIMEOUT'] = os.environ.get('SQLITE_BUSY_TIMEOUT', '5000')
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    app.config['GAME_STREAM_KEEPALIVE'] = float(os.environ.get('GAME_STREAM_KEEPALIVE', '15'))
+    app.config['GAME_STREAM_LIFETIME'] = float(os.environ.get('GAME_STREAM_LIFETIME', '300'))
+    app.config['GAME_LONG_POLL_TIMEOUT'] = float(os.environ.get('GAME_LONG_POLL_TIMEOUT', '25'))
+    app.config['GAME_WAITERS_MAX'] = int(os.environ.get('GAME_WAITERS_MAX', '16'))
+    app.config['GAME_STATE_STORE'] = os.environ.get('GAME_STATE_STORE', '')
+    app.config['GAME_STATE_TTL'] = float(os.environ.get('GAME_STATE_TTL', '30'))
+    app.config['GAME_WATCH_INTERVAL'] = float(os.environ.get('GAME_WATCH_INTERVAL', '0.25'))
+    app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', '2'))
+    app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', '32'))
+    app.config['SOLVER_TABLE'] = os.environ.get('SOLVER_TABLE', '')
+    app.config['DICE_SECRET'] = os.environ.get('DICE_SECRET', '')
+    app.config['BOT_WORKERS'] = int(os.environ.get('BOT_WORKERS', '2'))
+    app.config['BOT_RECOVERY_INTERVAL'] = float(os.environ.get('BOT_RECOVERY_INTERVAL', '60'))
+    app.config['USER_CACHE_SIZE'] = int(os.environ.get('USER_CACHE_SIZE', '4096'))
+    app.config['USER_CACHE_TTL'] = float(os.environ.get('USER_CACHE_TTL', '300'))
+    app.config['USER_CACHE_SHARED'] = os.environ.get('USER_CACHE_SHARED', '')
+    app.config['GAME_WAITING_TIMEOUT'] = float(os.environ.get('GAME_WAITING_TIMEOUT', '86400'))
+    app.config['GAME_PLAYING_TIMEOUT'] = float(os.environ.get('GAME_PLAYING_TIMEOUT', '21600'))
+    app.config['GAME_ARCHIVE_AFTER'] = float(os.environ.get('GAME_ARCHIVE_AFTER', '3600'))
+    app.config['GAME_REAPER_INTERVAL'] = float(os.environ.get('GAME_REAPER_INTERVAL', '300'))
+    app.config['GAME_REAPER_BATCH'] = int(os.environ.get('GAME_REAPER_BATCH', '500'))
+    app.config['GAME_SNAPSHOT_INTERVAL'] = int(os.environ.get('GAME_SNAPSHOT_INTERVAL', '50'))
+    app.config['STATS_CACHE_SIZE'] = int(os.environ.get('STATS_CACHE_SIZE', '1024'))
+    app.config['STATS_CACHE_TTL'] = float(os.environ.get('STATS_CACHE_TTL', '30'))
+    app.config['TOURNAMENT_TICK'] = float(os.environ.get('TOURNAMENT_TICK', '1'))
+    app.config['TOURNAMENT_ROLL_INTERVAL'] = float(os.environ.get('TOURNAMENT_ROLL_INTERVAL', '20'))
+    app.config['METRICS_DIR'] = os.environ.get('METRICS_DIR', '')
+    app.config['METRICS_FLUSH_INTERVAL'] = float(os.environ.get('METRICS_FLUSH_INTERVAL', '1'))
+    app.config['PROFILE_SLOW_REQUESTS'] = float(os.environ.get('PROFILE_SLOW_REQUESTS', '0'))
+    app.config['PROFILE_INTERVAL'] = float(os.environ.get('PROFILE_INTERVAL', '0.005'))
+    app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', '')
+    app.config['MANIFEST_MAX_AGE'] = int(os.environ.get('MANIFEST_MAX_AGE', '86400'))
+    app.config.update(config or {})
     
     db.init_app(app)
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     
+    from app.store import game_store
+    game_store.init_app(app)
+    
+    from app.watcher import game_watcher
+    game_watcher.init_app(app)
+    
+    from app.users import user_cache
+    user_cache.init_app(app)
+    
+    from app.passwords import password_hasher
+    password_hasher.init_app(app)
+    
+    from app.solver import solver
+    solver.init_app(app)
+    
+    from app.dice import dice_service
+    dice_service.init_app(app)
+    
+    from app.bots import bot_runner
+    bot_runner.init_app(app)
+    
+    from app.metrics import metrics
+    metrics.init_app(app)
+    
+    from app.profiling import profiler
+    profiler.init_app(app)
+    
+    from app.assets import static_assets
+    static_assets.init_app(app)
+    
     from app.routes import main_bp
     from app.auth import auth_bp
     from app.games import games_bp
+    from app.metrics import metrics_bp
+    from app.tournaments import tournaments_bp
     
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(games_bp)
+    app.register_blueprint(tournaments_bp)
+    app.register_blueprint(metrics_bp)
+    
+    from app.history import game_history
+    game_history.init_app(app)
+    
+    from app.stats import player_stats
+    player_stats.init_app(app)
+    
+    from app.reaper import game_reaper
+    game_reaper.init_app(app)
+    
+    from app.tournaments import tournament_scheduler
+    tournament_scheduler.init_app(app)
+    
+    from app import migrations
     
     with app.app_context():
+        init_engine(app, db.engine)
         db.create_all()
+        migrations.upgrade(db)
     
     return app
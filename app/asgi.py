@@ -0,0 +1,243 @@
+import asyncio
+import json
+import logging
+import re
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import parse_qs
+
+from itsdangerous import BadSignature
+
+from app import create_app, db
+from app.events import format_sse, state_delta
+from app.games import load_game_snapshot
+from app.watcher import changed_snapshots
+
+logger = logging.getLogger(__name__)
+
+ROUTE = re.compile(r'^/games/(\d+)/(state|events)$')
+# The sidecar only reads game state; the gunicorn workers run the background services.
+SIDECAR_CONFIG = {'GAME_REAPER_INTERVAL': 0, 'TOURNAMENT_TICK': 0, 'BOT_WORKERS': 0,
+                  'PROFILE_SLOW_REQUESTS': 0}
+DELETED = {'version': None, 'state': {'status': 'deleted'}, 'player_ids': []}
+
+
+class GameWatcher:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.interval = flask_app.config['GAME_WATCH_INTERVAL']
+        self.snapshots = {}
+        self.watchers = {}
+        self._changed = {}
+
+    async def snapshot(self, game_id, user_id):
+        # Only watched games are kept fresh; a cached snapshot may also predate this player joining.
+        snapshot = self.snapshots.get(game_id)
+        if (game_id not in self.watchers or snapshot is None or
+                (snapshot is not DELETED and user_id not in snapshot['player_ids'])):
+            snapshot = await self._run(self._load, game_id)
+            if game_id in self.watchers:
+                self.snapshots[game_id] = snapshot
+        return snapshot
+
+    def watch(self, game_id, snapshot):
+        self.watchers[game_id] = self.watchers.get(game_id, 0) + 1
+        self.snapshots.setdefault(game_id, snapshot)
+
+    def unwatch(self, game_id):
+        self.watchers[game_id] -= 1
+        if not self.watchers[game_id]:
+            del self.watchers[game_id]
+            self.snapshots.pop(game_id, None)
+            self._changed.pop(game_id, None)
+
+    async def wait(self, game_id, since, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            snapshot = self.snapshots.get(game_id, DELETED)
+            remaining = deadline - time.monotonic()
+            if snapshot is DELETED or snapshot['version'] > since or remaining <= 0:
+                return snapshot
+            event = self._changed.setdefault(game_id, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def poll(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            known = {game_id: self.snapshots[game_id]['version']
+                     for game_id in self.watchers if game_id in self.snapshots}
+            if not known:
+                continue
+            try:
+                changed = await self._run(self._refresh, known)
+            except Exception:
+                logger.exception('Refreshing watched games failed')
+                continue
+            for game_id, snapshot in changed.items():
+                if game_id in self.watchers:
+                    self.snapshots[game_id] = snapshot
+                event = self._changed.pop(game_id, None)
+                if event:
+                    event.set()
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    def _load(self, game_id):
+        with self.flask_app.app_context():
+            try:
+                return load_game_snapshot(game_id, refresh=True) or DELETED
+            finally:
+                db.session.remove()
+
+    def _refresh(self, known):
+        with self.flask_app.app_context():
+            try:
+                changed = changed_snapshots(known)
+                return {game_id: snapshot or DELETED for game_id, snapshot in changed.items()}
+            finally:
+                db.session.remove()
+
+
+class GameStateApp:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.watcher = GameWatcher(flask_app)
+        self.serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+        self.cookie_name = flask_app.config['SESSION_COOKIE_NAME']
+        self.max_age = int(flask_app.permanent_session_lifetime.total_seconds())
+        self._poller = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+
+        match = ROUTE.match(scope['path'])
+        if not match or scope['method'] != 'GET':
+            return await send_json(send, 404, {'error': 'Not found'})
+
+        user_id = self.user_id(scope)
+        if user_id is None:
+            return await send_json(send, 401, {'error': 'Not logged in'})
+
+        game_id = int(match.group(1))
+        snapshot = await self.watcher.snapshot(game_id, user_id)
+        if snapshot is DELETED:
+            return await send_json(send, 404, {'error': 'Not found'})
+        if user_id not in snapshot['player_ids']:
+            return await send_json(send, 403, {'error': 'Not in game'})
+
+        self.watcher.watch(game_id, snapshot)
+        try:
+            if match.group(2) == 'state':
+                await self.state(scope, receive, send, game_id, snapshot)
+            else:
+                await self.events(receive, send, game_id, snapshot)
+        finally:
+            self.watcher.unwatch(game_id)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self._poller = asyncio.create_task(self.watcher.poll())
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self._poller.cancel()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def user_id(self, scope):
+        cookies = SimpleCookie()
+        for name, value in scope['headers']:
+            if name == b'cookie':
+                cookies.load(value.decode('latin-1'))
+        morsel = cookies.get(self.cookie_name)
+        if morsel is None:
+            return None
+        try:
+            session = self.serializer.loads(morsel.value, max_age=self.max_age)
+            return int(session['_user_id'])
+        except (BadSignature, KeyError, TypeError, ValueError):
+            return None
+
+    async def state(self, scope, receive, send, game_id, snapshot):
+        since = parse_qs(scope['query_string'].decode()).get('since', [''])[0]
+        if since.lstrip('-').isdigit() and snapshot['version'] <= int(since):
+            snapshot = await until_disconnect(receive, self.watcher.wait(
+                game_id, int(since), self.flask_app.config['GAME_LONG_POLL_TIMEOUT']))
+            if snapshot is None:
+                return
+            if snapshot is DELETED:
+                return await send_json(send, 404, {'error': 'Not found'})
+
+        etag = f'"{game_id}-{snapshot["version"]}"'
+        headers = [(b'etag', etag.encode()), (b'cache-control', b'no-cache')]
+        if (b'if-none-match', etag.encode()) in scope['headers']:
+            await send({'type': 'http.response.start', 'status': 304, 'headers': headers})
+            return await send({'type': 'http.response.body', 'body': b''})
+        await send_json(send, 200, snapshot['state'], headers)
+
+    async def events(self, receive, send, game_id, snapshot):
+        keepalive = self.flask_app.config['GAME_STREAM_KEEPALIVE']
+        deadline = time.monotonic() + self.flask_app.config['GAME_STREAM_LIFETIME']
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+
+        sent = snapshot['state']
+        await send_chunk(send, format_sse(sent, retry=3000))
+        while sent['status'] not in ('finished', 'deleted') and time.monotonic() < deadline:
+            snapshot = await until_disconnect(receive, self.watcher.wait(game_id, snapshot['version'], keepalive))
+            if snapshot is None:
+                return
+            delta = state_delta(sent, snapshot['state'])
+            if delta:
+                sent = dict(sent, **delta)
+                await send_chunk(send, format_sse(delta))
+            else:
+                await send_chunk(send, ': keepalive\n\n')
+        await send({'type': 'http.response.body', 'body': b''})
+
+
+async def until_disconnect(receive, waiting):
+    # send() no longer fails once the client has gone, so a closed page would
+    # otherwise keep its game watched until the wait ends on its own.
+    waiting = asyncio.ensure_future(waiting)
+    disconnect = asyncio.ensure_future(wait_for_disconnect(receive))
+    await asyncio.wait((waiting, disconnect), return_when=asyncio.FIRST_COMPLETED)
+    if waiting.done():
+        disconnect.cancel()
+        return waiting.result()
+    waiting.cancel()
+    return None
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def send_json(send, status, data, headers=()):
+    body = json.dumps(data).encode()
+    await send({'type': 'http.response.start', 'status': status, 'headers': [
+        (b'content-type', b'application/json'),
+        (b'content-length', str(len(body)).encode()),
+        *headers,
+    ]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_chunk(send, text):
+    await send({'type': 'http.response.body', 'body': text.encode(), 'more_body': True})
+
+
+def create_asgi_app(flask_app=None):
+    return GameStateApp(flask_app or create_app(SIDECAR_CONFIG))
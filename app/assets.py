@@ -0,0 +1,153 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+
+import click
+from flask import g, request, send_from_directory, session
+from flask.cli import with_appcontext
+
+BUILD_DIR = 'dist'
+MANIFEST = 'assets.json'
+UNVERSIONED = ('js/sw.js', 'manifest.json')
+COMPRESSIBLE = ('.css', '.js', '.json', '.svg', '.txt')
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+PRECACHE = ('css/style.css', 'icons/icon-32.png', 'icons/icon-192.png', 'icons/icon-512.png')
+
+
+def build(static_folder):
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    output = os.path.join(static_folder, BUILD_DIR)
+    shutil.rmtree(output, ignore_errors=True)
+    manifest, stats = {}, []
+    for root, dirs, files in os.walk(static_folder):
+        if os.path.abspath(root) == os.path.abspath(static_folder):
+            dirs[:] = [d for d in dirs if d != BUILD_DIR]
+        for name in sorted(files):
+            source = os.path.join(root, name)
+            path = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            if path in UNVERSIONED:
+                continue
+
+            with open(source, 'rb') as f:
+                data = f.read()
+            stem, ext = os.path.splitext(path)
+            versioned = f'{BUILD_DIR}/{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+            target = os.path.join(static_folder, versioned)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(data)
+
+            sizes = {'': len(data)}
+            if ext in COMPRESSIBLE:
+                variants = {'.gz': gzip.compress(data, 9, mtime=0)}
+                if brotli is not None:
+                    variants['.br'] = brotli.compress(data, quality=11)
+                for suffix, compressed in variants.items():
+                    if len(compressed) < len(data):
+                        with open(target + suffix, 'wb') as f:
+                            f.write(compressed)
+                        sizes[suffix] = len(compressed)
+            manifest[path] = versioned
+            stats.append((path, sizes))
+
+    with open(os.path.join(output, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return stats
+
+
+class StaticAssets:
+    def __init__(self):
+        self.manifest = {}
+        self.encodings = {}
+        self.version = 'dev'
+        self.static_folder = None
+        self._send_static = None
+
+    def init_app(self, app):
+        self.static_folder = app.static_folder
+        self.load()
+        app.cli.add_command(build_assets_command)
+        app.url_defaults(self._versioned_url)
+        app.before_request(self._note_flashes)
+        app.after_request(self._page_cache_headers)
+        self._send_static = app.view_functions['static']
+        app.view_functions['static'] = self.send_static
+
+    def load(self):
+        path = os.path.join(self.static_folder, BUILD_DIR, MANIFEST)
+        try:
+            with open(path) as f:
+                self.manifest = json.load(f)
+        except FileNotFoundError:
+            self.manifest = {}
+        self.encodings = {
+            filename: [(encoding, suffix) for encoding, suffix in ENCODINGS
+                       if os.path.exists(os.path.join(self.static_folder, filename + suffix))]
+            for filename in self.manifest.values()
+        }
+        digest = hashlib.sha256(json.dumps(self.manifest, sort_keys=True).encode())
+        self.version = digest.hexdigest()[:12] if self.manifest else 'dev'
+
+    def url(self, filename):
+        return self.manifest.get(filename, filename)
+
+    def send_static(self, filename):
+        encodings = self.encodings.get(filename)
+        if encodings is None:
+            return self._send_static(filename=filename)
+
+        mimetype = mimetypes.guess_type(filename)[0]
+        for encoding, suffix in encodings:
+            if request.accept_encodings[encoding]:
+                response = send_from_directory(self.static_folder, filename + suffix, mimetype=mimetype)
+                response.headers['Content-Encoding'] = encoding
+                break
+        else:
+            response = send_from_directory(self.static_folder, filename, mimetype=mimetype)
+        response.vary.add('Accept-Encoding')
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+        return response
+
+    def _versioned_url(self, endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            values['filename'] = self.manifest.get(values['filename'], values['filename'])
+
+    def _note_flashes(self):
+        if request.endpoint != 'static':
+            g.flashes_pending = '_flashes' in session
+
+    def _page_cache_headers(self, response):
+        # The service worker keeps lobby pages to show while it refetches them; a
+        # page carrying flash messages must not be shown a second time.
+        if response.mimetype == 'text/html' and not response.cache_control.no_store:
+            if g.get('flashes_pending') or '_flashes' in session:
+                response.cache_control.no_store = True
+            elif not response.cache_control.max_age:
+                response.cache_control.no_cache = True
+                response.cache_control.private = True
+        return response
+
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets_command():
+    """Fingerprint and precompress the static files into static/dist."""
+    stats = build(static_assets.static_folder)
+    static_assets.load()
+    for path, sizes in stats:
+        compressed = ', '.join(f'{suffix[1:]} {size}' for suffix, size in sizes.items() if suffix)
+        click.echo(f'{static_assets.url(path)}  {sizes[""]} bytes' + (f' ({compressed})' if compressed else ''))
+
+
+static_assets = StaticAssets()
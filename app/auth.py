@@ -2,10 +2,19 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
 from app import db
 from app.models import User
+from app.passwords import PasswordHasherBusy, password_hasher
+from app.stats import player_stats
+from app.users import user_cache
 
 auth_bp = Blueprint('auth', __name__)
 
 
+@auth_bp.errorhandler(PasswordHasherBusy)
+def password_hasher_busy(e):
+    flash('The server is busy, please try again in a moment.', 'error')
+    return redirect(request.url)
+
+
 @auth_bp.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
@@ -22,6 +31,9 @@ def login():
         user = User.query.filter_by(username=username).first()
         
         if user and user.check_password(password):
+            if password_hasher.needs_rehash(user.password_hash):
+                user.set_password(password)
+                db.session.commit()
             login_user(user)
             next_page = request.args.get('next')
             return redirect(next_page if next_page else url_for('main.index'))
@@ -76,6 +88,9 @@ def signup():
 @auth_bp.route('/profile', methods=['GET', 'POST'])
 @login_required
 def profile():
+    user = db.session.get(User, current_user.id)
+    stats = player_stats.profile(user.id)
+    
     if request.method == 'POST':
         current_password = request.form.get('current_password', '')
         new_password = request.form.get('new_password', '')
@@ -83,26 +98,27 @@ def profile():
         
         if not current_password or not new_password:
             flash('Please fill in all password fields.', 'error')
-            return render_template('profile.html')
+            return render_template('profile.html', stats=stats)
         
-        if not current_user.check_password(current_password):
+        if not user.check_password(current_password):
             flash('Current password is incorrect.', 'error')
-            return render_template('profile.html')
+            return render_template('profile.html', stats=stats)
         
         if len(new_password) < 4:
             flash('New password must be at least 4 characters long.', 'error')
-            return render_template('profile.html')
+            return render_template('profile.html', stats=stats)
         
         if new_password != confirm_password:
             flash('New passwords do not match.', 'error')
-            return render_template('profile.html')
+            return render_template('profile.html', stats=stats)
         
-        current_user.set_password(new_password)
+        user.set_password(new_password)
         db.session.commit()
+        user_cache.discard(user.id)
         flash('Password changed successfully!', 'success')
         return redirect(url_for('auth.profile'))
     
-    return render_template('profile.html')
+    return render_template('profile.html', stats=stats)
 
 
 @auth_bp.route('/logout')
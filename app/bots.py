@@ -0,0 +1,175 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from werkzeug.exceptions import HTTPException
+
+from app import db, rules
+from app.dice import dice_service
+from app.solver import solver
+
+logger = logging.getLogger(__name__)
+
+BOT_RETRIES = 4
+BOT_BACKOFF = 0.5
+RECOVERY_BATCH = 500
+RECOVERY_DELAY = 5
+
+
+class Idle(Exception):
+    pass
+
+
+def has_work(game, players):
+    if game.status != 'playing':
+        return False
+
+    bots = [p for p in players if p.user.is_bot]
+    if game.round_phase == 'flipping':
+        return any(not p.is_out and not p.has_submitted for p in bots)
+    if game.round_phase in ('rolling', 'round_end'):
+        return game.tournament_id is None and any(p.user_id == game.created_by for p in bots)
+    return False
+
+
+def act(game, players):
+    if not has_work(game, players):
+        raise Idle()
+
+    if game.round_phase == 'rolling':
+        counter, dice = dice_service.game_roll(game)
+        rules.roll(game, players, *dice, counter=counter)
+        return
+
+    if game.round_phase == 'round_end':
+        rules.next_round(game, players)
+        return
+
+    total = game.dice1 + game.dice2
+    for player in players:
+        if game.round_phase != 'flipping':
+            break
+        if not player.user.is_bot or player.is_out or player.has_submitted:
+            continue
+        hint = solver.hint(player.tiles_mask, total)
+        if hint:
+            rules.flip_mask(game, players, player, hint[0])
+        else:
+            rules.pass_turn(game, players, player)
+
+
+def find_bot_user(exclude_ids):
+    from app.models import User
+
+    bot = User.query.filter(User.is_bot, User.id.notin_(exclude_ids)).order_by(User.id).first()
+    if bot is not None:
+        return bot
+
+    # Another request may take the same name between the check and the insert;
+    # the savepoint lets this one move on to the next name instead of failing.
+    number = User.query.filter(User.is_bot).count() + 1
+    while True:
+        if User.query.filter_by(username=f'Bot {number}').first():
+            number += 1
+            continue
+        bot = User(username=f'Bot {number}', password_hash='!', is_bot=True)
+        try:
+            with db.session.begin_nested():
+                db.session.add(bot)
+        except IntegrityError:
+            number += 1
+            continue
+        return bot
+
+
+def pending_games(cutoff):
+    from app.models import Game, GamePlayer, User
+
+    # Queued moves live only in memory, so games left waiting on a bot are found again here.
+    games = (Game.query.options(joinedload(Game.players).joinedload(GamePlayer.user))
+             .filter(Game.status == 'playing', Game.updated_at < cutoff,
+                     Game.players.any(GamePlayer.user.has(User.is_bot)))
+             .order_by(Game.updated_at).limit(RECOVERY_BATCH).all())
+    return [game.id for game in games if has_work(game, game.players)]
+
+
+class BotRunner:
+    def __init__(self):
+        self.app = None
+        self.executor = None
+        self._lock = threading.Lock()
+        self._scheduled = set()
+        self._stop = None
+
+    def init_app(self, app):
+        if self.executor:
+            self.executor.shutdown(wait=False)
+        if self._stop:
+            self._stop.set()
+        self.app = app
+        workers = app.config.get('BOT_WORKERS', 0)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bots') if workers > 0 else None
+
+        interval = app.config.get('BOT_RECOVERY_INTERVAL', 0)
+        if self.executor and interval > 0:
+            self._stop = threading.Event()
+            threading.Thread(target=self._recover, args=(app, self._stop, interval),
+                             name='bot-recovery', daemon=True).start()
+        else:
+            self._stop = None
+
+    def schedule(self, game_id, attempt=0):
+        if not self.executor:
+            return
+        with self._lock:
+            if game_id in self._scheduled:
+                return
+            self._scheduled.add(game_id)
+        self.executor.submit(self._run, game_id, attempt)
+
+    def _run(self, game_id, attempt):
+        from app.games import GameActionError, GameConflictError, run_game_action
+
+        with self._lock:
+            self._scheduled.discard(game_id)
+        with self.app.app_context():
+            try:
+                run_game_action(game_id, act)
+            except GameConflictError:
+                if attempt + 1 < BOT_RETRIES:
+                    timer = threading.Timer(BOT_BACKOFF * 2 ** attempt, self.schedule, (game_id, attempt + 1))
+                    timer.daemon = True
+                    timer.start()
+                else:
+                    logger.warning('Giving up on bot move in game %s after %d conflicts', game_id, BOT_RETRIES)
+            except GameActionError as e:
+                logger.warning('Bot move rejected in game %s: %s', game_id, e)
+            except (Idle, HTTPException):
+                pass
+            except Exception:
+                db.session.rollback()
+                logger.exception('Bot move failed in game %s', game_id)
+            finally:
+                db.session.remove()
+
+    def _recover(self, app, stop, interval):
+        # The first sweep runs once the app has started and takes every waiting game;
+        # later ones only take games that nobody has touched for a whole interval.
+        delay, age = RECOVERY_DELAY, 0
+        while not stop.wait(delay):
+            with app.app_context():
+                try:
+                    for game_id in pending_games(datetime.utcnow() - timedelta(seconds=age)):
+                        self.schedule(game_id)
+                except Exception:
+                    db.session.rollback()
+                    logger.exception('Recovering bot moves failed')
+                finally:
+                    db.session.remove()
+            delay = age = interval
+
+
+bot_runner = BotRunner()
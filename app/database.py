@@ -0,0 +1,37 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def engine_options(config):
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return {}
+
+    options = {
+        'pool_size': config['DATABASE_POOL_SIZE'],
+        'max_overflow': config['DATABASE_MAX_OVERFLOW'],
+        'pool_timeout': config['DATABASE_POOL_TIMEOUT'],
+    }
+    if url.get_backend_name() != 'sqlite':
+        options['pool_recycle'] = config['DATABASE_POOL_RECYCLE']
+        options['pool_pre_ping'] = config['DATABASE_POOL_PRE_PING']
+    return options
+
+
+def init_engine(app, engine):
+    if engine.dialect.name != 'sqlite':
+        return
+
+    pragmas = [
+        ('journal_mode', app.config['SQLITE_JOURNAL_MODE']),
+        ('synchronous', app.config['SQLITE_SYNCHRONOUS']),
+        ('busy_timeout', app.config['SQLITE_BUSY_TIMEOUT']),
+    ]
+    pragmas = [(name, value) for name, value in pragmas if value not in ('', None)]
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
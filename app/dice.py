@@ -0,0 +1,168 @@
+import functools
+import hashlib
+import hmac
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import select
+
+from app import db
+from app.models import ArchivedGame, Game, GameMove, Tournament
+
+MASK = (1 << 64) - 1
+GAMMA = 0x9E3779B97F4A7C15
+MIX1 = 0xBF58476D1CE4E5B9
+MIX2 = 0x94D049BB133111EB
+BATCH_SIZE = 4096
+KEY_CACHE_SIZE = 4096
+FACES = [(value // 6 + 1, value % 6 + 1) for value in range(36)]
+
+
+def roll(key, counter):
+    # Counter-based: roll n of a stream depends only on its key and n, so any roll
+    # can be recomputed on its own, in any order and from any thread.
+    z = (key + counter * GAMMA) & MASK
+    z = ((z ^ (z >> 30)) * MIX1) & MASK
+    z = ((z ^ (z >> 27)) * MIX2) & MASK
+    return FACES[(z ^ (z >> 31)) % 36]
+
+
+def roll_values(key, start, count):
+    import numpy as np
+
+    z = np.uint64(key) + np.arange(start, start + count, dtype=np.uint64) * np.uint64(GAMMA)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(MIX1)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(MIX2)
+    return ((z ^ (z >> np.uint64(31))) % np.uint64(36)).astype(np.int8)
+
+
+def roll_batch(key, start, count):
+    import numpy as np
+
+    values = roll_values(key, start, count)
+    return np.stack([values // 6 + 1, values % 6 + 1], axis=1)
+
+
+@functools.lru_cache(maxsize=KEY_CACHE_SIZE)
+def stream_key(secret, stream):
+    return int.from_bytes(hmac.new(secret, stream.encode(), hashlib.sha256).digest()[:8], 'big')
+
+
+class DiceStream:
+    def __init__(self, key, start=0, batch=BATCH_SIZE):
+        self.key = key & MASK
+        self.counter = start
+        self.batch = batch
+        self._rolls = iter(())
+        self._buffer = None
+        self._used = 0
+
+    def __call__(self):
+        try:
+            return next(self._rolls)
+        except StopIteration:
+            self._rolls = iter(self._fill())
+            return next(self._rolls)
+
+    def take(self, count):
+        if self._buffer is None or self._used + count > len(self._buffer):
+            size = max(self.batch, count)
+            self._buffer = roll_batch(self.key, self.counter, size)
+            self.counter += size
+            self._used = 0
+        rolls = self._buffer[self._used:self._used + count]
+        self._used += count
+        return rolls
+
+    def _fill(self):
+        start, self.counter = self.counter, self.counter + self.batch
+        try:
+            return map(FACES.__getitem__, roll_values(self.key, start, self.batch).tolist())
+        except ImportError:
+            return [roll(self.key, n) for n in range(start, start + self.batch)]
+
+
+class DiceService:
+    def __init__(self):
+        self.secret = b''
+
+    def init_app(self, app):
+        self.secret = (app.config.get('DICE_SECRET') or app.config['SECRET_KEY']).encode()
+        app.cli.add_command(verify_dice_command)
+
+    def key(self, stream):
+        # A live game rolls from the same few streams over and over; the HMAC is
+        # the dearest part of a roll, so keys are kept per secret and stream.
+        return stream_key(self.secret, stream)
+
+    def roll(self, stream, counter):
+        return roll(self.key(stream), counter)
+
+    def game_roll(self, game):
+        # A roll is numbered by the move it is logged as; the number is also
+        # stored with the move so it can be checked exactly.
+        seq = game.move_count + len(game.move_log or ()) + 1
+        return seq, self.roll(f'game:{game.id}', seq)
+
+    def tournament_roll(self, tournament_id, roll_count):
+        return self.roll(f'tournament:{tournament_id}', roll_count)
+
+    def stream(self, game_id):
+        game = db.session.get(Game, game_id)
+        if game is None or game.tournament_id is None:
+            finished = (game.status == 'finished' if game is not None
+                        else db.session.get(ArchivedGame, game_id) is not None)
+            return f'game:{game_id}', finished, None
+
+        tournament = db.session.get(Tournament, game.tournament_id)
+        return f'tournament:{tournament.id}', tournament.status == 'finished', tournament.roll_count
+
+    def verify(self, game_id):
+        rolls = db.session.execute(
+            select(GameMove.seq, GameMove.dice1, GameMove.dice2, GameMove.dice_counter)
+            .where(GameMove.game_id == game_id, GameMove.kind == 'roll')
+            .order_by(GameMove.seq)
+        ).all()
+        stream, _, last = self.stream(game_id)
+        key = self.key(stream)
+
+        # A game's own rolls are numbered by their move. A tournament table skips
+        # the rolls made while it was still flipping, so its counters only have to
+        # rise, and stay within the rolls the tournament has made.
+        previous, mismatched = 0, []
+        for row in rolls:
+            counter = row.dice_counter
+            if last is None:
+                valid = counter in (None, row.seq)
+                counter = row.seq
+            else:
+                valid = counter is not None and previous < counter <= last
+            if not valid or roll(key, counter) != (row.dice1, row.dice2):
+                mismatched.append(row.seq)
+            else:
+                previous = counter
+        return stream, mismatched, len(rolls)
+
+
+@click.command('verify-dice')
+@click.argument('game_id', type=int)
+@click.option('--show-key', is_flag=True, help='Print the stream key so others can check the rolls.')
+@with_appcontext
+def verify_dice_command(game_id, show_key):
+    """Check a game's logged rolls against its dice stream."""
+    stream, mismatched, count = dice_service.verify(game_id)
+    if not count:
+        raise click.ClickException(f'Game {game_id} has no recorded rolls.')
+
+    if show_key:
+        # The key gives away every roll still to come in the stream.
+        if not dice_service.stream(game_id)[1]:
+            raise click.ClickException(f'The {stream} stream is still rolling; its key is only shown once it has finished.')
+        click.echo(f'stream {stream} key {dice_service.key(stream):016x}')
+    if mismatched:
+        raise click.ClickException(f'{len(mismatched)} of {count} rolls do not match, at moves '
+                                   + ', '.join(map(str, mismatched)))
+    click.echo(f'all {count} rolls match the {stream} stream')
+
+
+dice_service = DiceService()
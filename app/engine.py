@@ -0,0 +1,62 @@
+MAX_TILES = 12
+MIN_TOTAL = 2
+MAX_TOTAL = 12
+MASK_COUNT = 1 << MAX_TILES
+
+
+def tile_bit(tile):
+    return 1 << (tile - 1)
+
+
+def full_mask(max_tiles):
+    return (1 << max_tiles) - 1
+
+
+def tiles_to_mask(tiles):
+    mask = 0
+    for tile in tiles:
+        mask |= tile_bit(tile)
+    return mask
+
+
+def _build_tables():
+    tiles = [tuple(t + 1 for t in range(MAX_TILES) if mask >> t & 1) for mask in range(MASK_COUNT)]
+    sums = [sum(t) for t in tiles]
+    flips = [mask for mask in range(1, MASK_COUNT) if MIN_TOTAL <= sums[mask] <= MAX_TOTAL]
+
+    moves = []
+    reachable = []
+    for mask in range(MASK_COUNT):
+        by_total = {}
+        bits = 0
+        for flip in flips:
+            if flip & mask == flip:
+                total = sums[flip]
+                by_total.setdefault(total, []).append(flip)
+                bits |= 1 << total
+        moves.append({total: tuple(f) for total, f in by_total.items()})
+        reachable.append(bits)
+    return tuple(tiles), tuple(sums), tuple(reachable), tuple(moves)
+
+
+TILES, SUMS, REACHABLE, MOVES = _build_tables()
+
+
+def mask_to_tiles(mask):
+    return TILES[mask]
+
+
+def mask_sum(mask):
+    return SUMS[mask]
+
+
+def can_make(mask, total):
+    return bool(REACHABLE[mask] >> total & 1)
+
+
+def legal_flips(mask, total):
+    return MOVES[mask].get(total, ())
+
+
+def is_valid_flip(mask, flip, total):
+    return flip != 0 and flip & mask == flip and SUMS[flip] == total
@@ -0,0 +1,62 @@
+import json
+import threading
+import time
+
+
+class GameEvents:
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._latest = {}
+
+    def publish(self, game_id, state):
+        with self._condition:
+            seq = self._latest.get(game_id, (0, None))[0] + 1
+            self._latest[game_id] = (seq, state)
+            self._condition.notify_all()
+        return seq
+
+    def publish_newer(self, game_id, state):
+        # A state reloaded from the database must not replace a newer one published meanwhile.
+        with self._condition:
+            current = self._latest.get(game_id, (0, None))[1]
+            if (current and state.get('version') is not None and
+                    current.get('version', -1) >= state['version']):
+                return None
+            return self.publish(game_id, state)
+
+    def discard(self, game_id):
+        with self._condition:
+            self._latest.pop(game_id, None)
+
+    def latest(self, game_id):
+        with self._condition:
+            return self._latest.get(game_id, (0, None))
+
+    def wait(self, game_id, seq, timeout):
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                current = self._latest.get(game_id, (0, None))
+                if current[0] != seq:
+                    return current
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+
+
+game_events = GameEvents()
+
+
+def state_delta(previous, current):
+    return {key: value for key, value in current.items() if previous.get(key) != value}
+
+
+def format_sse(data, event=None, retry=None):
+    lines = []
+    if retry is not None:
+        lines.append(f'retry: {retry}')
+    if event:
+        lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
@@ -1,21 +1,73 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
+from flask import (Blueprint, render_template, redirect, url_for, flash, request, jsonify,
+                   Response, abort, current_app, stream_with_context)
 from flask_login import login_required, current_user
-from app import db
-from app.models import Game, GamePlayer
+from sqlalchemy import inspect, tuple_
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.exc import StaleDataError
+from app import bots, db, engine, rules
+from app.bots import bot_runner
+from app.dice import dice_service
+from app.events import game_events, state_delta, format_sse
+from app.history import game_history
+from app.metrics import labels, metrics
+from app.solver import solver
+from app.stats import player_stats
+from app.store import game_store
+from app.tournaments import record_standings
+from app.watcher import game_watcher
+from app.models import ArchivedGame, ArchivedGamePlayer, Game, GamePlayer
+from datetime import datetime
 import random
+import time
 
 games_bp = Blueprint('games', __name__)
 
+GAME_ACTION_RETRIES = 12
+GAME_ACTION_BACKOFF = 0.01
+LOBBY_PAGE_SIZE = 20
+
 
 @games_bp.route('/games')
 @login_required
 def list_games():
-    available_games = Game.query.filter_by(status='waiting').order_by(Game.created_at.desc()).all()
-    my_games = Game.query.join(GamePlayer).filter(
+    available_games, available_next = paginate_games(
+        Game.query.options(joinedload(Game.creator)).filter(Game.status == 'waiting'),
+        request.args.get('before')
+    )
+    my_games, my_next = paginate_games(
+        Game.query.join(GamePlayer).filter(
+            GamePlayer.user_id == current_user.id,
+            Game.status.in_(['waiting', 'playing'])
+        ),
+        request.args.get('mine_before')
+    )
+    
+    game_ids = [game.id for game in available_games]
+    joined_ids = {game_id for (game_id,) in db.session.query(GamePlayer.game_id).filter(
         GamePlayer.user_id == current_user.id,
-        Game.status.in_(['waiting', 'playing'])
-    ).order_by(Game.created_at.desc()).all()
-    return render_template('games/list.html', available_games=available_games, my_games=my_games)
+        GamePlayer.game_id.in_(game_ids)
+    )} if game_ids else set()
+    
+    return render_template('games/list.html', available_games=available_games, my_games=my_games,
+                          joined_ids=joined_ids, available_next=available_next, my_next=my_next)
+
+
+def paginate_games(query, cursor):
+    if cursor:
+        try:
+            created_at, game_id = cursor.split('~')
+            created_at = datetime.fromisoformat(created_at)
+            game_id = int(game_id)
+        except ValueError:
+            abort(400)
+        query = query.filter(tuple_(Game.created_at, Game.id) < (created_at, game_id))
+    
+    games = query.order_by(Game.created_at.desc(), Game.id.desc()).limit(LOBBY_PAGE_SIZE + 1).all()
+    if len(games) <= LOBBY_PAGE_SIZE:
+        return games, None
+    
+    games = games[:LOBBY_PAGE_SIZE]
+    return games, f'{games[-1].created_at.isoformat()}~{games[-1].id}'
 
 
 @games_bp.route('/games/create', methods=['GET', 'POST'])
@@ -54,18 +106,14 @@ def create_game():
             max_tiles=max_tiles,
             max_players=max_players,
             created_by=current_user.id,
-            status='waiting'
+            status='waiting',
+            player_count=1
         )
-        db.session.add(game)
-        db.session.commit()
-        
-        tiles = ','.join(str(i) for i in range(1, max_tiles + 1))
-        player = GamePlayer(
-            game_id=game.id,
+        game.players.append(GamePlayer(
             user_id=current_user.id,
-            tiles_remaining=tiles
-        )
-        db.session.add(player)
+            tiles_mask=engine.full_mask(max_tiles)
+        ))
+        db.session.add(game)
         db.session.commit()
         
         flash(f'Game "{name}" created successfully!', 'success')
@@ -77,8 +125,10 @@ def create_game():
 @games_bp.route('/games/<int:game_id>')
 @login_required
 def view_game(game_id):
-    game = Game.query.get_or_404(game_id)
-    current_player = GamePlayer.query.filter_by(game_id=game_id, user_id=current_user.id).first()
+    game = find_game(game_id)
+    if game is None:
+        return archived_results(game_id)
+    current_player = get_player(game, current_user.id)
     
     if game.status == 'playing' and current_player:
         return redirect(url_for('games.play_game', game_id=game_id))
@@ -86,110 +136,104 @@ def view_game(game_id):
     if game.status == 'finished':
         return redirect(url_for('games.game_results', game_id=game_id))
     
-    players = GamePlayer.query.filter_by(game_id=game_id).all()
     is_creator = game.created_by == current_user.id
-    return render_template('games/view.html', game=game, players=players, 
+    return render_template('games/view.html', game=game, players=game.players, 
                           current_player=current_player, is_creator=is_creator)
 
 
 @games_bp.route('/games/<int:game_id>/join', methods=['POST'])
 @login_required
 def join_game(game_id):
-    game = Game.query.get_or_404(game_id)
-    
-    if game.status != 'waiting':
-        flash('This game has already started.', 'error')
-        return redirect(url_for('games.list_games'))
-    
-    existing_player = GamePlayer.query.filter_by(game_id=game_id, user_id=current_user.id).first()
-    if existing_player:
-        flash('You have already joined this game.', 'info')
-        return redirect(url_for('games.view_game', game_id=game_id))
-    
-    player_count = GamePlayer.query.filter_by(game_id=game_id).count()
-    if player_count >= game.max_players:
-        flash('This game is full.', 'error')
-        return redirect(url_for('games.list_games'))
+    def join(game, players):
+        if game.status != 'waiting':
+            raise GameActionError('This game has already started.', url_for('games.list_games'))
+        
+        if get_player(game, current_user.id):
+            raise GameActionError('You have already joined this game.',
+                                  url_for('games.view_game', game_id=game_id))
+        
+        if game.player_count >= game.max_players:
+            raise GameActionError('This game is full.', url_for('games.list_games'))
+        
+        players.append(GamePlayer(
+            user_id=current_user.id,
+            tiles_mask=engine.full_mask(game.max_tiles)
+        ))
+        game.player_count += 1
+        return f'You have joined "{game.name}"!', 'success'
     
-    tiles = ','.join(str(i) for i in range(1, game.max_tiles + 1))
-    player = GamePlayer(
-        game_id=game_id,
-        user_id=current_user.id,
-        tiles_remaining=tiles
-    )
-    db.session.add(player)
-    db.session.commit()
+    return game_action_response(game_id, join, url_for('games.view_game', game_id=game_id))
+
+
+@games_bp.route('/games/<int:game_id>/bots', methods=['POST'])
+@login_required
+def add_bot(game_id):
+    def add(game, players):
+        view_url = url_for('games.view_game', game_id=game_id)
+        
+        if game.created_by != current_user.id:
+            raise GameActionError('Only the host can add bots.', view_url)
+        
+        if game.status != 'waiting':
+            raise GameActionError('This game has already started.', view_url)
+        
+        if game.player_count >= game.max_players:
+            raise GameActionError('This game is full.', view_url)
+        
+        bot = bots.find_bot_user([p.user_id for p in players])
+        players.append(GamePlayer(user=bot, tiles_mask=engine.full_mask(game.max_tiles)))
+        game.player_count += 1
+        return f'{bot.username} joined the game.', 'success'
     
-    flash(f'You have joined "{game.name}"!', 'success')
-    return redirect(url_for('games.view_game', game_id=game_id))
+    return game_action_response(game_id, add, url_for('games.view_game', game_id=game_id))
 
 
 @games_bp.route('/games/<int:game_id>/leave', methods=['POST'])
 @login_required
 def leave_game(game_id):
-    game = Game.query.get_or_404(game_id)
-    
-    if game.status != 'waiting':
-        flash('Cannot leave a game that has already started.', 'error')
-        return redirect(url_for('games.view_game', game_id=game_id))
-    
-    player = GamePlayer.query.filter_by(game_id=game_id, user_id=current_user.id).first()
-    if not player:
-        flash('You are not in this game.', 'error')
-        return redirect(url_for('games.list_games'))
-    
-    if game.created_by == current_user.id:
-        GamePlayer.query.filter_by(game_id=game_id).delete()
-        db.session.delete(game)
-        db.session.commit()
-        flash('Game has been deleted.', 'info')
-        return redirect(url_for('games.list_games'))
+    def leave(game, players):
+        if game.status != 'waiting':
+            raise GameActionError('Cannot leave a game that has already started.',
+                                  url_for('games.view_game', game_id=game_id))
+        
+        player = find_player(players, current_user.id)
+        
+        if game.created_by == current_user.id:
+            db.session.delete(game)
+            return 'Game has been deleted.', 'info'
+        
+        players.remove(player)
+        game.player_count -= 1
+        return 'You have left the game.', 'info'
     
-    db.session.delete(player)
-    db.session.commit()
-    flash('You have left the game.', 'info')
-    return redirect(url_for('games.list_games'))
+    return game_action_response(game_id, leave, url_for('games.list_games'))
 
 
 @games_bp.route('/games/<int:game_id>/start', methods=['POST'])
 @login_required
 def start_game(game_id):
-    game = Game.query.get_or_404(game_id)
-    
-    if game.created_by != current_user.id:
-        flash('Only the host can start the game.', 'error')
-        return redirect(url_for('games.view_game', game_id=game_id))
-    
-    if game.status != 'waiting':
-        flash('Game has already started.', 'error')
-        return redirect(url_for('games.view_game', game_id=game_id))
-    
-    player_count = GamePlayer.query.filter_by(game_id=game_id).count()
-    if player_count < 1:
-        flash('Need at least 1 player to start.', 'error')
-        return redirect(url_for('games.view_game', game_id=game_id))
-    
-    game.status = 'playing'
-    game.current_round = 1
-    game.round_phase = 'rolling'
-    
-    for player in game.players:
-        tiles = ','.join(str(i) for i in range(1, game.max_tiles + 1))
-        player.tiles_remaining = tiles
-        player.is_out = False
-        player.has_submitted = False
-        player.round_score = 0
+    def start(game, players):
+        if game.created_by != current_user.id:
+            raise GameActionError('Only the host can start the game.',
+                                  url_for('games.view_game', game_id=game_id))
+        
+        try:
+            rules.start(game, players)
+        except rules.RuleError as e:
+            raise GameActionError(str(e), url_for('games.view_game', game_id=game_id))
+        
+        return 'Game started! Roll the dice to begin.', 'success'
     
-    db.session.commit()
-    flash('Game started! Roll the dice to begin.', 'success')
-    return redirect(url_for('games.play_game', game_id=game_id))
+    return game_action_response(game_id, start)
 
 
 @games_bp.route('/games/<int:game_id>/play')
 @login_required
 def play_game(game_id):
-    game = Game.query.get_or_404(game_id)
-    current_player = GamePlayer.query.filter_by(game_id=game_id, user_id=current_user.id).first()
+    game = find_game(game_id)
+    if game is None:
+        return archived_results(game_id)
+    current_player = get_player(game, current_user.id)
     
     if not current_player:
         flash('You are not in this game.', 'error')
@@ -201,257 +245,437 @@ def play_game(game_id):
     if game.status == 'finished':
         return redirect(url_for('games.game_results', game_id=game_id))
     
-    players = GamePlayer.query.filter_by(game_id=game_id).all()
-    is_creator = game.created_by == current_user.id
+    return render_template('games/play.html', **play_context(game, current_player))
+
+
+@games_bp.route('/games/<int:game_id>/play/board')
+@login_required
+def play_board(game_id):
+    game = load_game(game_id)
+    current_player = get_player(game, current_user.id)
     
-    can_flip = (game.round_phase == 'flipping' and 
-                not current_player.is_out and 
-                not current_player.has_submitted and
-                current_player.can_make_move(game.get_dice_total()))
+    if not current_player or game.status != 'playing':
+        return '', 204
     
-    must_pass = (game.round_phase == 'flipping' and 
-                 not current_player.is_out and 
-                 not current_player.has_submitted and
-                 not current_player.can_make_move(game.get_dice_total()))
+    return render_template('games/_play_board.html', **play_context(game, current_player))
+
+
+def play_context(game, current_player):
+    can_move = (game.round_phase == 'flipping' and
+                not current_player.is_out and
+                not current_player.has_submitted)
+    has_move = can_move and current_player.can_make_move(game.get_dice_total())
     
-    return render_template('games/play.html', game=game, players=players,
-                          current_player=current_player, is_creator=is_creator,
-                          can_flip=can_flip, must_pass=must_pass)
+    return {
+        'game': game,
+        'players': game.players,
+        'current_player': current_player,
+        'is_creator': game.created_by == current_user.id and game.tournament_id is None,
+        'can_flip': has_move,
+        'must_pass': can_move and not has_move
+    }
 
 
 @games_bp.route('/games/<int:game_id>/roll', methods=['POST'])
 @login_required
 def roll_dice(game_id):
-    game = Game.query.get_or_404(game_id)
-    
-    if game.status != 'playing':
-        flash('Game is not in progress.', 'error')
-        return redirect(url_for('games.view_game', game_id=game_id))
-    
-    if game.round_phase != 'rolling':
-        flash('Not time to roll dice.', 'error')
-        return redirect(url_for('games.play_game', game_id=game_id))
-    
-    if game.created_by != current_user.id:
-        flash('Only the host can roll the dice.', 'error')
-        return redirect(url_for('games.play_game', game_id=game_id))
-    
-    game.dice1 = random.randint(1, 6)
-    game.dice2 = random.randint(1, 6)
-    game.round_phase = 'flipping'
-    
-    for player in game.players:
-        if not player.is_out:
-            player.has_submitted = False
+    def roll(game, players):
+        if game.tournament_id is not None:
+            raise GameActionError('The tournament rolls the dice for every table.')
+        
+        if game.created_by != current_user.id:
+            raise GameActionError('Only the host can roll the dice.')
+        
+        counter, dice = dice_service.game_roll(game)
+        rules.roll(game, players, *dice, counter=counter)
+        return f'Rolled {game.dice1} + {game.dice2} = {game.get_dice_total()}!', 'info'
     
-    db.session.commit()
-    flash(f'Rolled {game.dice1} + {game.dice2} = {game.get_dice_total()}!', 'info')
-    return redirect(url_for('games.play_game', game_id=game_id))
+    return game_action_response(game_id, roll)
 
 
 @games_bp.route('/games/<int:game_id>/flip', methods=['POST'])
 @login_required
 def flip_tiles(game_id):
-    game = Game.query.get_or_404(game_id)
-    current_player = GamePlayer.query.filter_by(game_id=game_id, user_id=current_user.id).first()
-    
-    if not current_player:
-        flash('You are not in this game.', 'error')
-        return redirect(url_for('games.list_games'))
-    
-    if game.status != 'playing' or game.round_phase != 'flipping':
-        flash('Cannot flip tiles now.', 'error')
-        return redirect(url_for('games.play_game', game_id=game_id))
-    
-    if current_player.is_out or current_player.has_submitted:
-        flash('You have already submitted this turn.', 'error')
-        return redirect(url_for('games.play_game', game_id=game_id))
-    
     tiles_str = request.form.get('tiles', '')
-    if not tiles_str:
-        flash('Please select tiles to flip.', 'error')
-        return redirect(url_for('games.play_game', game_id=game_id))
     
-    try:
-        tiles_to_flip = [int(t) for t in tiles_str.split(',')]
-    except ValueError:
-        flash('Invalid tile selection.', 'error')
-        return redirect(url_for('games.play_game', game_id=game_id))
-    
-    dice_total = game.get_dice_total()
-    
-    if not current_player.is_valid_flip(tiles_to_flip, dice_total):
-        flash(f'Invalid flip. Tiles must sum to {dice_total} and be available.', 'error')
-        return redirect(url_for('games.play_game', game_id=game_id))
-    
-    current_tiles = current_player.get_tiles_list()
-    new_tiles = [t for t in current_tiles if t not in tiles_to_flip]
-    current_player.set_tiles_list(new_tiles)
-    current_player.has_submitted = True
-    
-    if not new_tiles:
-        current_player.round_score = 0
-        flash('You shut the box! 0 points this round!', 'success')
-    
-    db.session.commit()
-    
-    check_turn_end(game)
+    def flip(game, players):
+        current_player = find_player(players, current_user.id)
+        rules.check_can_submit(game, current_player, 'Cannot flip tiles now.')
+        
+        if not tiles_str:
+            raise GameActionError('Please select tiles to flip.')
+        
+        try:
+            tiles_to_flip = [int(t) for t in tiles_str.split(',')]
+        except ValueError:
+            raise GameActionError('Invalid tile selection.')
+        
+        rules.flip(game, players, current_player, tiles_to_flip)
+        
+        if current_player.is_box_shut:
+            return 'You shut the box! 0 points this round!', 'success'
     
-    return redirect(url_for('games.play_game', game_id=game_id))
+    return game_action_response(game_id, flip)
 
 
 @games_bp.route('/games/<int:game_id>/pass', methods=['POST'])
 @login_required
 def pass_turn(game_id):
-    game = Game.query.get_or_404(game_id)
-    current_player = GamePlayer.query.filter_by(game_id=game_id, user_id=current_user.id).first()
-    
-    if not current_player:
-        flash('You are not in this game.', 'error')
-        return redirect(url_for('games.list_games'))
-    
-    if game.status != 'playing' or game.round_phase != 'flipping':
-        flash('Cannot pass now.', 'error')
-        return redirect(url_for('games.play_game', game_id=game_id))
-    
-    if current_player.is_out or current_player.has_submitted:
-        flash('You have already submitted this turn.', 'error')
-        return redirect(url_for('games.play_game', game_id=game_id))
-    
-    current_player.is_out = True
-    current_player.has_submitted = True
-    current_player.round_score = current_player.get_tiles_sum()
-    
-    db.session.commit()
-    flash(f'You are out this round with {current_player.round_score} points.', 'info')
-    
-    check_turn_end(game)
+    def pass_(game, players):
+        current_player = find_player(players, current_user.id)
+        rules.pass_turn(game, players, current_player)
+        return f'You are out this round with {current_player.round_score} points.', 'info'
     
-    return redirect(url_for('games.play_game', game_id=game_id))
+    return game_action_response(game_id, pass_)
 
 
-def check_turn_end(game):
-    players = GamePlayer.query.filter_by(game_id=game.game_id if hasattr(game, 'game_id') else game.id).all()
-    
-    all_submitted = all(p.has_submitted or p.is_out for p in players)
-    all_out = all(p.is_out for p in players)
-    any_shut_box = any(not p.get_tiles_list() for p in players)
-    
-    if all_out or any_shut_box:
-        end_round(game)
-    elif all_submitted:
-        game.round_phase = 'rolling'
-        for player in players:
-            if not player.is_out:
-                player.has_submitted = False
-        db.session.commit()
+class GameActionError(Exception):
+    def __init__(self, message, redirect_to=None):
+        super().__init__(message)
+        self.redirect_to = redirect_to
 
 
-def end_round(game):
-    players = GamePlayer.query.filter_by(game_id=game.id).all()
-    
-    for player in players:
-        if not player.is_out and player.get_tiles_list():
-            player.round_score = player.get_tiles_sum()
-        player.score += player.round_score
-    
-    db.session.commit()
-    
-    max_score = max(p.score for p in players)
-    if max_score >= 100:
-        end_game(game)
-    else:
-        game.round_phase = 'round_end'
-        db.session.commit()
+class GameConflictError(GameActionError):
+    pass
 
 
-def end_game(game):
-    players = GamePlayer.query.filter_by(game_id=game.id).all()
-    
-    min_score = min(p.score for p in players)
-    winner = next(p for p in players if p.score == min_score)
+def find_player(players, user_id):
+    player = next((p for p in players if p.user_id == user_id), None)
+    if not player:
+        raise GameActionError('You are not in this game.', url_for('games.list_games'))
+    return player
+
+
+def get_player(game, user_id):
+    return next((p for p in game.players if p.user_id == user_id), None)
+
+
+def find_game(game_id, lock=False):
+    query = Game.query.options(joinedload(Game.players).joinedload(GamePlayer.user))
+    if lock:
+        query = query.with_for_update(of=Game)
+    return query.filter(Game.id == game_id).one_or_none()
+
+
+def load_game(game_id, lock=False):
+    game = find_game(game_id, lock)
+    if game is None:
+        abort(404)
+    return game
+
+
+def load_archived_game(game_id):
+    game = ArchivedGame.query.options(
+        joinedload(ArchivedGame.players).joinedload(ArchivedGamePlayer.user),
+        joinedload(ArchivedGame.winner)
+    ).filter(ArchivedGame.id == game_id).one_or_none()
+    if game is None:
+        abort(404)
+    return game
+
+
+def archived_results(game_id):
+    if db.session.get(ArchivedGame, game_id) is None:
+        abort(404)
+    return redirect(url_for('games.game_results', game_id=game_id))
+
+
+def run_game_action(game_id, action):
+    for attempt in range(GAME_ACTION_RETRIES):
+        game = load_game(game_id, lock=True)
+        players = game.players
+        game_history.begin(game)
+        
+        try:
+            result = action(game, players)
+        except rules.RuleError as e:
+            db.session.rollback()
+            raise GameActionError(str(e))
+        except GameActionError:
+            db.session.rollback()
+            raise
+        
+        game.version += 1
+        snapshot = build_game_snapshot(game, players)
+        bots_pending = bots.has_work(game, players)
+        try:
+            moves = game_history.record(game, players)
+            stats_changed = player_stats.record(game, players, moves)
+            record_standings(game, players, moves)
+            db.session.commit()
+        except StaleDataError:
+            db.session.rollback()
+            metrics.inc('game_action_conflicts_total', labels(outcome='retried'))
+            time.sleep(random.uniform(0, GAME_ACTION_BACKOFF * (attempt + 1)))
+            continue
+        
+        if stats_changed:
+            player_stats.invalidate()
+        if inspect(game).was_deleted:
+            notify_game_deleted(game_id)
+        else:
+            game_store.put(game_id, snapshot)
+            game_events.publish(game_id, snapshot['state'])
+            if bots_pending:
+                bot_runner.schedule(game_id)
+        return result
+    
+    metrics.inc('game_action_conflicts_total', labels(outcome='gave_up'))
+    raise GameConflictError('The game was busy, please try again.')
+
+
+def game_action_response(game_id, action, redirect_to=None):
+    try:
+        message = run_game_action(game_id, action)
+    except GameActionError as e:
+        flash(str(e), 'error')
+        return redirect(e.redirect_to or url_for('games.play_game', game_id=game_id))
     
-    game.status = 'finished'
-    game.winner_id = winner.user_id
-    game.round_phase = 'finished'
-    db.session.commit()
+    if message:
+        flash(*message)
+    return redirect(redirect_to or url_for('games.play_game', game_id=game_id))
 
 
 @games_bp.route('/games/<int:game_id>/next-round', methods=['POST'])
 @login_required
 def next_round(game_id):
-    game = Game.query.get_or_404(game_id)
-    
-    if game.created_by != current_user.id:
-        flash('Only the host can start the next round.', 'error')
-        return redirect(url_for('games.play_game', game_id=game_id))
-    
-    if game.round_phase != 'round_end':
-        flash('Cannot start next round now.', 'error')
-        return redirect(url_for('games.play_game', game_id=game_id))
-    
-    game.current_round += 1
-    game.round_phase = 'rolling'
-    game.dice1 = 0
-    game.dice2 = 0
-    
-    for player in game.players:
-        tiles = ','.join(str(i) for i in range(1, game.max_tiles + 1))
-        player.tiles_remaining = tiles
-        player.is_out = False
-        player.has_submitted = False
-        player.round_score = 0
+    def advance(game, players):
+        if game.tournament_id is not None:
+            raise GameActionError('The next round starts with the next tournament roll.')
+        
+        if game.created_by != current_user.id:
+            raise GameActionError('Only the host can start the next round.')
+        
+        rules.next_round(game, players)
+        return f'Round {game.current_round} started!', 'success'
     
-    db.session.commit()
-    flash(f'Round {game.current_round} started!', 'success')
-    return redirect(url_for('games.play_game', game_id=game_id))
+    return game_action_response(game_id, advance)
 
 
 @games_bp.route('/games/<int:game_id>/results')
 @login_required
 def game_results(game_id):
-    game = Game.query.get_or_404(game_id)
-    players = GamePlayer.query.filter_by(game_id=game_id).order_by(GamePlayer.score.asc()).all()
-    current_player = GamePlayer.query.filter_by(game_id=game_id, user_id=current_user.id).first()
+    game = find_game(game_id) or load_archived_game(game_id)
+    players = sorted(game.players, key=lambda p: p.score)
+    current_player = get_player(game, current_user.id)
     
     return render_template('games/results.html', game=game, players=players,
-                          current_player=current_player)
+                          current_player=current_player, rounds=game_history.rounds(game_id))
 
 
 @games_bp.route('/games/<int:game_id>/state')
 @login_required
 def game_state(game_id):
-    game = Game.query.get_or_404(game_id)
-    current_player = GamePlayer.query.filter_by(game_id=game_id, user_id=current_user.id).first()
+    since = request.args.get('since', type=int)
+    seq = game_events.latest(game_id)[0]
+    snapshot = load_member_snapshot(game_id, current_user.id)
     
-    if not current_player:
+    if not snapshot:
+        abort(404)
+    
+    if current_user.id not in snapshot['player_ids']:
+        return jsonify({'error': 'Not in game'}), 403
+    
+    busy = False
+    if since is not None and snapshot['version'] <= since:
+        if game_watcher.acquire():
+            try:
+                snapshot = wait_for_version(game_id, since, seq, snapshot)
+            finally:
+                game_watcher.release()
+            if not snapshot:
+                abort(404)
+        else:
+            busy = True
+    
+    response = jsonify(snapshot['state'])
+    response.set_etag(f"{game_id}-{snapshot['version']}")
+    response.headers['Cache-Control'] = 'no-cache'
+    if busy:
+        # Every waiting slot in this worker is taken, so answer now and have the client come back.
+        response.headers['Retry-After'] = '3'
+    return response.make_conditional(request)
+
+
+@games_bp.route('/games/<int:game_id>/hint')
+@login_required
+def game_hint(game_id):
+    row = db.session.query(
+        Game.status, Game.round_phase, Game.dice1, Game.dice2,
+        GamePlayer.tiles_mask, GamePlayer.is_out, GamePlayer.has_submitted
+    ).outerjoin(GamePlayer, (GamePlayer.game_id == Game.id) & (GamePlayer.user_id == current_user.id)
+    ).filter(Game.id == game_id).one_or_none()
+    
+    if row is None:
+        abort(404)
+    
+    if row.tiles_mask is None:
         return jsonify({'error': 'Not in game'}), 403
     
-    players = GamePlayer.query.filter_by(game_id=game_id).all()
-    all_submitted = all(p.has_submitted or p.is_out for p in players)
+    if row.status != 'playing' or row.round_phase != 'flipping' or row.is_out or row.has_submitted:
+        return jsonify({'error': 'No move to make right now'}), 409
+    
+    hint = solver.hint(row.tiles_mask, row.dice1 + row.dice2)
+    if hint is None:
+        return jsonify({'tiles': [], 'pass': True, 'expected_score': engine.mask_sum(row.tiles_mask)})
     
+    flip, expected_score = hint
     return jsonify({
+        'tiles': list(engine.mask_to_tiles(flip)),
+        'pass': False,
+        'expected_score': round(expected_score, 2)
+    })
+
+
+@games_bp.route('/games/<int:game_id>/events')
+@login_required
+def game_events_stream(game_id):
+    seq = game_events.latest(game_id)[0]
+    snapshot = load_member_snapshot(game_id, current_user.id)
+    db.session.close()
+    
+    if not snapshot:
+        abort(404)
+    
+    if current_user.id not in snapshot['player_ids']:
+        return jsonify({'error': 'Not in game'}), 403
+    
+    if not game_watcher.acquire():
+        # The page falls back to polling when the stream is refused.
+        return jsonify({'error': 'Too many open streams'}), 503
+    
+    state = snapshot['state']
+    
+    keepalive = current_app.config['GAME_STREAM_KEEPALIVE']
+    lifetime = current_app.config['GAME_STREAM_LIFETIME']
+    
+    def stream():
+        sent = state
+        last_seq = seq
+        deadline = time.monotonic() + lifetime
+        next_keepalive = time.monotonic() + keepalive
+        game_watcher.watch(game_id, snapshot['version'])
+        try:
+            yield format_sse(sent, retry=3000)
+            
+            while sent['status'] not in ('finished', 'deleted'):
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                if now >= next_keepalive:
+                    next_keepalive = now + keepalive
+                    yield ': keepalive\n\n'
+                    continue
+                
+                event = game_events.wait(game_id, last_seq, min(next_keepalive, deadline) - now)
+                if event is None:
+                    continue
+                last_seq, latest = event
+                # A bare wake-up is followed by the watcher publishing what changed.
+                if latest is None:
+                    continue
+                
+                delta = state_delta(sent, latest)
+                if delta:
+                    sent = dict(sent, **delta)
+                    next_keepalive = time.monotonic() + keepalive
+                    yield format_sse(delta)
+        finally:
+            game_watcher.unwatch(game_id)
+    
+    response = Response(stream_with_context(stream()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(game_watcher.release)
+    return response
+
+
+def wait_for_version(game_id, since, seq, snapshot):
+    deadline = time.monotonic() + current_app.config['GAME_LONG_POLL_TIMEOUT']
+    db.session.close()
+    
+    game_watcher.watch(game_id, snapshot['version'])
+    try:
+        while snapshot['version'] <= since:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            event = game_events.wait(game_id, seq, remaining)
+            if event is None:
+                break
+            seq, state = event
+            if state is None:
+                continue
+            if state['status'] == 'deleted':
+                return None
+            snapshot = {'version': state['version'], 'state': state}
+    finally:
+        game_watcher.unwatch(game_id)
+    
+    return snapshot
+
+
+def build_game_state(game, players):
+    return {
+        'version': game.version,
         'phase': game.round_phase,
         'status': game.status,
         'dice1': game.dice1,
         'dice2': game.dice2,
         'round': game.current_round,
-        'all_submitted': all_submitted
-    })
+        'all_submitted': all(p.has_submitted or p.is_out for p in players)
+    }
+
+
+def build_game_snapshot(game, players):
+    return {
+        'version': game.version,
+        'state': build_game_state(game, players),
+        'player_ids': [p.user_id for p in players]
+    }
+
+
+def load_game_snapshot(game_id, refresh=False):
+    snapshot = None if refresh else game_store.get(game_id)
+    if snapshot is None:
+        game = Game.query.options(joinedload(Game.players)).filter_by(id=game_id).one_or_none()
+        if not game:
+            return None
+        snapshot = build_game_snapshot(game, game.players)
+        game_store.put(game_id, snapshot)
+    return snapshot
+
+
+def load_member_snapshot(game_id, user_id):
+    snapshot = load_game_snapshot(game_id)
+    if snapshot and user_id not in snapshot['player_ids'] and game_store.enabled:
+        # A cached snapshot may predate this player joining.
+        snapshot = load_game_snapshot(game_id, refresh=True)
+    return snapshot
+
+
+def notify_game_deleted(game_id):
+    game_store.discard(game_id)
+    game_events.publish(game_id, {'status': 'deleted'})
 
 
 @games_bp.route('/games/<int:game_id>/end', methods=['POST'])
 @login_required
 def end_game_early(game_id):
-    game = Game.query.get_or_404(game_id)
+    game = load_game(game_id)
     
     if game.created_by != current_user.id:
         flash('Only the host can end the game.', 'error')
         return redirect(url_for('games.play_game', game_id=game_id))
     
-    GamePlayer.query.filter_by(game_id=game_id).delete()
+    if game.tournament_id is not None:
+        flash('Tournament tables cannot be ended early.', 'error')
+        return redirect(url_for('games.play_game', game_id=game_id))
+    
     db.session.delete(game)
+    game_history.discard([game_id])
     db.session.commit()
+    notify_game_deleted(game_id)
     
     flash('Game has been ended and deleted.', 'info')
     return redirect(url_for('games.list_games'))
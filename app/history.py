@@ -0,0 +1,144 @@
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import delete, insert, select
+
+from app import db, engine, rules
+from app.models import Game, GameMove, GameRound, GameSnapshot
+from app.simulation import SimGame, SimPlayer
+
+GAME_FIELDS = ('status', 'round_phase', 'current_round', 'dice1', 'dice2', 'winner_id')
+PLAYER_FIELDS = ('user_id', 'tiles_mask', 'score', 'is_out', 'has_submitted', 'round_score')
+MOVE_FIELDS = ('dice1', 'dice2', 'dice_counter', 'mask')
+
+
+def capture(game, players):
+    return {
+        'max_tiles': game.max_tiles,
+        'game': [getattr(game, field) for field in GAME_FIELDS],
+        'players': [[getattr(p, field) for field in PLAYER_FIELDS] for p in players],
+    }
+
+
+def restore(state):
+    game = SimGame(state['max_tiles'])
+    for field, value in zip(GAME_FIELDS, state['game']):
+        setattr(game, field, value)
+    players = []
+    for values in state['players']:
+        player = SimPlayer(values[0])
+        for field, value in zip(PLAYER_FIELDS, values):
+            setattr(player, field, value)
+        players.append(player)
+    return game, players
+
+
+def apply(game, players, move):
+    player = next((p for p in players if p.user_id == move.user_id), None)
+    if move.kind == 'start':
+        rules.start(game, players)
+    elif move.kind == 'roll':
+        rules.roll(game, players, move.dice1, move.dice2)
+    elif move.kind == 'flip':
+        rules.flip_mask(game, players, player, move.mask)
+    elif move.kind == 'pass':
+        rules.pass_turn(game, players, player)
+    elif move.kind == 'next_round':
+        rules.next_round(game, players)
+    # round_end and game_end are recorded for readers of the log; replay reaches them
+    # from the moves before them
+
+
+class GameHistory:
+    def __init__(self):
+        self.snapshot_interval = 0
+
+    def init_app(self, app):
+        self.snapshot_interval = app.config.get('GAME_SNAPSHOT_INTERVAL', 50)
+        app.cli.add_command(replay_command)
+
+    def begin(self, game):
+        game.move_log = []
+
+    def record(self, game, players):
+        moves, game.move_log = game.move_log, None
+        if not moves:
+            return []
+
+        first = game.move_count + 1
+        game.move_count += len(moves)
+        db.session.execute(insert(GameMove), [
+            dict({field: None for field in MOVE_FIELDS}, **move, game_id=game.id, seq=first + i)
+            for i, move in enumerate(moves)
+        ])
+
+        # No action ends a round and starts the next one, so the players still hold
+        # the scores of any round that ended during this action.
+        rounds = [
+            {'game_id': game.id, 'round': move['round'], 'user_id': p.user_id,
+             'score': p.round_score, 'total': p.score}
+            for move in moves if move['kind'] == 'round_end' for p in players
+        ]
+        if rounds:
+            db.session.execute(insert(GameRound), rounds)
+
+        interval = self.snapshot_interval
+        if moves[0]['kind'] == 'start' or (interval > 0 and (first - 1) // interval != game.move_count // interval):
+            db.session.add(GameSnapshot(game_id=game.id, seq=game.move_count, state=capture(game, players)))
+        return moves
+
+    def replay(self, game_id, seq=None):
+        query = select(GameSnapshot).where(GameSnapshot.game_id == game_id)
+        if seq is not None:
+            query = query.where(GameSnapshot.seq <= seq)
+        snapshot = db.session.scalars(query.order_by(GameSnapshot.seq.desc()).limit(1)).first()
+        if snapshot is None:
+            return None
+
+        game, players = restore(snapshot.state)
+        moves = select(GameMove).where(GameMove.game_id == game_id, GameMove.seq > snapshot.seq)
+        if seq is not None:
+            moves = moves.where(GameMove.seq <= seq)
+        for move in db.session.scalars(moves.order_by(GameMove.seq)):
+            apply(game, players, move)
+        return game, players
+
+    def rounds(self, game_id):
+        rows = db.session.execute(
+            select(GameRound.round, GameRound.user_id, GameRound.score, GameRound.total)
+            .where(GameRound.game_id == game_id)
+            .order_by(GameRound.round)
+        ).all()
+        rounds = {}
+        for row in rows:
+            rounds.setdefault(row.round, {})[row.user_id] = row
+        return list(rounds.items())
+
+    def discard(self, game_ids):
+        for model in (GameMove, GameSnapshot, GameRound):
+            db.session.execute(delete(model).where(model.game_id.in_(game_ids))
+                               .execution_options(synchronize_session=False))
+
+
+@click.command('replay-game')
+@click.argument('game_id', type=int)
+@click.option('--seq', type=int, help='Stop after this move.')
+@with_appcontext
+def replay_command(game_id, seq):
+    """Rebuild a game from its move log."""
+    result = game_history.replay(game_id, seq)
+    if result is None:
+        raise click.ClickException(f'Game {game_id} has no recorded history.')
+
+    game, players = result
+    click.echo(f'round {game.current_round}, {game.round_phase}, dice {game.dice1} + {game.dice2}')
+    for p in players:
+        tiles = ' '.join(map(str, engine.mask_to_tiles(p.tiles_mask))) or 'shut'
+        click.echo(f'  player {p.user_id}: score {p.score}, round {p.round_score}, tiles {tiles}')
+
+    stored = db.session.get(Game, game_id)
+    if seq is None and stored is not None:
+        matches = capture(stored, stored.players) == capture(game, players)
+        click.echo('matches the stored game' if matches else 'differs from the stored game')
+
+
+game_history = GameHistory()
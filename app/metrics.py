@@ -0,0 +1,211 @@
+import glob
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from flask import (Blueprint, Response, before_render_template, g, has_request_context, request,
+                   template_rendered)
+from sqlalchemy import event, func
+from sqlalchemy.engine import Engine
+
+from app import db
+
+METERED_BLUEPRINTS = ('games', 'tournaments', 'auth', 'main')
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+HELP = {
+    'http_requests_total': ('counter', 'Requests handled, by endpoint, method and status.'),
+    'http_request_duration_seconds': ('histogram', 'Time to build the response, by endpoint.'),
+    'http_request_db_queries': ('histogram', 'SQL statements run per request, by endpoint.'),
+    'db_queries_total': ('counter', 'SQL statements run while handling requests, by endpoint.'),
+    'db_query_seconds_total': ('counter', 'Time spent in SQL statements, by endpoint.'),
+    'template_render_seconds_total': ('counter', 'Time spent rendering templates, by template.'),
+    'template_renders_total': ('counter', 'Templates rendered, by template.'),
+    'game_action_conflicts_total': ('counter', 'Game actions that lost a version race, by outcome.'),
+    'user_cache_lookups_total': ('counter', 'Logged-in user lookups, by cache tier hit or miss.'),
+    'games': ('gauge', 'Live games by status.'),
+}
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+def labels(**values):
+    return ','.join(f'{key}="{value}"' for key, value in values.items())
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = defaultdict(lambda: defaultdict(float))
+        self.histograms = defaultdict(dict)
+        self.path = None
+        self.flush_interval = 0
+        self._flushed_at = 0
+
+    def init_app(self, app):
+        self.path = app.config.get('METRICS_DIR') or None
+        self.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', 1)
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+
+        app.before_request(self._start_request)
+        app.after_request(self._end_request)
+        before_render_template.connect(self._start_render, app)
+        template_rendered.connect(self._end_render, app)
+        if not event.contains(Engine, 'before_cursor_execute', _start_query):
+            event.listen(Engine, 'before_cursor_execute', _start_query)
+            event.listen(Engine, 'after_cursor_execute', _end_query)
+
+    def inc(self, name, label, value=1):
+        with self._lock:
+            self.counters[name][label] += value
+
+    def observe(self, name, label, value, buckets):
+        with self._lock:
+            counts = self.histograms[name].get(label)
+            if counts is None:
+                # one slot per bucket, then +Inf, sum
+                counts = self.histograms[name][label] = [0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    def _start_request(self):
+        if request.blueprint in METERED_BLUEPRINTS:
+            g.metrics_start = time.perf_counter()
+            g.metrics_queries = 0
+            g.metrics_query_time = 0.0
+
+    def _end_request(self, response):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return response
+
+        endpoint = request.endpoint
+        self.inc('http_requests_total', labels(endpoint=endpoint, method=request.method,
+                                               status=response.status_code))
+        self.observe('http_request_duration_seconds', labels(endpoint=endpoint),
+                     time.perf_counter() - start, LATENCY_BUCKETS)
+        self.observe('http_request_db_queries', labels(endpoint=endpoint),
+                     g.metrics_queries, QUERY_BUCKETS)
+        self.inc('db_queries_total', labels(endpoint=endpoint), g.metrics_queries)
+        self.inc('db_query_seconds_total', labels(endpoint=endpoint), g.metrics_query_time)
+
+        if self.path and time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+        return response
+
+    def _start_render(self, app, template, context, **extra):
+        if 'metrics_start' in g:
+            g.setdefault('metrics_renders', []).append(time.perf_counter())
+
+    def _end_render(self, app, template, context, **extra):
+        if g.get('metrics_renders'):
+            elapsed = time.perf_counter() - g.metrics_renders.pop()
+            label = labels(template=template.name)
+            self.inc('template_render_seconds_total', label, elapsed)
+            self.inc('template_renders_total', label)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': {name: dict(values) for name, values in self.counters.items()},
+                'histograms': {name: {label: list(counts) for label, counts in values.items()}
+                               for name, values in self.histograms.items()},
+            }
+
+    def flush(self):
+        self._flushed_at = time.monotonic()
+        path = os.path.join(self.path, f'metrics-{os.getpid()}.json')
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp, path)
+
+    def collect(self):
+        if not self.path:
+            return [self.snapshot()]
+
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.path, 'metrics-*.json')):
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (FileNotFoundError, ValueError):
+                pass
+        return snapshots
+
+    def render(self, gauges):
+        counters = defaultdict(lambda: defaultdict(float))
+        histograms = defaultdict(dict)
+        for snapshot in self.collect():
+            for name, values in snapshot['counters'].items():
+                for label, value in values.items():
+                    counters[name][label] += value
+            for name, values in snapshot['histograms'].items():
+                for label, counts in values.items():
+                    current = histograms[name].get(label)
+                    histograms[name][label] = counts if current is None else [
+                        a + b for a, b in zip(current, counts)]
+
+        lines = []
+        for name, values in sorted(counters.items()):
+            lines.extend(_header(name))
+            lines.extend(f'{name}{{{label}}} {_number(value)}' for label, value in sorted(values.items()))
+        for name, values in sorted(histograms.items()):
+            buckets = LATENCY_BUCKETS if name == 'http_request_duration_seconds' else QUERY_BUCKETS
+            lines.extend(_header(name))
+            for label, counts in sorted(values.items()):
+                for bound, count in zip(buckets, counts):
+                    lines.append(f'{name}_bucket{{{label},le="{bound}"}} {count}')
+                lines.append(f'{name}_bucket{{{label},le="+Inf"}} {counts[-2]}')
+                lines.append(f'{name}_sum{{{label}}} {_number(counts[-1])}')
+                lines.append(f'{name}_count{{{label}}} {counts[-2]}')
+        for name, values in gauges.items():
+            lines.extend(_header(name))
+            lines.extend(f'{name}{{{label}}} {_number(value)}' for label, value in sorted(values.items()))
+        return '\n'.join(lines) + '\n'
+
+
+def _header(name):
+    kind, text = HELP[name]
+    return [f'# HELP {name} {text}', f'# TYPE {name} {kind}']
+
+
+def _number(value):
+    return f'{value:.6f}'.rstrip('0').rstrip('.') if isinstance(value, float) else str(value)
+
+
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'metrics_start' in g:
+        conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+def _end_query(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('metrics_query_start')
+    if starts and has_request_context() and 'metrics_start' in g:
+        g.metrics_queries += 1
+        g.metrics_query_time += time.perf_counter() - starts.pop()
+
+
+def game_gauges():
+    from app.models import Game
+
+    counts = dict(db.session.query(Game.status, func.count()).group_by(Game.status).all())
+    return {'games': {labels(status=status): counts.get(status, 0)
+                      for status in ('waiting', 'playing', 'finished')}}
+
+
+@metrics_bp.route('/metrics')
+def export():
+    body = metrics.render(game_gauges())
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+
+metrics = Metrics()
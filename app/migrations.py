@@ -0,0 +1,50 @@
+from sqlalchemy import inspect, text
+from app.engine import tiles_to_mask
+from app.stats import rebuild as rebuild_stats
+
+
+def upgrade(db):
+    with db.engine.begin() as conn:
+        inspector = inspect(conn)
+        if _add_column(conn, inspector, 'game_players', 'tiles_mask', 'INTEGER NOT NULL DEFAULT 0'):
+            _convert_tiles_remaining(conn, inspector)
+        _add_column(conn, inspector, 'games', 'version', 'INTEGER NOT NULL DEFAULT 0')
+        if _add_column(conn, inspector, 'games', 'player_count', 'INTEGER NOT NULL DEFAULT 0'):
+            conn.execute(text(
+                'UPDATE games SET player_count = '
+                '(SELECT COUNT(*) FROM game_players WHERE game_players.game_id = games.id)'
+            ))
+        _add_column(conn, inspector, 'users', 'is_bot', 'BOOLEAN NOT NULL DEFAULT FALSE')
+        if _add_column(conn, inspector, 'games', 'updated_at', 'DATETIME'):
+            conn.execute(text('UPDATE games SET updated_at = created_at'))
+        _add_column(conn, inspector, 'games', 'move_count', 'INTEGER NOT NULL DEFAULT 0')
+        _add_column(conn, inspector, 'games', 'tournament_id', 'INTEGER REFERENCES tournaments (id)')
+        _add_column(conn, inspector, 'games', 'tournament_roll', 'INTEGER NOT NULL DEFAULT 0')
+        _add_column(conn, inspector, 'game_moves', 'dice_counter', 'INTEGER')
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+        if (conn.execute(text('SELECT 1 FROM users LIMIT 1')).first() and
+                not conn.execute(text('SELECT 1 FROM user_stats LIMIT 1')).first()):
+            rebuild_stats(conn)
+
+
+def _add_column(conn, inspector, table, column, ddl):
+    if column in {c['name'] for c in inspector.get_columns(table)}:
+        return False
+    conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+    return True
+
+
+def _convert_tiles_remaining(conn, inspector):
+    if 'tiles_remaining' not in {c['name'] for c in inspector.get_columns('game_players')}:
+        return
+    rows = conn.execute(text(
+        'SELECT id, tiles_remaining FROM game_players WHERE tiles_remaining IS NOT NULL'
+    )).all()
+    updates = [
+        {'id': row.id, 'mask': tiles_to_mask(int(t) for t in row.tiles_remaining.split(',') if t)}
+        for row in rows
+    ]
+    if updates:
+        conn.execute(text('UPDATE game_players SET tiles_mask = :mask WHERE id = :id'), updates)
@@ -1,12 +1,26 @@
 from app import db, login_manager
+from app import engine
+from app.passwords import password_hasher
+from app.users import user_cache
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event
+from sqlalchemy.ext.hybrid import hybrid_property
 from datetime import datetime
+import functools
+import operator
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    identity = user_cache.get(user_id)
+    if identity is not None:
+        return identity
+    
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    return user_cache.put(user)
 
 
 class User(UserMixin, db.Model):
@@ -16,12 +30,13 @@ class User(UserMixin, db.Model):
     username = db.Column(db.String(80), unique=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    is_bot = db.Column(db.Boolean, nullable=False, default=False)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
     
     def __repr__(self):
         return f'<User {self.username}>'
@@ -42,10 +57,30 @@ class Game(db.Model):
     dice2 = db.Column(db.Integer, default=0)
     round_phase = db.Column(db.String(20), default='waiting')
     winner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    player_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    move_count = db.Column(db.Integer, nullable=False, default=0)
+    tournament_id = db.Column(db.Integer, db.ForeignKey('tournaments.id'), nullable=True)
+    tournament_roll = db.Column(db.Integer, nullable=False, default=0)
     
     creator = db.relationship('User', backref='created_games', foreign_keys=[created_by])
     winner = db.relationship('User', backref='won_games', foreign_keys=[winner_id])
-    players = db.relationship('GamePlayer', backref='game', lazy='dynamic')
+    players = db.relationship('GamePlayer', backref='game', order_by='GamePlayer.id',
+                              cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        db.Index('ix_games_status_created', 'status', 'created_at', 'id'),
+        db.Index('ix_games_status_updated', 'status', 'updated_at'),
+        db.Index('ix_games_tournament_phase', 'tournament_id', 'round_phase'),
+        {'sqlite_autoincrement': True},
+    )
+    __mapper_args__ = {'version_id_col': version, 'version_id_generator': False}
+    
+    # moves made by the current action, see app.history
+    move_log = None
+    # score that ends the game; None plays to rules.WINNING_SCORE
+    target = None
     
     def get_dice_total(self):
         return self.dice1 + self.dice2
@@ -60,7 +95,7 @@ class GamePlayer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     game_id = db.Column(db.Integer, db.ForeignKey('games.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    tiles_remaining = db.Column(db.String(50), nullable=True)
+    tiles_mask = db.Column(db.Integer, nullable=False, default=0)
     score = db.Column(db.Integer, default=0)
     is_out = db.Column(db.Boolean, default=False)
     has_submitted = db.Column(db.Boolean, default=False)
@@ -69,41 +104,204 @@ class GamePlayer(db.Model):
     
     user = db.relationship('User', backref='game_participations')
     
-    def get_tiles_list(self):
-        if not self.tiles_remaining:
-            return []
-        return [int(t) for t in self.tiles_remaining.split(',') if t]
+    __table_args__ = (
+        db.Index('ix_game_players_game_user', 'game_id', 'user_id'),
+        db.Index('ix_game_players_user_game', 'user_id', 'game_id'),
+    )
+    
+    @hybrid_property
+    def tiles_sum(self):
+        return engine.mask_sum(self.tiles_mask)
     
-    def set_tiles_list(self, tiles):
-        self.tiles_remaining = ','.join(str(t) for t in sorted(tiles))
+    @tiles_sum.inplace.expression
+    @classmethod
+    def _tiles_sum_expression(cls):
+        terms = [cls.tiles_mask.bitwise_rshift(tile - 1).bitwise_and(1) * tile
+                 for tile in range(1, engine.MAX_TILES + 1)]
+        return functools.reduce(operator.add, terms)
     
-    def get_tiles_sum(self):
-        return sum(self.get_tiles_list())
+    @hybrid_property
+    def is_box_shut(self):
+        return self.tiles_mask == 0
+    
+    def get_tiles_list(self):
+        return list(engine.mask_to_tiles(self.tiles_mask))
     
     def can_make_move(self, dice_total):
-        tiles = self.get_tiles_list()
-        if not tiles:
-            return False
-        return self._can_sum_to(tiles, dice_total)
-    
-    def _can_sum_to(self, tiles, target):
-        if target == 0:
-            return True
-        if target < 0 or not tiles:
-            return False
-        for i, tile in enumerate(tiles):
-            if tile <= target:
-                remaining = tiles[:i] + tiles[i+1:]
-                if self._can_sum_to(remaining, target - tile):
-                    return True
-        return False
-    
-    def is_valid_flip(self, tiles_to_flip, dice_total):
-        current_tiles = self.get_tiles_list()
-        for tile in tiles_to_flip:
-            if tile not in current_tiles:
-                return False
-        return sum(tiles_to_flip) == dice_total
+        return engine.can_make(self.tiles_mask, dice_total)
     
     def __repr__(self):
         return f'<GamePlayer {self.user_id} in Game {self.game_id}>'
+
+
+class Tournament(db.Model):
+    __tablename__ = 'tournaments'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    status = db.Column(db.String(20), nullable=False, default='waiting')
+    max_tiles = db.Column(db.Integer, nullable=False, default=10)
+    table_size = db.Column(db.Integer, nullable=False, default=4)
+    player_count = db.Column(db.Integer, nullable=False, default=0)
+    roll_count = db.Column(db.Integer, nullable=False, default=0)
+    rolled_at = db.Column(db.DateTime, nullable=True)
+    dice1 = db.Column(db.Integer, default=0)
+    dice2 = db.Column(db.Integer, default=0)
+    
+    creator = db.relationship('User')
+    
+    __table_args__ = (
+        db.Index('ix_tournaments_status_created', 'status', 'created_at'),
+    )
+    
+    def __repr__(self):
+        return f'<Tournament {self.name}>'
+
+
+class TournamentEntry(db.Model):
+    __tablename__ = 'tournament_entries'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    tournament_id = db.Column(db.Integer, db.ForeignKey('tournaments.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    game_id = db.Column(db.Integer, nullable=True)
+    score = db.Column(db.Integer, nullable=False, default=0)
+    rounds_played = db.Column(db.Integer, nullable=False, default=0)
+    finished = db.Column(db.Boolean, nullable=False, default=False)
+    
+    user = db.relationship('User')
+    
+    __table_args__ = (
+        db.UniqueConstraint('tournament_id', 'user_id', name='uq_tournament_entries_user'),
+        db.Index('ix_tournament_entries_standing', 'tournament_id', 'score', 'user_id'),
+    )
+    
+    def __repr__(self):
+        return f'<TournamentEntry {self.user_id} in Tournament {self.tournament_id}>'
+
+
+class UserStats(db.Model):
+    __tablename__ = 'user_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True, autoincrement=False)
+    games_played = db.Column(db.Integer, nullable=False, default=0)
+    wins = db.Column(db.Integer, nullable=False, default=0)
+    total_score = db.Column(db.Integer, nullable=False, default=0)
+    average_score = db.Column(db.Float, nullable=False, default=0)
+    rounds_played = db.Column(db.Integer, nullable=False, default=0)
+    shut_boxes = db.Column(db.Integer, nullable=False, default=0)
+    
+    user = db.relationship('User')
+    
+    def __repr__(self):
+        return f'<UserStats {self.user_id}>'
+
+
+# Leaderboard order: most wins, then lowest average final score. Users who
+# have not finished a game are left out of the index.
+db.Index('ix_user_stats_rank', UserStats.wins.desc(), UserStats.average_score, UserStats.user_id,
+         sqlite_where=UserStats.games_played > 0, postgresql_where=UserStats.games_played > 0)
+
+
+@event.listens_for(User, 'after_insert')
+def create_user_stats(mapper, connection, user):
+    connection.execute(UserStats.__table__.insert().values(user_id=user.id))
+
+
+# History rows are keyed by game id without a foreign key so that they
+# outlive the game row when it is archived.
+class GameMove(db.Model):
+    __tablename__ = 'game_moves'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    game_id = db.Column(db.Integer, nullable=False)
+    seq = db.Column(db.Integer, nullable=False)
+    round = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(12), nullable=False)
+    user_id = db.Column(db.Integer, nullable=True)
+    dice1 = db.Column(db.Integer, nullable=True)
+    dice2 = db.Column(db.Integer, nullable=True)
+    dice_counter = db.Column(db.Integer, nullable=True)
+    mask = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.UniqueConstraint('game_id', 'seq', name='uq_game_moves_game_seq'),
+    )
+    
+    def __repr__(self):
+        return f'<GameMove {self.seq} {self.kind} in Game {self.game_id}>'
+
+
+class GameSnapshot(db.Model):
+    __tablename__ = 'game_snapshots'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    game_id = db.Column(db.Integer, nullable=False)
+    seq = db.Column(db.Integer, nullable=False)
+    state = db.Column(db.JSON, nullable=False)
+    
+    __table_args__ = (
+        db.UniqueConstraint('game_id', 'seq', name='uq_game_snapshots_game_seq'),
+    )
+    
+    def __repr__(self):
+        return f'<GameSnapshot {self.seq} of Game {self.game_id}>'
+
+
+class GameRound(db.Model):
+    __tablename__ = 'game_rounds'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    game_id = db.Column(db.Integer, nullable=False)
+    round = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    score = db.Column(db.Integer, nullable=False)
+    total = db.Column(db.Integer, nullable=False)
+    
+    __table_args__ = (
+        db.Index('ix_game_rounds_game_round', 'game_id', 'round'),
+    )
+    
+    def __repr__(self):
+        return f'<GameRound {self.round} of Game {self.game_id}>'
+
+
+class ArchivedGame(db.Model):
+    __tablename__ = 'archived_games'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(100), nullable=False)
+    max_tiles = db.Column(db.Integer, nullable=False)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    winner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    current_round = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    winner = db.relationship('User', foreign_keys=[winner_id])
+    players = db.relationship('ArchivedGamePlayer', order_by='ArchivedGamePlayer.id')
+    
+    def __repr__(self):
+        return f'<ArchivedGame {self.name}>'
+
+
+class ArchivedGamePlayer(db.Model):
+    __tablename__ = 'archived_game_players'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    game_id = db.Column(db.Integer, db.ForeignKey('archived_games.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    score = db.Column(db.Integer, nullable=False)
+    
+    user = db.relationship('User')
+    
+    __table_args__ = (
+        db.Index('ix_archived_game_players_game', 'game_id'),
+        db.Index('ix_archived_game_players_user_game', 'user_id', 'game_id'),
+    )
+    
+    def __repr__(self):
+        return f'<ArchivedGamePlayer {self.user_id} in Game {self.game_id}>'
@@ -0,0 +1,52 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    def __init__(self):
+        self.method = 'scrypt'
+        self.prefix = None
+        self.executor = None
+        self.slots = None
+
+    def init_app(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD', 'scrypt')
+        self.prefix = generate_password_hash('', self.method).split('$', 1)[0]
+
+        if self.executor:
+            self.executor.shutdown(wait=False)
+        workers = app.config.get('PASSWORD_HASH_WORKERS', 0)
+        if workers > 0:
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+            self.slots = threading.BoundedSemaphore(workers + app.config.get('PASSWORD_HASH_QUEUE', 0))
+        else:
+            self.executor = None
+            self.slots = None
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self.prefix
+
+    def _run(self, fn, *args):
+        if not self.executor:
+            return fn(*args)
+        if not self.slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            return self.executor.submit(fn, *args).result()
+        finally:
+            self.slots.release()
+
+
+password_hasher = PasswordHasher()
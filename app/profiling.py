@@ -0,0 +1,89 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+
+def folded_stack(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class SlowRequestProfiler:
+    def __init__(self):
+        self.threshold = 0
+        self.interval = 0.005
+        self.path = None
+        self._lock = threading.Lock()
+        self._active = {}
+        self._wake = threading.Event()
+        self._thread = None
+
+    def init_app(self, app):
+        self.threshold = app.config.get('PROFILE_SLOW_REQUESTS', 0)
+        if self.threshold <= 0:
+            return
+        self.interval = app.config.get('PROFILE_INTERVAL', 0.005)
+        self.path = app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+        os.makedirs(self.path, exist_ok=True)
+
+        app.before_request(self._start)
+        app.teardown_request(self._stop)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._sample, name='profiler', daemon=True)
+            self._thread.start()
+
+    def _start(self):
+        g.profile_start = time.perf_counter()
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+        self._wake.set()
+
+    def _stop(self, exc):
+        start = g.pop('profile_start', None)
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+        if start is None or not samples:
+            return
+
+        elapsed = time.perf_counter() - start
+        if elapsed < self.threshold:
+            return
+        name = f'{time.time():.3f}-{request.endpoint}-{elapsed * 1000:.0f}ms.folded'
+        try:
+            with open(os.path.join(self.path, name), 'w') as f:
+                f.writelines(f'{stack} {count}\n' for stack, count in samples.items())
+        except OSError:
+            logger.exception('Could not write profile %s', name)
+
+    def _sample(self):
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                idle = not self._active
+                if idle:
+                    self._wake.clear()
+            if idle:
+                self._wake.wait()
+                continue
+
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, samples in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None and ident != me:
+                        samples[folded_stack(frame)] += 1
+
+
+profiler = SlowRequestProfiler()
@@ -0,0 +1,145 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, func, insert, select, update
+
+from app import db
+from app.events import game_events
+from app.games import notify_game_deleted
+from app.history import game_history
+from app.models import ArchivedGame, ArchivedGamePlayer, Game, GamePlayer
+from app.store import game_store
+
+logger = logging.getLogger(__name__)
+
+
+def claim_games(status, cutoff, batch, mark):
+    # SQLite without AUTOINCREMENT reuses the highest id once it is deleted,
+    # so the newest game always stays behind.
+    newest = select(func.max(Game.id)).scalar_subquery()
+    candidates = (select(Game.id)
+                  .where(Game.status == status, Game.updated_at < cutoff, Game.id < newest)
+                  .order_by(Game.updated_at)
+                  .limit(batch))
+    db.session.execute(
+        update(Game)
+        .where(Game.id.in_(candidates))
+        .values(status=mark, version=Game.version + 1, updated_at=Game.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    return db.session.scalars(select(Game.id).where(Game.status == mark)).all()
+
+
+def remove_games(game_ids):
+    db.session.execute(delete(GamePlayer).where(GamePlayer.game_id.in_(game_ids))
+                       .execution_options(synchronize_session=False))
+    db.session.execute(delete(Game).where(Game.id.in_(game_ids))
+                       .execution_options(synchronize_session=False))
+
+
+def expire_games(status, cutoff, batch):
+    game_ids = claim_games(status, cutoff, batch, 'expired')
+    if game_ids:
+        remove_games(game_ids)
+        game_history.discard(game_ids)
+    db.session.commit()
+
+    for game_id in game_ids:
+        notify_game_deleted(game_id)
+    return len(game_ids)
+
+
+def archive_games(cutoff, batch):
+    game_ids = claim_games('finished', cutoff, batch, 'archiving')
+    if game_ids:
+        db.session.execute(insert(ArchivedGame).from_select(
+            ['id', 'name', 'max_tiles', 'created_by', 'winner_id', 'current_round', 'created_at', 'finished_at'],
+            select(Game.id, Game.name, Game.max_tiles, Game.created_by, Game.winner_id,
+                   Game.current_round, Game.created_at, Game.updated_at).where(Game.id.in_(game_ids))
+        ))
+        # game_players ids are reused once their rows are deleted, so archived
+        # players get ids of their own, inserted in seat order.
+        db.session.execute(insert(ArchivedGamePlayer).from_select(
+            ['game_id', 'user_id', 'score'],
+            select(GamePlayer.game_id, GamePlayer.user_id, func.coalesce(GamePlayer.score, 0))
+            .where(GamePlayer.game_id.in_(game_ids))
+            .order_by(GamePlayer.id)
+        ))
+        remove_games(game_ids)
+    db.session.commit()
+
+    for game_id in game_ids:
+        game_store.discard(game_id)
+        game_events.discard(game_id)
+    return len(game_ids)
+
+
+def reap_games(now=None):
+    config = current_app.config
+    now = now or datetime.utcnow()
+    batch = config['GAME_REAPER_BATCH']
+    counts = {'expired': 0, 'archived': 0}
+
+    for status, setting in (('waiting', 'GAME_WAITING_TIMEOUT'), ('playing', 'GAME_PLAYING_TIMEOUT')):
+        if config[setting] > 0:
+            cutoff = now - timedelta(seconds=config[setting])
+            counts['expired'] += _drain(expire_games, status, cutoff, batch)
+
+    if config['GAME_ARCHIVE_AFTER'] > 0:
+        cutoff = now - timedelta(seconds=config['GAME_ARCHIVE_AFTER'])
+        counts['archived'] += _drain(archive_games, cutoff, batch)
+
+    return counts
+
+
+def _drain(step, *args):
+    total = 0
+    while True:
+        count = step(*args)
+        total += count
+        if count < args[-1]:
+            return total
+
+
+@click.command('reap-games')
+@with_appcontext
+def reap_command():
+    """Expire abandoned games and archive finished ones."""
+    counts = reap_games()
+    click.echo(f'expired {counts["expired"]} games, archived {counts["archived"]} games')
+
+
+class GameReaper:
+    def __init__(self):
+        self._stop = None
+
+    def init_app(self, app):
+        app.cli.add_command(reap_command)
+
+        if self._stop:
+            self._stop.set()
+        interval = app.config.get('GAME_REAPER_INTERVAL', 0)
+        if interval > 0:
+            self._stop = threading.Event()
+            threading.Thread(target=self._loop, args=(app, self._stop, interval),
+                             name='game-reaper', daemon=True).start()
+        else:
+            self._stop = None
+
+    def _loop(self, app, stop, interval):
+        while not stop.wait(interval):
+            with app.app_context():
+                try:
+                    reap_games()
+                except Exception:
+                    db.session.rollback()
+                    logger.exception('Reaping games failed')
+                finally:
+                    db.session.remove()
+
+
+game_reaper = GameReaper()
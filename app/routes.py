@@ -1,5 +1,8 @@
-from flask import Blueprint, render_template, send_from_directory
+from flask import Blueprint, render_template, send_from_directory, request, abort, current_app, url_for
 from flask_login import login_required, current_user
+from app.assets import PRECACHE, static_assets
+from app.stats import player_stats
+import json
 import os
 
 main_bp = Blueprint('main', __name__)
@@ -11,14 +14,39 @@ def index():
     return render_template('index.html')
 
 
+@main_bp.route('/leaderboard')
+@login_required
+def leaderboard():
+    after = request.args.get('after')
+    if after:
+        try:
+            wins, average_score, user_id, rank = after.split('~')
+            after = (int(wins), float(average_score), int(user_id), int(rank))
+        except ValueError:
+            abort(400)
+    
+    entries, next_cursor = player_stats.leaderboard(after)
+    return render_template('leaderboard.html', entries=entries,
+                          next_cursor='~'.join(map(str, next_cursor)) if next_cursor else None)
+
+
 @main_bp.route('/manifest.json')
 def manifest():
-    return send_from_directory('static', 'manifest.json')
+    return send_from_directory(current_app.static_folder, 'manifest.json',
+                               max_age=current_app.config['MANIFEST_MAX_AGE'])
 
 
 @main_bp.route('/sw.js')
 def service_worker():
-    response = send_from_directory('static/js', 'sw.js')
-    response.headers['Content-Type'] = 'application/javascript'
+    # The worker is rebuilt with the current asset version and URLs, so every new
+    # build installs a new worker; it must never be served from a cache.
+    with open(os.path.join(current_app.static_folder, 'js', 'sw.js')) as f:
+        script = f.read()
+    precache = [url_for('static', filename=filename) for filename in PRECACHE]
+    script = (f'const ASSET_VERSION = {json.dumps(static_assets.version)};\n'
+              f'const PRECACHE = {json.dumps(precache)};\n\n' + script)
+    response = current_app.response_class(script, mimetype='application/javascript')
     response.headers['Service-Worker-Allowed'] = '/'
-    return response
+    response.cache_control.no_cache = True
+    response.add_etag()
+    return response.make_conditional(request)
@@ -0,0 +1,146 @@
+from app import engine
+
+WINNING_SCORE = 100
+
+
+class RuleError(Exception):
+    pass
+
+
+def start(game, players):
+    if game.status != 'waiting':
+        raise RuleError('Game has already started.')
+
+    if len(players) < 1:
+        raise RuleError('Need at least 1 player to start.')
+
+    game.status = 'playing'
+    game.current_round = 1
+    game.round_phase = 'rolling'
+    reset_players(game, players)
+    log(game, 'start')
+
+
+def roll(game, players, dice1, dice2, counter=None):
+    if game.status != 'playing':
+        raise RuleError('Game is not in progress.')
+
+    if game.round_phase != 'rolling':
+        raise RuleError('Not time to roll dice.')
+
+    game.dice1 = dice1
+    game.dice2 = dice2
+    game.round_phase = 'flipping'
+    log(game, 'roll', dice1=dice1, dice2=dice2, dice_counter=counter)
+
+    for player in players:
+        if not player.is_out:
+            player.has_submitted = False
+
+
+def flip(game, players, player, tiles):
+    if len(set(tiles)) != len(tiles) or not all(1 <= t <= game.max_tiles for t in tiles):
+        mask = 0
+    else:
+        mask = engine.tiles_to_mask(tiles)
+    flip_mask(game, players, player, mask)
+
+
+def flip_mask(game, players, player, mask):
+    check_can_submit(game, player, 'Cannot flip tiles now.')
+
+    dice_total = game.dice1 + game.dice2
+    if not engine.is_valid_flip(player.tiles_mask, mask, dice_total):
+        raise RuleError(f'Invalid flip. Tiles must sum to {dice_total} and be available.')
+
+    player.tiles_mask &= ~mask
+    player.has_submitted = True
+    log(game, 'flip', player, mask=mask)
+    if player.tiles_mask == 0:
+        player.round_score = 0
+
+    check_turn_end(game, players)
+
+
+def pass_turn(game, players, player):
+    check_can_submit(game, player, 'Cannot pass now.')
+
+    player.is_out = True
+    player.has_submitted = True
+    player.round_score = engine.mask_sum(player.tiles_mask)
+    log(game, 'pass', player)
+
+    check_turn_end(game, players)
+
+
+def check_can_submit(game, player, message):
+    if game.status != 'playing' or game.round_phase != 'flipping':
+        raise RuleError(message)
+
+    if player.is_out or player.has_submitted:
+        raise RuleError('You have already submitted this turn.')
+
+
+def check_turn_end(game, players):
+    all_submitted = all(p.has_submitted or p.is_out for p in players)
+    all_out = all(p.is_out for p in players)
+    any_shut_box = any(p.tiles_mask == 0 for p in players)
+
+    if all_out or any_shut_box:
+        end_round(game, players)
+    elif all_submitted:
+        game.round_phase = 'rolling'
+        for player in players:
+            if not player.is_out:
+                player.has_submitted = False
+
+
+def end_round(game, players):
+    for player in players:
+        if not player.is_out and player.tiles_mask != 0:
+            player.round_score = engine.mask_sum(player.tiles_mask)
+        player.score += player.round_score
+    log(game, 'round_end')
+
+    if max(p.score for p in players) >= (game.target or WINNING_SCORE):
+        end_game(game, players)
+    else:
+        game.round_phase = 'round_end'
+
+
+def end_game(game, players):
+    min_score = min(p.score for p in players)
+    winner = next(p for p in players if p.score == min_score)
+
+    game.status = 'finished'
+    game.winner_id = winner.user_id
+    game.round_phase = 'finished'
+    log(game, 'game_end', winner)
+
+
+def next_round(game, players):
+    if game.round_phase != 'round_end':
+        raise RuleError('Cannot start next round now.')
+
+    game.current_round += 1
+    game.round_phase = 'rolling'
+    game.dice1 = 0
+    game.dice2 = 0
+    reset_players(game, players)
+    log(game, 'next_round')
+
+
+def reset_players(game, players):
+    full = engine.full_mask(game.max_tiles)
+    for player in players:
+        player.tiles_mask = full
+        player.is_out = False
+        player.has_submitted = False
+        player.round_score = 0
+
+
+def log(game, kind, player=None, **values):
+    # Callers that keep a move history give the game a list to append to.
+    if game.move_log is not None:
+        game.move_log.append(dict(values, kind=kind, round=game.current_round,
+                                  user_id=player.user_id if player else None))
@@ -0,0 +1,272 @@
+import argparse
+import importlib
+import multiprocessing
+import random
+import time
+
+from app import engine, rules, solver
+from app.dice import DiceStream
+
+
+def highest_tiles(mask, total, flips, rng):
+    return max(flips)
+
+
+def fewest_tiles(mask, total, flips, rng):
+    return min(flips, key=lambda flip: (bin(flip).count('1'), -flip))
+
+
+def most_tiles(mask, total, flips, rng):
+    return max(flips, key=lambda flip: (bin(flip).count('1'), -flip))
+
+
+def random_tiles(mask, total, flips, rng):
+    return flips[rng.randrange(len(flips))]
+
+
+random_tiles.randomised = True
+
+_optimal_table = None
+
+
+def optimal_tiles(mask, total, flips, rng):
+    global _optimal_table
+    if _optimal_table is None:
+        _optimal_table = solver.SolverTable(*solver.build())
+    return _optimal_table.best_flip(mask, total)
+
+
+STRATEGIES = {
+    'highest': highest_tiles,
+    'fewest': fewest_tiles,
+    'most': most_tiles,
+    'random': random_tiles,
+    'optimal': optimal_tiles,
+}
+
+
+def load_strategy(name):
+    if name in STRATEGIES:
+        return STRATEGIES[name]
+    module, _, attr = name.partition(':')
+    if not attr:
+        raise ValueError(f'Unknown strategy {name!r}; use one of {", ".join(STRATEGIES)} or module:function.')
+    return getattr(importlib.import_module(module), attr)
+
+
+def load_strategies(spec, players):
+    names = spec.split(',')
+    return [load_strategy(names[seat % len(names)]) for seat in range(players)]
+
+
+class SimGame:
+    __slots__ = ('status', 'round_phase', 'current_round', 'dice1', 'dice2', 'max_tiles', 'winner_id',
+                 'target')
+    move_log = None
+
+    def __init__(self, max_tiles, target=None):
+        self.status = 'waiting'
+        self.round_phase = 'waiting'
+        self.current_round = 0
+        self.dice1 = 0
+        self.dice2 = 0
+        self.max_tiles = max_tiles
+        self.winner_id = None
+        self.target = target
+
+
+class SimPlayer:
+    __slots__ = ('user_id', 'tiles_mask', 'score', 'is_out', 'has_submitted', 'round_score')
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.tiles_mask = 0
+        self.score = 0
+        self.is_out = False
+        self.has_submitted = False
+        self.round_score = 0
+
+
+def new_summary(players):
+    return {'games': 0, 'rounds': 0, 'shut_rounds': 0, 'wins': [0] * players}
+
+
+def merge_summaries(summaries):
+    total = new_summary(len(summaries[0]['wins']))
+    for summary in summaries:
+        for key in ('games', 'rounds', 'shut_rounds'):
+            total[key] += summary[key]
+        total['wins'] = [a + b for a, b in zip(total['wins'], summary['wins'])]
+    return total
+
+
+def play_game(strategies, max_tiles, rng, dice, target=None):
+    game = SimGame(max_tiles, target)
+    seats = [SimPlayer(seat) for seat in range(len(strategies))]
+    rules.start(game, seats)
+    shut_rounds = 0
+
+    while game.status == 'playing':
+        if game.round_phase == 'round_end':
+            rules.next_round(game, seats)
+        rules.roll(game, seats, *dice())
+        total = game.dice1 + game.dice2
+
+        for player in seats:
+            if game.round_phase != 'flipping':
+                break
+            if player.is_out or player.has_submitted:
+                continue
+            flips = engine.legal_flips(player.tiles_mask, total)
+            if flips:
+                rules.flip_mask(game, seats, player, strategies[player.user_id](player.tiles_mask, total, flips, rng))
+            else:
+                rules.pass_turn(game, seats, player)
+
+        if game.round_phase != 'rolling' and any(p.tiles_mask == 0 for p in seats):
+            shut_rounds += 1
+
+    return game.current_round, game.winner_id, shut_rounds
+
+
+def simulate_rules(games, max_tiles, strategies, seed, target):
+    rng = random.Random(seed)
+    dice = DiceStream(seed)
+    summary = new_summary(len(strategies))
+    for _ in range(games):
+        rounds, winner, shut_rounds = play_game(strategies, max_tiles, rng, dice, target)
+        summary['games'] += 1
+        summary['rounds'] += rounds
+        summary['shut_rounds'] += shut_rounds
+        summary['wins'][winner] += 1
+    return summary
+
+
+def strategy_table(np, strategy):
+    if getattr(strategy, 'randomised', False):
+        raise ValueError('The numpy engine needs a deterministic strategy.')
+    table = np.full((engine.MASK_COUNT, engine.MAX_TOTAL + 1), -1, dtype=np.int32)
+    for mask in range(engine.MASK_COUNT):
+        for total, flips in engine.MOVES[mask].items():
+            table[mask, total] = strategy(mask, total, flips, None)
+    return table
+
+
+def simulate_numpy(games, max_tiles, strategies, seed, target):
+    import numpy as np
+
+    dice = DiceStream(seed)
+    players = len(strategies)
+    tables = {strategy: strategy_table(np, strategy) for strategy in set(strategies)}
+    table = np.stack([tables[strategy] for strategy in strategies])
+    seat = np.arange(players)[None, :]
+    sums = np.array(engine.SUMS, dtype=np.int32)
+    scores = np.zeros((games, players), dtype=np.int32)
+    playing = np.ones(games, dtype=bool)
+    summary = new_summary(players)
+
+    while playing.any():
+        current = np.flatnonzero(playing)
+        masks = np.full((len(current), players), engine.full_mask(max_tiles), dtype=np.int32)
+        out = np.zeros((len(current), players), dtype=bool)
+        shut = np.zeros(len(current), dtype=bool)
+        in_round = np.ones(len(current), dtype=bool)
+
+        while in_round.any():
+            rolling = np.flatnonzero(in_round)
+            totals = dice.take(len(rolling)).sum(axis=1, dtype=np.int32)
+            before = masks[rolling]
+            was_out = out[rolling]
+            choice = table[seat, before, totals[:, None]]
+
+            moves = ~was_out & (choice >= 0)
+            after = np.where(moves, before & ~choice, before)
+            shut_now = moves & (after == 0)
+            # seats after the first player to shut the box never get to submit
+            blocked = np.cumsum(shut_now, axis=1) - shut_now > 0
+            masks[rolling] = np.where(blocked, before, after)
+            out[rolling] = was_out | (~was_out & (choice < 0) & ~blocked)
+
+            round_shut = shut_now.any(axis=1)
+            shut[rolling] = round_shut
+            in_round[rolling[round_shut | out[rolling].all(axis=1)]] = False
+
+        scores[current] += sums[masks]
+        summary['rounds'] += len(current)
+        summary['shut_rounds'] += int(shut.sum())
+        playing[current[scores[current].max(axis=1) >= target]] = False
+
+    summary['games'] = games
+    summary['wins'] = np.bincount(scores.argmin(axis=1), minlength=players).tolist()
+    return summary
+
+
+ENGINES = {'rules': simulate_rules, 'numpy': simulate_numpy}
+MAX_BATCH = 100000
+
+
+def _run_batch(args):
+    engine_name, games, players, max_tiles, strategy_name, seed, target = args
+    return ENGINES[engine_name](games, max_tiles, load_strategies(strategy_name, players), seed, target)
+
+
+def simulate(engine_name, games, players, max_tiles, strategy_name, seed=None, workers=1,
+             target=rules.WINNING_SCORE, batch=None):
+    seed = random.randrange(2 ** 32) if seed is None else seed
+    # Split the games evenly so every worker gets a share, in batches small
+    # enough for the numpy engine's arrays.
+    batch = batch or max(1, min(MAX_BATCH, -(-games // max(workers, 1))))
+    sizes = [batch] * (games // batch) + ([games % batch] if games % batch else [])
+    batches = [(engine_name, size, players, max_tiles, strategy_name, seed + i, target)
+               for i, size in enumerate(sizes)]
+    if workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            return merge_summaries(pool.map(_run_batch, batches))
+    return merge_summaries([_run_batch(b) for b in batches])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m app.simulation',
+        description='Simulate complete games of Shut the Box and report games per second.')
+    parser.add_argument('-n', '--games', type=int, default=100000)
+    parser.add_argument('-p', '--players', type=int, default=4, choices=range(1, 13), metavar='1-12')
+    parser.add_argument('-t', '--tiles', type=int, default=10, choices=(10, 12))
+    parser.add_argument('-s', '--strategy', default='highest',
+                        help=f'{", ".join(STRATEGIES)} or module:function; a comma-separated list '
+                             'assigns strategies to seats in turn (default highest)')
+    parser.add_argument('-e', '--engine', default='rules', choices=ENGINES,
+                        help='rules runs the game rules module; numpy runs games in vectorised batches')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='processes to spread batches over')
+    parser.add_argument('--target', type=int, default=rules.WINNING_SCORE, help='score that ends the game')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    try:
+        strategies = load_strategies(args.strategy, args.players)
+    except (ValueError, ImportError, AttributeError) as e:
+        parser.error(str(e))
+    if args.engine == 'numpy':
+        try:
+            import numpy
+        except ImportError:
+            parser.error('the numpy engine needs numpy (pip install numpy)')
+        if any(getattr(s, 'randomised', False) for s in strategies):
+            parser.error('the numpy engine needs deterministic strategies')
+
+    start = time.perf_counter()
+    summary = simulate(args.engine, args.games, args.players, args.tiles, args.strategy,
+                       seed=args.seed, workers=args.workers, target=args.target)
+    elapsed = time.perf_counter() - start
+
+    games = summary['games']
+    print(f'{games} games, {args.players} players, {args.tiles} tiles, first to {args.target}, '
+          f'strategy {args.strategy}, {args.engine} engine, {args.workers} worker(s)')
+    print(f'  {elapsed:.2f} s  {games / elapsed:,.0f} games/s')
+    print(f'  {summary["rounds"] / games:.2f} rounds per game, '
+          f'box shut in {summary["shut_rounds"] / summary["rounds"]:.1%} of rounds')
+    print('  wins by seat: ' + ' '.join(f'{w / games:.1%}' for w in summary['wins']))
+
+
+if __name__ == '__main__':
+    main()
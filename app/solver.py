@@ -0,0 +1,123 @@
+import argparse
+import mmap
+import os
+import sys
+import time
+from array import array
+
+from app import engine
+
+MAGIC = b'STBSOLV1'
+TOTALS = engine.MAX_TOTAL + 1
+DICE_ODDS = {total: (6 - abs(total - 7)) / 36 for total in range(engine.MIN_TOTAL, engine.MAX_TOTAL + 1)}
+BEST_BYTES = engine.MASK_COUNT * TOTALS * 2
+EXPECTED_BYTES = engine.MASK_COUNT * 4
+TABLE_BYTES = len(MAGIC) + BEST_BYTES + EXPECTED_BYTES
+
+
+def build():
+    expected = [0.0] * engine.MASK_COUNT
+    best = array('H', bytes(BEST_BYTES))
+    for mask in range(1, engine.MASK_COUNT):
+        value = 0.0
+        for total, odds in DICE_ODDS.items():
+            flips = engine.legal_flips(mask, total)
+            if not flips:
+                value += odds * engine.SUMS[mask]
+                continue
+            choice = min(flips, key=lambda flip: expected[mask & ~flip])
+            best[mask * TOTALS + total] = choice
+            value += odds * expected[mask & ~choice]
+        expected[mask] = value
+    return best, array('f', expected)
+
+
+def write(path, best, expected):
+    if sys.byteorder != 'little':
+        best, expected = array('H', best), array('f', expected)
+        best.byteswap()
+        expected.byteswap()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC)
+        f.write(best.tobytes())
+        f.write(expected.tobytes())
+    os.replace(tmp, path)
+
+
+class SolverTable:
+    def __init__(self, best, expected):
+        self.best = best
+        self.expected = expected
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(buffer) != TABLE_BYTES or buffer[:len(MAGIC)] != MAGIC:
+            buffer.close()
+            raise ValueError(f'{path} is not a solver table')
+        if sys.byteorder != 'little':
+            data = buffer[len(MAGIC):]
+            buffer.close()
+            best, expected = array('H', data[:BEST_BYTES]), array('f', data[BEST_BYTES:])
+            best.byteswap()
+            expected.byteswap()
+            return cls(best, expected)
+        view = memoryview(buffer)[len(MAGIC):]
+        return cls(view[:BEST_BYTES].cast('H'), view[BEST_BYTES:].cast('f'))
+
+    def best_flip(self, mask, total):
+        return self.best[mask * TOTALS + total]
+
+    def expected_score(self, mask):
+        return self.expected[mask]
+
+
+class Solver:
+    def __init__(self):
+        self.path = None
+        self.table = None
+
+    def init_app(self, app):
+        self.path = app.config.get('SOLVER_TABLE') or os.path.join(app.instance_path, 'solver.bin')
+        self.table = self._open()
+
+    def _open(self):
+        try:
+            return SolverTable.load(self.path)
+        except (OSError, ValueError):
+            pass
+        best, expected = build()
+        try:
+            write(self.path, best, expected)
+        except OSError:
+            return SolverTable(best, expected)
+        return SolverTable.load(self.path)
+
+    def hint(self, mask, total):
+        flip = self.table.best_flip(mask, total)
+        if not flip:
+            return None
+        return flip, self.table.expected_score(mask & ~flip)
+
+
+solver = Solver()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m app.solver',
+        description='Build the optimal-move table used for hints.')
+    parser.add_argument('path', nargs='?', default=os.path.join('instance', 'solver.bin'))
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    best, expected = build()
+    write(args.path, best, expected)
+    print(f'wrote {args.path} ({TABLE_BYTES} bytes) in {time.perf_counter() - start:.2f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+import time
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import and_, bindparam, case, delete, func, insert, or_, select, update
+
+from app import db
+from app.models import ArchivedGame, ArchivedGamePlayer, Game, GamePlayer, GameRound, User, UserStats
+from app.users import LocalBackend
+
+LEADERBOARD_PAGE_SIZE = 20
+RANK_ORDER = (UserStats.wins.desc(), UserStats.average_score, UserStats.user_id)
+
+ROUND_END = (update(UserStats.__table__)
+             .where(UserStats.user_id == bindparam('player'))
+             .values(rounds_played=UserStats.rounds_played + 1,
+                     shut_boxes=UserStats.shut_boxes + bindparam('shut')))
+
+GAME_END = (update(UserStats.__table__)
+            .where(UserStats.user_id == bindparam('player'))
+            .values(games_played=UserStats.games_played + 1,
+                    wins=UserStats.wins + bindparam('won'),
+                    total_score=UserStats.total_score + bindparam('score'),
+                    average_score=(UserStats.total_score + bindparam('score')) / (UserStats.games_played + 1.0)))
+
+
+def ranked_ahead(wins, average_score, user_id):
+    return or_(UserStats.wins > wins, and_(UserStats.wins == wins, or_(
+        UserStats.average_score < average_score,
+        and_(UserStats.average_score == average_score, UserStats.user_id < user_id))))
+
+
+def ranked_behind(wins, average_score, user_id):
+    return or_(UserStats.wins < wins, and_(UserStats.wins == wins, or_(
+        UserStats.average_score > average_score,
+        and_(UserStats.average_score == average_score, UserStats.user_id > user_id))))
+
+
+class PlayerStats:
+    def __init__(self):
+        self.cache = None
+        self.size = 0
+        self.ttl = 0
+
+    def init_app(self, app):
+        self.size = app.config.get('STATS_CACHE_SIZE', 0)
+        self.ttl = app.config.get('STATS_CACHE_TTL', 30)
+        self.cache = LocalBackend(self.size) if self.size > 0 else None
+        app.cli.add_command(rebuild_stats_command)
+
+    def record(self, game, players, moves):
+        kinds = [move['kind'] for move in moves]
+        if 'round_end' not in kinds:
+            return False
+
+        humans = [p for p in players if not p.user.is_bot]
+        if not humans:
+            return False
+
+        db.session.execute(ROUND_END, [
+            {'player': p.user_id, 'shut': int(p.tiles_mask == 0)} for p in humans
+        ])
+        if 'game_end' in kinds:
+            db.session.execute(GAME_END, [
+                {'player': p.user_id, 'won': int(p.user_id == game.winner_id), 'score': p.score}
+                for p in humans
+            ])
+        return True
+
+    def invalidate(self):
+        if self.cache:
+            self.cache = LocalBackend(self.size)
+
+    def leaderboard(self, after=None):
+        return self._cached(('page', after), lambda: self._load_page(after))
+
+    def profile(self, user_id):
+        return self._cached(('user', user_id), lambda: self._load_profile(user_id))
+
+    def _cached(self, key, load):
+        cache = self.cache
+        if cache is None:
+            return load()
+        entry = cache.get(key)
+        if entry is not None and time.monotonic() - entry[0] <= self.ttl:
+            return entry[1]
+        value = load()
+        cache.put(key, (time.monotonic(), value))
+        return value
+
+    def _load_page(self, after):
+        query = (select(UserStats.user_id, User.username, UserStats.games_played, UserStats.wins,
+                        UserStats.average_score, UserStats.rounds_played, UserStats.shut_boxes)
+                 .join(User, User.id == UserStats.user_id)
+                 .where(UserStats.games_played > 0))
+        position = 0
+        if after:
+            wins, average_score, user_id, position = after
+            query = query.where(ranked_behind(wins, average_score, user_id))
+
+        rows = db.session.execute(query.order_by(*RANK_ORDER).limit(LEADERBOARD_PAGE_SIZE + 1)).all()
+        entries = [dict(row._mapping, rank=position + i + 1) for i, row in enumerate(rows[:LEADERBOARD_PAGE_SIZE])]
+        if len(rows) <= LEADERBOARD_PAGE_SIZE:
+            return entries, None
+        last = entries[-1]
+        return entries, (last['wins'], last['average_score'], last['user_id'], last['rank'])
+
+    def _load_profile(self, user_id):
+        stats = db.session.get(UserStats, user_id)
+        if stats is None or not stats.games_played:
+            return None
+        ahead = db.session.scalar(select(func.count()).select_from(UserStats).where(
+            UserStats.games_played > 0, ranked_ahead(stats.wins, stats.average_score, user_id)))
+        return {
+            'games_played': stats.games_played,
+            'wins': stats.wins,
+            'average_score': stats.average_score,
+            'rounds_played': stats.rounds_played,
+            'shut_boxes': stats.shut_boxes,
+            'rank': ahead + 1,
+        }
+
+
+def rebuild(conn):
+    conn.execute(delete(UserStats))
+    conn.execute(insert(UserStats).from_select(['user_id'], select(User.id)))
+    bots = set(conn.scalars(select(User.id).where(User.is_bot)))
+
+    totals = {}
+    for player, game, finished in ((GamePlayer, Game, Game.status == 'finished'),
+                                   (ArchivedGamePlayer, ArchivedGame, True)):
+        rows = conn.execute(
+            select(player.user_id, func.count(), func.sum(case((game.winner_id == player.user_id, 1), else_=0)),
+                   func.sum(func.coalesce(player.score, 0)))
+            .join(game, game.id == player.game_id)
+            .where(finished)
+            .group_by(player.user_id)
+        )
+        for user_id, games, wins, score in rows:
+            total = totals.setdefault(user_id, [0, 0, 0, 0, 0])
+            total[0] += games
+            total[1] += wins
+            total[2] += score
+    for user_id, rounds, shut in conn.execute(
+            select(GameRound.user_id, func.count(), func.sum(case((GameRound.score == 0, 1), else_=0)))
+            .group_by(GameRound.user_id)):
+        total = totals.setdefault(user_id, [0, 0, 0, 0, 0])
+        total[3] += rounds
+        total[4] += shut
+
+    rows = [
+        {'player': user_id, 'games': games, 'wins': wins, 'score': score,
+         'average': score / games if games else 0, 'rounds': rounds, 'shut': shut}
+        for user_id, (games, wins, score, rounds, shut) in totals.items() if user_id not in bots
+    ]
+    if rows:
+        conn.execute(update(UserStats.__table__).where(UserStats.user_id == bindparam('player')).values(
+            games_played=bindparam('games'), wins=bindparam('wins'), total_score=bindparam('score'),
+            average_score=bindparam('average'), rounds_played=bindparam('rounds'),
+            shut_boxes=bindparam('shut')), rows)
+    return len(rows)
+
+
+@click.command('rebuild-stats')
+@with_appcontext
+def rebuild_stats_command():
+    """Recompute player statistics from all finished and archived games."""
+    count = rebuild(db.session.connection())
+    db.session.commit()
+    click.echo(f'rebuilt statistics for {count} players')
+
+
+player_stats = PlayerStats()
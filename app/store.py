@@ -0,0 +1,100 @@
+import fcntl
+import json
+import os
+import threading
+import time
+
+
+class MemoryBackend:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, game_id):
+        return self._entries.get(game_id)
+
+    def put(self, game_id, snapshot):
+        with self._lock:
+            current = self._entries.get(game_id)
+            if current is None or current['version'] <= snapshot['version']:
+                self._entries[game_id] = snapshot
+
+    def discard(self, game_id):
+        with self._lock:
+            self._entries.pop(game_id, None)
+
+
+class SharedBackend:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock_path = os.path.join(path, '.lock')
+
+    def _file(self, game_id):
+        return os.path.join(self.path, f'{game_id}.json')
+
+    def get(self, game_id):
+        try:
+            with open(self._file(game_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, game_id, snapshot):
+        tmp = os.path.join(self.path, f'.{game_id}.{os.getpid()}.{threading.get_ident()}')
+        with open(tmp, 'w') as f:
+            json.dump(snapshot, f)
+        with open(self._lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            current = self.get(game_id)
+            if current is None or current['version'] <= snapshot['version']:
+                os.replace(tmp, self._file(game_id))
+            else:
+                os.unlink(tmp)
+
+    def discard(self, game_id):
+        with open(self._lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                os.unlink(self._file(game_id))
+            except FileNotFoundError:
+                pass
+
+
+class GameStore:
+    def __init__(self):
+        self.backend = None
+        self.ttl = 0
+
+    def init_app(self, app):
+        setting = app.config.get('GAME_STATE_STORE', '')
+        if setting == 'memory':
+            self.backend = MemoryBackend()
+        elif setting:
+            self.backend = SharedBackend(setting)
+        else:
+            self.backend = None
+        self.ttl = app.config.get('GAME_STATE_TTL', 30)
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def get(self, game_id):
+        if not self.backend:
+            return None
+        snapshot = self.backend.get(game_id)
+        if snapshot is None or time.time() - snapshot['stored_at'] > self.ttl:
+            return None
+        return snapshot
+
+    def put(self, game_id, snapshot):
+        if self.backend:
+            self.backend.put(game_id, dict(snapshot, stored_at=time.time()))
+
+    def discard(self, game_id):
+        if self.backend:
+            self.backend.discard(game_id)
+
+
+game_store = GameStore()
@@ -0,0 +1,416 @@
+import logging
+import random
+import threading
+from datetime import datetime, timedelta
+
+from flask import Blueprint, abort, current_app, flash, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+from sqlalchemy import bindparam, delete, func, insert, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+
+from app import bots, db, engine, rules
+from app.bots import bot_runner
+from app.dice import dice_service
+from app.events import game_events
+from app.history import game_history
+from app.models import Game, GameMove, GamePlayer, Tournament, TournamentEntry, User
+from app.store import game_store
+
+logger = logging.getLogger(__name__)
+
+tournaments_bp = Blueprint('tournaments', __name__)
+
+TOURNAMENT_PAGE_SIZE = 20
+STANDINGS_SIZE = 50
+MAX_TABLE_SIZE = 12
+
+STANDINGS = (update(TournamentEntry.__table__)
+             .where(TournamentEntry.tournament_id == bindparam('tournament'),
+                    TournamentEntry.user_id == bindparam('player'))
+             .values(score=bindparam('score'), rounds_played=bindparam('rounds'),
+                     finished=bindparam('finished')))
+
+
+@tournaments_bp.route('/tournaments')
+@login_required
+def list_tournaments():
+    tournaments = (Tournament.query.options(joinedload(Tournament.creator))
+                   .filter(Tournament.status.in_(['waiting', 'playing']))
+                   .order_by(Tournament.created_at.desc(), Tournament.id.desc())
+                   .limit(TOURNAMENT_PAGE_SIZE).all())
+    tournament_ids = [t.id for t in tournaments]
+    joined_ids = set(db.session.scalars(select(TournamentEntry.tournament_id).where(
+        TournamentEntry.user_id == current_user.id,
+        TournamentEntry.tournament_id.in_(tournament_ids)
+    ))) if tournament_ids else set()
+    return render_template('tournaments/list.html', tournaments=tournaments, joined_ids=joined_ids)
+
+
+@tournaments_bp.route('/tournaments/create', methods=['GET', 'POST'])
+@login_required
+def create_tournament():
+    if request.method == 'POST':
+        name = request.form.get('name', '').strip()
+
+        if len(name) < 3:
+            flash('Tournament name must be at least 3 characters long.', 'error')
+            return render_template('tournaments/create.html')
+
+        try:
+            max_tiles = int(request.form.get('max_tiles', '10'))
+            table_size = int(request.form.get('table_size', '4'))
+        except ValueError:
+            flash('Invalid settings.', 'error')
+            return render_template('tournaments/create.html')
+
+        if max_tiles not in [10, 12]:
+            flash('Max tiles must be 10 or 12.', 'error')
+            return render_template('tournaments/create.html')
+
+        if table_size < 1 or table_size > MAX_TABLE_SIZE:
+            flash(f'Players per table must be between 1 and {MAX_TABLE_SIZE}.', 'error')
+            return render_template('tournaments/create.html')
+
+        tournament = Tournament(name=name, max_tiles=max_tiles, table_size=table_size,
+                                created_by=current_user.id, player_count=1)
+        db.session.add(tournament)
+        db.session.flush()
+        db.session.add(TournamentEntry(tournament_id=tournament.id, user_id=current_user.id))
+        db.session.commit()
+
+        flash(f'Tournament "{name}" created successfully!', 'success')
+        return redirect(url_for('tournaments.view_tournament', tournament_id=tournament.id))
+
+    return render_template('tournaments/create.html')
+
+
+@tournaments_bp.route('/tournaments/<int:tournament_id>')
+@login_required
+def view_tournament(tournament_id):
+    tournament = db.session.get(Tournament, tournament_id) or abort(404)
+    entry = find_entry(tournament_id, current_user.id)
+    standings = (TournamentEntry.query.options(joinedload(TournamentEntry.user))
+                 .filter_by(tournament_id=tournament_id)
+                 .order_by(TournamentEntry.score, TournamentEntry.user_id)
+                 .limit(STANDINGS_SIZE).all())
+    position = None
+    if entry is not None and tournament.status != 'waiting':
+        position = db.session.scalar(select(func.count()).select_from(TournamentEntry).where(
+            TournamentEntry.tournament_id == tournament_id,
+            (TournamentEntry.score < entry.score) |
+            ((TournamentEntry.score == entry.score) & (TournamentEntry.user_id < entry.user_id))
+        )) + 1
+    return render_template('tournaments/view.html', tournament=tournament, entry=entry,
+                          standings=standings, position=position,
+                          is_creator=tournament.created_by == current_user.id)
+
+
+@tournaments_bp.route('/tournaments/<int:tournament_id>/join', methods=['POST'])
+@login_required
+def join_tournament(tournament_id):
+    tournament = db.session.get(Tournament, tournament_id) or abort(404)
+    view_url = url_for('tournaments.view_tournament', tournament_id=tournament_id)
+
+    if tournament.status != 'waiting':
+        flash('This tournament has already started.', 'error')
+        return redirect(view_url)
+
+    if find_entry(tournament_id, current_user.id):
+        flash('You have already joined this tournament.', 'error')
+        return redirect(view_url)
+
+    try:
+        joined = add_entry(tournament_id, current_user.id)
+    except IntegrityError:
+        db.session.rollback()
+        flash('You have already joined this tournament.', 'error')
+        return redirect(view_url)
+    if not joined:
+        flash('This tournament has already started.', 'error')
+        return redirect(view_url)
+
+    flash(f'You have joined "{tournament.name}"!', 'success')
+    return redirect(view_url)
+
+
+@tournaments_bp.route('/tournaments/<int:tournament_id>/bots', methods=['POST'])
+@login_required
+def add_bot(tournament_id):
+    tournament = db.session.get(Tournament, tournament_id) or abort(404)
+    view_url = url_for('tournaments.view_tournament', tournament_id=tournament_id)
+
+    if tournament.created_by != current_user.id:
+        flash('Only the host can add bots.', 'error')
+        return redirect(view_url)
+
+    if tournament.status != 'waiting':
+        flash('This tournament has already started.', 'error')
+        return redirect(view_url)
+
+    entered = db.session.scalars(select(TournamentEntry.user_id).where(
+        TournamentEntry.tournament_id == tournament_id)).all()
+    bot = bots.find_bot_user(entered)
+    db.session.flush()
+    name = bot.username
+    try:
+        joined = add_entry(tournament_id, bot.id)
+    except IntegrityError:
+        db.session.rollback()
+        flash(f'{name} has just joined, please try again.', 'error')
+        return redirect(view_url)
+    if not joined:
+        flash('This tournament has already started.', 'error')
+        return redirect(view_url)
+
+    flash(f'{name} joined the tournament.', 'success')
+    return redirect(view_url)
+
+
+@tournaments_bp.route('/tournaments/<int:tournament_id>/leave', methods=['POST'])
+@login_required
+def leave_tournament(tournament_id):
+    tournament = db.session.get(Tournament, tournament_id) or abort(404)
+
+    if tournament.status != 'waiting':
+        flash('Cannot leave a tournament that has already started.', 'error')
+        return redirect(url_for('tournaments.view_tournament', tournament_id=tournament_id))
+
+    if tournament.created_by == current_user.id:
+        db.session.execute(delete(TournamentEntry).where(TournamentEntry.tournament_id == tournament_id))
+        db.session.delete(tournament)
+        db.session.commit()
+        flash('Tournament has been deleted.', 'info')
+        return redirect(url_for('tournaments.list_tournaments'))
+
+    removed = db.session.execute(delete(TournamentEntry).where(
+        TournamentEntry.tournament_id == tournament_id,
+        TournamentEntry.user_id == current_user.id
+    )).rowcount
+    if removed:
+        db.session.execute(update(Tournament).where(Tournament.id == tournament_id)
+                           .values(player_count=Tournament.player_count - 1))
+    db.session.commit()
+    flash('You have left the tournament.', 'info')
+    return redirect(url_for('tournaments.list_tournaments'))
+
+
+@tournaments_bp.route('/tournaments/<int:tournament_id>/start', methods=['POST'])
+@login_required
+def start_tournament(tournament_id):
+    tournament = db.session.get(Tournament, tournament_id) or abort(404)
+    view_url = url_for('tournaments.view_tournament', tournament_id=tournament_id)
+
+    if tournament.created_by != current_user.id:
+        flash('Only the host can start the tournament.', 'error')
+        return redirect(view_url)
+
+    # Claiming the waiting tournament makes a second click a no-op instead of
+    # seating everyone twice.
+    claimed = db.session.execute(
+        update(Tournament)
+        .where(Tournament.id == tournament_id, Tournament.status == 'waiting')
+        .values(status='playing', rolled_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        db.session.rollback()
+        flash('This tournament has already started.', 'error')
+        return redirect(view_url)
+
+    db.session.refresh(tournament)
+    tables = seat_tables(tournament)
+    db.session.commit()
+
+    flash(f'Tournament started at {tables} tables!', 'success')
+    return redirect(view_url)
+
+
+def find_entry(tournament_id, user_id):
+    return TournamentEntry.query.filter_by(tournament_id=tournament_id, user_id=user_id).first()
+
+
+def add_entry(tournament_id, user_id):
+    # Counting the player only while the tournament still waits locks its row, so a
+    # start either sees this entry or makes the count match nothing.
+    counted = db.session.execute(
+        update(Tournament)
+        .where(Tournament.id == tournament_id, Tournament.status == 'waiting')
+        .values(player_count=Tournament.player_count + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not counted:
+        db.session.rollback()
+        return False
+    db.session.add(TournamentEntry(tournament_id=tournament_id, user_id=user_id))
+    db.session.commit()
+    return True
+
+
+def seat_tables(tournament):
+    entries = TournamentEntry.query.filter_by(tournament_id=tournament.id).all()
+    random.shuffle(entries)
+    size = tournament.table_size
+
+    tables = []
+    for number, start in enumerate(range(0, len(entries), size), 1):
+        seats = entries[start:start + size]
+        game = Game(name=f'{tournament.name} - Table {number}', max_tiles=tournament.max_tiles,
+                    max_players=len(seats), created_by=tournament.created_by, status='waiting',
+                    player_count=len(seats), tournament_id=tournament.id)
+        for entry in seats:
+            game.players.append(GamePlayer(user_id=entry.user_id,
+                                           tiles_mask=engine.full_mask(tournament.max_tiles)))
+        game_history.begin(game)
+        rules.start(game, game.players)
+        tables.append((game, seats))
+
+    db.session.add_all(game for game, _ in tables)
+    db.session.flush()
+    for game, seats in tables:
+        game_history.record(game, game.players)
+        for entry in seats:
+            entry.game_id = game.id
+    return len(tables)
+
+
+def record_standings(game, players, moves):
+    if game.tournament_id is None or not any(move['kind'] == 'round_end' for move in moves):
+        return
+
+    db.session.execute(STANDINGS, [
+        {'tournament': game.tournament_id, 'player': p.user_id, 'score': p.score,
+         'rounds': game.current_round, 'finished': game.status == 'finished'}
+        for p in players
+    ])
+
+
+def roll_tournament(tournament_id, seen, now, dice=None):
+    # Every worker runs the scheduler; the compare-and-set on roll_count lets
+    # exactly one of them roll each tick.
+    roll = seen + 1
+    claimed = db.session.execute(
+        update(Tournament)
+        .where(Tournament.id == tournament_id, Tournament.roll_count == seen)
+        .values(roll_count=roll, rolled_at=now)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        db.session.rollback()
+        return []
+
+    dice1, dice2 = dice or dice_service.tournament_roll(tournament_id, roll)
+    max_tiles = db.session.scalar(select(Tournament.max_tiles).where(Tournament.id == tournament_id))
+    tables = (Game.tournament_id == tournament_id) & (Game.status == 'playing')
+    marked = (Game.tournament_id == tournament_id) & (Game.tournament_roll == roll)
+
+    # Tables that finished a round move on to the next one before the roll, so
+    # the whole tournament plays the same dice.
+    db.session.execute(
+        update(Game)
+        .where(tables, Game.round_phase == 'round_end')
+        .values(current_round=Game.current_round + 1, round_phase='rolling', dice1=0, dice2=0,
+                version=Game.version + 1, move_count=Game.move_count + 1, tournament_roll=roll)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        update(GamePlayer)
+        .where(GamePlayer.game_id.in_(select(Game.id).where(marked)))
+        .values(tiles_mask=engine.full_mask(max_tiles), is_out=False, has_submitted=False, round_score=0)
+        .execution_options(synchronize_session=False)
+    )
+    log_moves(marked & (Game.round_phase == 'rolling'), 'next_round', now)
+
+    db.session.execute(
+        update(Game)
+        .where(tables, Game.round_phase == 'rolling')
+        .values(dice1=dice1, dice2=dice2, round_phase='flipping',
+                version=Game.version + 1, move_count=Game.move_count + 1, tournament_roll=roll)
+        .execution_options(synchronize_session=False)
+    )
+    log_moves(marked, 'roll', now, dice1=dice1, dice2=dice2, dice_counter=roll)
+
+    db.session.execute(update(Tournament).where(Tournament.id == tournament_id)
+                       .values(dice1=dice1, dice2=dice2))
+    db.session.commit()
+
+    game_ids = db.session.scalars(select(Game.id).where(marked)).all()
+    bot_games = db.session.scalars(
+        select(GamePlayer.game_id).distinct()
+        .join(User, User.id == GamePlayer.user_id)
+        .where(User.is_bot, GamePlayer.game_id.in_(select(Game.id).where(marked)))
+    ).all()
+    for game_id in game_ids:
+        game_store.discard(game_id)
+        game_events.publish(game_id, None)
+    for game_id in bot_games:
+        bot_runner.schedule(game_id)
+    return game_ids
+
+
+def log_moves(where, kind, now, dice1=None, dice2=None, dice_counter=None):
+    db.session.execute(insert(GameMove).from_select(
+        ['game_id', 'seq', 'round', 'kind', 'dice1', 'dice2', 'dice_counter', 'created_at'],
+        select(Game.id, Game.move_count, Game.current_round, literal(kind),
+               literal(dice1), literal(dice2), literal(dice_counter), literal(now)).where(where)
+    ))
+
+
+def run_tournaments(now=None):
+    now = now or datetime.utcnow()
+    interval = timedelta(seconds=current_app.config['TOURNAMENT_ROLL_INTERVAL'])
+    rolled = 0
+
+    running = db.session.execute(select(Tournament.id, Tournament.roll_count, Tournament.rolled_at)
+                                 .where(Tournament.status == 'playing')).all()
+    for tournament_id, roll_count, rolled_at in running:
+        phases = dict(db.session.execute(
+            select(Game.round_phase, func.count())
+            .where(Game.tournament_id == tournament_id, Game.status == 'playing')
+            .group_by(Game.round_phase)
+        ).all())
+        if not phases:
+            db.session.execute(update(Tournament).where(Tournament.id == tournament_id)
+                               .values(status='finished'))
+            db.session.commit()
+            continue
+
+        # Roll once every table has moved, or when the slowest ones run out of time.
+        if not phases.get('rolling') and not phases.get('round_end'):
+            continue
+        if phases.get('flipping') and rolled_at and now - rolled_at < interval:
+            continue
+        rolled += len(roll_tournament(tournament_id, roll_count, now))
+
+    db.session.rollback()
+    return rolled
+
+
+class TournamentScheduler:
+    def __init__(self):
+        self._stop = None
+
+    def init_app(self, app):
+        if self._stop:
+            self._stop.set()
+        tick = app.config.get('TOURNAMENT_TICK', 0)
+        if tick > 0:
+            self._stop = threading.Event()
+            threading.Thread(target=self._loop, args=(app, self._stop, tick),
+                             name='tournament-scheduler', daemon=True).start()
+        else:
+            self._stop = None
+
+    def _loop(self, app, stop, tick):
+        while not stop.wait(tick):
+            with app.app_context():
+                try:
+                    run_tournaments()
+                except Exception:
+                    db.session.rollback()
+                    logger.exception('Running tournaments failed')
+                finally:
+                    db.session.remove()
+
+
+tournament_scheduler = TournamentScheduler()
@@ -0,0 +1,167 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from flask_login import UserMixin
+
+from app.metrics import labels, metrics
+
+RESULTS = {'local_hits': 'local_hit', 'shared_hits': 'shared_hit', 'misses': 'miss'}
+
+
+class CachedUser(UserMixin):
+    def __init__(self, id, username, created_at):
+        self.id = id
+        self.username = username
+        self.created_at = created_at
+
+    def __repr__(self):
+        return f'<CachedUser {self.username}>'
+
+
+class LocalBackend:
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+            return entry
+
+    def put(self, user_id, entry):
+        with self._lock:
+            self._entries[user_id] = entry
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+class SharedBackend:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, user_id):
+        return os.path.join(self.path, f'user-{user_id}.json')
+
+    def get(self, user_id):
+        try:
+            with open(self._file(user_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, user_id, entry):
+        tmp = os.path.join(self.path, f'.user-{user_id}.{os.getpid()}.{threading.get_ident()}')
+        with open(tmp, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp, self._file(user_id))
+
+    def discard(self, user_id):
+        try:
+            os.unlink(self._file(user_id))
+        except FileNotFoundError:
+            pass
+
+
+class UserCache:
+    def __init__(self):
+        self.local = None
+        self.shared = None
+        self.ttl = 0
+        self.counts = dict.fromkeys(RESULTS, 0)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        size = app.config.get('USER_CACHE_SIZE', 0)
+        shared = app.config.get('USER_CACHE_SHARED', '')
+        self.local = LocalBackend(size) if size > 0 else None
+        self.shared = SharedBackend(shared) if shared else None
+        self.ttl = app.config.get('USER_CACHE_TTL', 60)
+        with self._lock:
+            self.counts = dict.fromkeys(RESULTS, 0)
+
+    @property
+    def enabled(self):
+        return self.local is not None or self.shared is not None
+
+    def get(self, user_id):
+        if not self.enabled:
+            return None
+
+        entry = self._fresh(self.local, user_id)
+        if entry is not None:
+            self._count('local_hits')
+            return self._to_user(entry)
+
+        entry = self._fresh(self.shared, user_id)
+        if entry is not None:
+            self._count('shared_hits')
+            if self.local:
+                self.local.put(user_id, entry)
+            return self._to_user(entry)
+
+        self._count('misses')
+        return None
+
+    def put(self, user):
+        identity = CachedUser(user.id, user.username, user.created_at)
+        if not self.enabled:
+            return identity
+
+        entry = {
+            'username': user.username,
+            'created_at': user.created_at.isoformat() if user.created_at else None,
+            'stored_at': time.time(),
+        }
+        if self.local:
+            self.local.put(user.id, entry)
+        if self.shared:
+            self.shared.put(user.id, entry)
+        return identity
+
+    def discard(self, user_id):
+        if self.local:
+            self.local.discard(user_id)
+        if self.shared:
+            self.shared.discard(user_id)
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+        lookups = sum(counts.values())
+        hits = counts['local_hits'] + counts['shared_hits']
+        counts['hit_ratio'] = hits / lookups if lookups else 0.0
+        return counts
+
+    def _count(self, result):
+        with self._lock:
+            self.counts[result] += 1
+        metrics.inc('user_cache_lookups_total', labels(result=RESULTS[result]))
+
+    def _fresh(self, backend, user_id):
+        if backend is None:
+            return None
+        entry = backend.get(user_id)
+        if entry is None or time.time() - entry['stored_at'] > self.ttl:
+            return None
+        return dict(entry, id=user_id)
+
+    def _to_user(self, entry):
+        created_at = entry['created_at']
+        return CachedUser(entry['id'], entry['username'],
+                          datetime.fromisoformat(created_at) if created_at else None)
+
+
+user_cache = UserCache()
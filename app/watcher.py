@@ -0,0 +1,105 @@
+import logging
+import threading
+import time
+
+from app import db
+from app.events import game_events
+from app.models import Game
+
+logger = logging.getLogger(__name__)
+
+VERSION_QUERY_CHUNK = 500
+
+
+def changed_snapshots(known):
+    # One query finds which of the watched games moved on; only those are reloaded.
+    # A game that has gone maps to None.
+    from app.games import load_game_snapshot
+
+    ids = list(known)
+    versions = {}
+    for i in range(0, len(ids), VERSION_QUERY_CHUNK):
+        versions.update(db.session.query(Game.id, Game.version).filter(
+            Game.id.in_(ids[i:i + VERSION_QUERY_CHUNK])).all())
+
+    changed = {}
+    for game_id, version in known.items():
+        if game_id not in versions:
+            if version is not None:
+                changed[game_id] = None
+        elif versions[game_id] != version:
+            changed[game_id] = load_game_snapshot(game_id, refresh=True)
+    return changed
+
+
+class GameWatcher:
+    def __init__(self):
+        self.app = None
+        self.interval = 0
+        self._lock = threading.Lock()
+        self._watchers = {}
+        self._versions = {}
+        self._slots = None
+        self._thread = None
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config['GAME_WATCH_INTERVAL']
+        waiters = app.config['GAME_WAITERS_MAX']
+        self._slots = threading.BoundedSemaphore(waiters) if waiters > 0 else None
+
+    def acquire(self):
+        # Each waiting client holds a worker thread, so only so many may wait at once.
+        return self._slots is None or self._slots.acquire(blocking=False)
+
+    def release(self):
+        if self._slots is not None:
+            self._slots.release()
+
+    def watch(self, game_id, version):
+        with self._lock:
+            self._watchers[game_id] = self._watchers.get(game_id, 0) + 1
+            self._versions.setdefault(game_id, version)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='game-watcher', daemon=True)
+                self._thread.start()
+
+    def unwatch(self, game_id):
+        with self._lock:
+            self._watchers[game_id] -= 1
+            if not self._watchers[game_id]:
+                del self._watchers[game_id]
+                self._versions.pop(game_id, None)
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                known = {}
+                for game_id, version in self._versions.items():
+                    # Changes made in this worker were published already.
+                    state = game_events.latest(game_id)[1]
+                    if version is not None and state and state.get('version') is not None:
+                        version = max(version, state['version'])
+                    known[game_id] = version
+            if not known:
+                continue
+
+            with self.app.app_context():
+                try:
+                    changed = changed_snapshots(known)
+                except Exception:
+                    logger.exception('Refreshing watched games failed')
+                    continue
+                finally:
+                    db.session.remove()
+
+            with self._lock:
+                for game_id, snapshot in changed.items():
+                    if game_id in self._versions:
+                        self._versions[game_id] = snapshot['version'] if snapshot else None
+            for game_id, snapshot in changed.items():
+                game_events.publish_newer(game_id, snapshot['state'] if snapshot else {'status': 'deleted'})
+
+
+game_watcher = GameWatcher()
@@ -0,0 +1,63 @@
+"""Compare drawing dice from the counter-based streams with random.randint.
+
+Times ROLLS rolls of two dice drawn with two random.randint calls, one at
+a time from a DiceStream (filled in batches), as one vectorised batch,
+and through the per-game service as a live roll is made (keying the
+game's stream and computing the roll by its move number), with the
+stream key cached and with a fresh HMAC per roll. A live game makes one
+roll per action, so only the simulator can use the batches. Checks that
+a batch, a stream and the scalar function give the same rolls and that
+every face pair comes up about equally often.
+
+Usage: python benchmarks/bench_dice.py [rolls]
+"""
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.dice import DiceService, DiceStream, roll, roll_batch, stream_key
+
+ROLLS = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+KEY = 0x5EED
+
+
+def timed(label, fn, count):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f'  {label:28} {elapsed * 1e9 / count:9.1f} ns/roll  {count / elapsed / 1e6:7.2f} M rolls/s')
+
+
+def main():
+    sample = min(ROLLS, 100000)
+    assert [tuple(pair) for pair in roll_batch(KEY, 0, sample).tolist()] == [roll(KEY, n) for n in range(sample)]
+    stream = DiceStream(KEY)
+    assert [stream() for _ in range(sample)] == [roll(KEY, n) for n in range(sample)]
+    counts = Counter(map(tuple, roll_batch(KEY, 0, ROLLS).tolist()))
+    expected = ROLLS / 36
+    print(f'{ROLLS} rolls; face pairs within {max(abs(c - expected) for c in counts.values()) / expected:.1%} of uniform')
+
+    rng = random.Random(1)
+    timed('random.randint x2', lambda: [(rng.randint(1, 6), rng.randint(1, 6)) for _ in range(ROLLS)], ROLLS)
+    timed('roll() per call', lambda: [roll(KEY, n) for n in range(ROLLS)], ROLLS)
+    stream = DiceStream(KEY)
+    timed('DiceStream per call', lambda: [stream() for _ in range(ROLLS)], ROLLS)
+    timed('roll_batch', lambda: roll_batch(KEY, 0, ROLLS), ROLLS)
+    stream = DiceStream(KEY)
+    timed('DiceStream.take(256)', lambda: [stream.take(256) for _ in range(ROLLS // 256)], ROLLS // 256 * 256)
+
+    service = DiceService()
+    service.secret = b'bench'
+    count = min(ROLLS, 200000)
+    timed('service roll, cached key', lambda: [service.roll(f'game:{n % 1000}', n) for n in range(count)], count)
+    uncached = stream_key.__wrapped__
+    timed('service roll, HMAC per roll',
+          lambda: [roll(uncached(service.secret, f'game:{n % 1000}'), n) for n in range(count)], count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Microbenchmark: recursive subset-sum versus the precomputed bitmask tables.
+
+Usage: python benchmarks/bench_engine.py [iterations]
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import engine
+
+
+def can_sum_to(tiles, target):
+    if target == 0:
+        return True
+    if target < 0 or not tiles:
+        return False
+    for i, tile in enumerate(tiles):
+        if tile <= target:
+            remaining = tiles[:i] + tiles[i+1:]
+            if can_sum_to(remaining, target - tile):
+                return True
+    return False
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rng = random.Random(1)
+    cases = []
+    for _ in range(iterations):
+        mask = rng.randrange(engine.MASK_COUNT)
+        total = rng.randint(1, 6) + rng.randint(1, 6)
+        cases.append((mask, list(engine.mask_to_tiles(mask)), total))
+
+    for mask, tiles, total in cases:
+        assert can_sum_to(tiles, total) == engine.can_make(mask, total)
+
+    recursive = timeit.timeit(lambda: [can_sum_to(t, n) for _, t, n in cases], number=1)
+    lookup = timeit.timeit(lambda: [engine.can_make(m, n) for m, _, n in cases], number=1)
+
+    # The worst case for the recursion is a full board that cannot reach the total.
+    worst_tiles = [2, 4, 6, 8, 10, 12]
+    worst_mask = engine.tiles_to_mask(worst_tiles)
+    worst_recursive = timeit.timeit(lambda: can_sum_to(worst_tiles, 11), number=1000)
+    worst_lookup = timeit.timeit(lambda: engine.can_make(worst_mask, 11), number=1000)
+
+    print(f'random boards ({iterations} checks)')
+    print(f'  recursion: {recursive / iterations * 1e6:8.2f} us/check')
+    print(f'  lookup:    {lookup / iterations * 1e6:8.2f} us/check  ({recursive / lookup:.0f}x)')
+    print('unreachable total on an even board')
+    print(f'  recursion: {worst_recursive / 1000 * 1e6:8.2f} us/check')
+    print(f'  lookup:    {worst_lookup / 1000 * 1e6:8.2f} us/check  ({worst_recursive / worst_lookup:.0f}x)')
+
+
+if __name__ == '__main__':
+    main()
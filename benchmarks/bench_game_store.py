@@ -0,0 +1,119 @@
+"""p50/p99 latency per game action with and without the game-state store.
+
+Usage: python benchmarks/bench_game_store.py [players] [games]
+"""
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app, db, engine
+from app.models import Game, GamePlayer, User
+
+POLLS_PER_ACTION = 3
+
+
+def make_app(store):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    os.environ['GAME_STATE_STORE'] = store
+    return create_app(), path
+
+
+def setup(app, players, games):
+    with app.app_context():
+        users = [User(username=f'store{i}', password_hash='x') for i in range(players)]
+        db.session.add_all(users)
+        db.session.flush()
+        game_ids = []
+        for g in range(games):
+            game = Game(name=f'Store {g}', max_tiles=10, max_players=12,
+                        created_by=users[0].id, status='waiting')
+            db.session.add(game)
+            db.session.flush()
+            db.session.add_all(GamePlayer(game_id=game.id, user_id=u.id, tiles_mask=engine.full_mask(10))
+                               for u in users)
+            game_ids.append(game.id)
+        db.session.commit()
+        return game_ids, [u.id for u in users]
+
+
+def client_for(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+    return client
+
+
+def timed(latencies, name, call):
+    start = time.perf_counter()
+    response = call()
+    latencies[name].append(time.perf_counter() - start)
+    return response
+
+
+def play(app, game_id, user_ids, clients, latencies):
+    host = clients[0]
+    timed(latencies, 'start', lambda: host.post(f'/games/{game_id}/start'))
+    while True:
+        with app.app_context():
+            game = db.session.get(Game, game_id)
+            phase, total = game.round_phase, game.get_dice_total()
+            masks = {p.user_id: (p.tiles_mask, p.is_out or p.has_submitted)
+                     for p in GamePlayer.query.filter_by(game_id=game_id)}
+            if game.status == 'finished':
+                return
+        for client in clients:
+            for _ in range(POLLS_PER_ACTION):
+                timed(latencies, 'state', lambda: client.get(f'/games/{game_id}/state'))
+        if phase == 'rolling':
+            timed(latencies, 'roll', lambda: host.post(f'/games/{game_id}/roll'))
+        elif phase == 'round_end':
+            timed(latencies, 'next_round', lambda: host.post(f'/games/{game_id}/next-round'))
+        else:
+            for user_id, client in zip(user_ids, clients):
+                mask, done = masks[user_id]
+                if done:
+                    continue
+                flips = engine.legal_flips(mask, total)
+                if flips:
+                    tiles = ','.join(str(t) for t in engine.mask_to_tiles(flips[-1]))
+                    timed(latencies, 'flip', lambda: client.post(f'/games/{game_id}/flip', data={'tiles': tiles}))
+                else:
+                    timed(latencies, 'pass', lambda: client.post(f'/games/{game_id}/pass'))
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    games = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    shared_dir = tempfile.mkdtemp(dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+
+    for label, store in (('database', ''), ('memory', 'memory'), ('shared', shared_dir)):
+        app, path = make_app(store)
+        game_ids, user_ids = setup(app, players, games)
+        clients = [client_for(app, user_id) for user_id in user_ids]
+        latencies = defaultdict(list)
+        for game_id in game_ids:
+            play(app, game_id, user_ids, clients, latencies)
+        print(f'{label} ({players} players, {games} games)')
+        for name, values in sorted(latencies.items()):
+            print(f'  {name:<11} n={len(values):5d}  p50={statistics.median(values) * 1000:7.3f} ms  '
+                  f'p99={percentile(values, 0.99) * 1000:7.3f} ms')
+        os.unlink(path)
+    shutil.rmtree(shared_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Measure the move log: cost per action, replay and the round breakdown.
+
+Plays GAMES all-bot games of four players through run_game_action, first
+without and then with the move log, and reports the time per action.
+Then plays one long game to LONG_TARGET points and times replaying it
+from its latest snapshot, replaying it from the start as a rebuild
+without snapshots would, and reading the round breakdown that the
+results page shows.
+
+Usage: python benchmarks/bench_history.py [games] [long_target]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+fd, DB_PATH = tempfile.mkstemp(suffix='.db')
+os.close(fd)
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+os.environ['GAME_REAPER_INTERVAL'] = '0'
+os.environ['BOT_WORKERS'] = '0'
+
+from app import bots, create_app, db, engine, rules
+from app.games import run_game_action
+from app.history import capture, game_history
+from app.models import Game, GameMove, GamePlayer, GameSnapshot, User
+
+GAMES = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+LONG_TARGET = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+PLAYERS = 4
+RUNS = 20
+
+
+def new_game(user_ids):
+    game = Game(name='bench', max_tiles=10, max_players=PLAYERS, created_by=user_ids[0],
+                status='waiting', player_count=PLAYERS)
+    for user_id in user_ids:
+        game.players.append(GamePlayer(user_id=user_id, tiles_mask=engine.full_mask(10)))
+    db.session.add(game)
+    db.session.commit()
+    game_id = game.id
+    run_game_action(game_id, lambda game, players: rules.start(game, players))
+    return game_id
+
+
+def play(game_id):
+    actions = 0
+    while db.session.get(Game, game_id).status == 'playing':
+        run_game_action(game_id, bots.act)
+        db.session.remove()
+        actions += 1
+    return actions
+
+
+def play_games(user_ids):
+    actions = 0
+    start = time.perf_counter()
+    for _ in range(GAMES):
+        actions += play(new_game(user_ids))
+    return actions, (time.perf_counter() - start) / actions * 1000
+
+
+def timed(fn):
+    fn()
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        fn()
+    return (time.perf_counter() - start) / RUNS * 1000
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        users = [User(username=f'Bot {i}', password_hash='!', is_bot=True) for i in range(PLAYERS)]
+        db.session.add_all(users)
+        db.session.commit()
+        user_ids = [u.id for u in users]
+
+        begin = game_history.begin
+        game_history.begin = lambda game: None
+        actions, off_ms = play_games(user_ids)
+        game_history.begin = begin
+        print(f'{GAMES} games of {PLAYERS} bots, {actions} actions')
+        print(f'  per action without the log  {off_ms:8.3f} ms')
+        actions, on_ms = play_games(user_ids)
+        moves = GameMove.query.count()
+        print(f'  per action with the log     {on_ms:8.3f} ms  ({moves / GAMES:.0f} moves per game)')
+
+        rules.WINNING_SCORE = LONG_TARGET
+        game_id = new_game(user_ids)
+        play(game_id)
+        game = db.session.get(Game, game_id)
+        stored = capture(game, game.players)
+        snapshots = GameSnapshot.query.filter_by(game_id=game_id).count()
+        print(f'long game to {LONG_TARGET} points: {game.current_round} rounds, {game.move_count} moves, '
+              f'{snapshots} snapshots every {app.config["GAME_SNAPSHOT_INTERVAL"]} moves')
+        assert capture(*game_history.replay(game_id)) == stored
+
+        def replay():
+            game_history.replay(game_id)
+            db.session.rollback()
+
+        def breakdown():
+            game_history.rounds(game_id)
+            db.session.rollback()
+
+        print(f'  replay from latest snapshot {timed(replay):8.2f} ms')
+        print(f'  round breakdown             {timed(breakdown):8.2f} ms')
+
+        GameSnapshot.query.filter(GameSnapshot.game_id == game_id, GameSnapshot.seq > 1).delete()
+        db.session.commit()
+        assert capture(*game_history.replay(game_id)) == stored
+        print(f'  replay of the whole log     {timed(replay):8.2f} ms')
+    os.unlink(DB_PATH)
+
+
+if __name__ == '__main__':
+    main()
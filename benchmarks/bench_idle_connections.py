@@ -0,0 +1,182 @@
+"""Memory held by idle game-event connections, per server mode.
+
+Opens CONNECTIONS event streams (/games/<id>/events) for one game, waits
+for each to receive its first event and then leaves them idle. Reports
+the server's resident memory before and after and the connections that
+fit in 1 GB. It also times a fresh /state request while the streams are
+held. This runs once against the ASGI sidecar under uvicorn and once
+against gunicorn gthread, where every stream occupies a thread, so that
+run is capped at THREADS connections.
+
+Usage: python benchmarks/bench_idle_connections.py [connections] [threads]
+"""
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+CONNECTIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+THREADS = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+CONNECT_CONCURRENCY = 200
+
+
+def seed(workdir):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'idle.db')
+    os.environ['BOT_WORKERS'] = '0'
+    os.environ['GAME_REAPER_INTERVAL'] = '0'
+    from app import create_app, db, engine
+    from app.models import Game, GamePlayer, User
+
+    app = create_app()
+    with app.app_context():
+        user = User(username='idle', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        game = Game(name='Idle', max_tiles=10, max_players=12, created_by=user.id, status='playing',
+                    round_phase='rolling', current_round=1, player_count=1)
+        game.players.append(GamePlayer(user_id=user.id, tiles_mask=engine.full_mask(10)))
+        db.session.add(game)
+        db.session.commit()
+        game_id, user_id = game.id, user.id
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+    return game_id, client.get_cookie('session').value
+
+
+def rss_kb(pid):
+    # the server process and all of its descendants
+    children = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+            except OSError:
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/status') as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+        except (OSError, StopIteration):
+            pass
+    return total
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start(command, port):
+    env = dict(os.environ, GAME_STREAM_KEEPALIVE='600', GAME_WAITERS_MAX='0',
+               GAME_STREAM_LIFETIME='3600')
+    server = subprocess.Popen(command, cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            time.sleep(1)
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit(f'{command[2]} did not start')
+
+
+async def open_stream(port, game_id, cookie, slots):
+    async with slots:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f'GET /games/{game_id}/events HTTP/1.1\r\nHost: localhost\r\n'
+                     f'Cookie: session={cookie}\r\n\r\n'.encode())
+        try:
+            await asyncio.wait_for(reader.readuntil(b'data:'), 30)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+            return writer, False
+        return writer, True
+
+
+async def timed_state(port, game_id, cookie):
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET /games/{game_id}/state HTTP/1.1\r\nHost: localhost\r\n'
+                 f'Cookie: session={cookie}\r\nConnection: close\r\n\r\n'.encode())
+    try:
+        await asyncio.wait_for(reader.read(), 10)
+        return (time.perf_counter() - start) * 1000
+    except asyncio.TimeoutError:
+        return None
+    finally:
+        writer.close()
+
+
+async def hold(port, game_id, cookie, connections, server):
+    before = rss_kb(server.pid)
+    slots = asyncio.Semaphore(CONNECT_CONCURRENCY)
+    start = time.perf_counter()
+    streams = await asyncio.gather(*(open_stream(port, game_id, cookie, slots)
+                                     for _ in range(connections)))
+    opened = time.perf_counter() - start
+    await asyncio.sleep(2)
+    after = rss_kb(server.pid)
+    latency = await timed_state(port, game_id, cookie)
+    for writer, _ in streams:
+        writer.close()
+    return before, after, sum(ok for _, ok in streams), opened, latency
+
+
+def run(label, command, port, game_id, cookie, connections):
+    server = start(command, port)
+    try:
+        before, after, live, opened, latency = asyncio.run(hold(port, game_id, cookie, connections, server))
+    finally:
+        # held streams would stall a graceful shutdown
+        server.kill()
+        server.wait()
+
+    per_connection = (after - before) / max(live, 1)
+    per_gb = 1024 * 1024 / per_connection if per_connection > 0 else float('inf')
+    state = f'{latency:.1f} ms' if latency is not None else 'timed out'
+    print(f'{label}: {live}/{connections} streams live after {opened:.1f} s')
+    print(f'  RSS {before / 1024:.1f} MB -> {after / 1024:.1f} MB, {per_connection:.1f} KB per stream, '
+          f'~{per_gb:,.0f} streams per GB')
+    print(f'  GET /state while held: {state}')
+
+
+def main():
+    workdir = tempfile.mkdtemp()
+    try:
+        game_id, cookie = seed(workdir)
+
+        port = free_port()
+        run('uvicorn ASGI sidecar', [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port),
+                                     '--no-access-log', '--log-level', 'warning', '--backlog', '4096'],
+            port, game_id, cookie, CONNECTIONS)
+
+        port = free_port()
+        run(f'gunicorn gthread, 1 worker x {THREADS} threads',
+            [sys.executable, '-m', 'gunicorn', '-w', '1', '-k', 'gthread', '--threads', str(THREADS),
+             '-b', f'127.0.0.1:{port}', 'wsgi:app'],
+            port, game_id, cookie, min(CONNECTIONS, THREADS))
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
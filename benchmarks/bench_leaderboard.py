@@ -0,0 +1,109 @@
+"""Compare leaderboard reads from user_stats with aggregating game history.
+
+Seeds USERS players and GAMES finished games of four players each, builds
+user_stats from them, then times a leaderboard page computed by grouping
+game_players against the same page read from user_stats, first and deep
+pages, with and without the in-process cache, and a profile with its
+rank. Every page is checked against a full sort of user_stats.
+
+Usage: python benchmarks/bench_leaderboard.py [users] [games]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+fd, DB_PATH = tempfile.mkstemp(suffix='.db')
+os.close(fd)
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+os.environ['GAME_REAPER_INTERVAL'] = '0'
+os.environ['BOT_WORKERS'] = '0'
+
+from sqlalchemy import case, func, insert, select
+
+from app import create_app, db
+from app.models import Game, GamePlayer, User, UserStats
+from app.stats import LEADERBOARD_PAGE_SIZE, RANK_ORDER, player_stats, rebuild
+
+USERS = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+GAMES = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+PLAYERS = 4
+RUNS = 20
+
+
+def seed():
+    rng = random.Random(1)
+    db.session.execute(insert(User), [{'username': f'player{i}', 'password_hash': 'x'} for i in range(USERS)])
+    db.session.execute(insert(UserStats).from_select(['user_id'], select(User.id)))
+    games, players = [], []
+    for game_id in range(1, GAMES + 1):
+        seats = rng.sample(range(1, USERS + 1), PLAYERS)
+        scores = [rng.randint(60, 140) for _ in seats]
+        winner = seats[scores.index(min(scores))]
+        games.append({'id': game_id, 'name': 'g', 'max_tiles': 10, 'max_players': PLAYERS, 'status': 'finished',
+                      'round_phase': 'finished', 'created_by': seats[0], 'winner_id': winner,
+                      'current_round': 5, 'dice1': 0, 'dice2': 0, 'version': 0, 'player_count': PLAYERS})
+        players.extend({'game_id': game_id, 'user_id': user_id, 'tiles_mask': 0, 'score': score,
+                        'is_out': False, 'has_submitted': False, 'round_score': 0}
+                       for user_id, score in zip(seats, scores))
+    db.session.execute(insert(Game), games)
+    db.session.execute(insert(GamePlayer), players)
+    db.session.commit()
+
+
+def aggregate_page():
+    wins = func.sum(case((Game.winner_id == GamePlayer.user_id, 1), else_=0))
+    return db.session.execute(
+        select(GamePlayer.user_id, func.count(), wins, func.avg(GamePlayer.score))
+        .join(Game, Game.id == GamePlayer.game_id)
+        .where(Game.status == 'finished')
+        .group_by(GamePlayer.user_id)
+        .order_by(wins.desc(), func.avg(GamePlayer.score), GamePlayer.user_id)
+        .limit(LEADERBOARD_PAGE_SIZE)
+    ).all()
+
+
+def timed(fn):
+    fn()
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        fn()
+        db.session.rollback()
+    return (time.perf_counter() - start) / RUNS * 1000
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        seed()
+        start = time.perf_counter()
+        rebuild(db.session.connection())
+        db.session.commit()
+        print(f'{USERS} players, {GAMES} finished games; rebuild-stats took {time.perf_counter() - start:.2f} s')
+
+        ordered = db.session.scalars(select(UserStats.user_id).where(UserStats.games_played > 0)
+                                     .order_by(*RANK_ORDER)).all()
+        cursors, after = [None], None
+        for page in range(0, len(ordered), LEADERBOARD_PAGE_SIZE):
+            entries, after = player_stats._load_page(after)
+            assert [e['user_id'] for e in entries] == ordered[page:page + LEADERBOARD_PAGE_SIZE]
+            cursors.append(after)
+        deep = cursors[len(cursors) // 2]
+        print(f'  paged through all {len(ordered)} ranked players in {len(cursors) - 1} pages, order checked')
+
+        player_stats.invalidate()
+        cache, player_stats.cache = player_stats.cache, None
+        print(f'  aggregate over game_players  {timed(aggregate_page):8.2f} ms')
+        print(f'  user_stats first page        {timed(lambda: player_stats.leaderboard()):8.2f} ms')
+        print(f'  user_stats middle page       {timed(lambda: player_stats.leaderboard(deep)):8.2f} ms')
+        print(f'  profile with rank            {timed(lambda: player_stats.profile(ordered[len(ordered) // 2])):8.2f} ms')
+        player_stats.cache = cache
+        print(f'  cached page                  {timed(lambda: player_stats.leaderboard(deep)):8.3f} ms')
+    os.unlink(DB_PATH)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Time the lobby queries against a large games table.
+
+Seeds GAMES waiting games and compares loading the whole lobby (the old
+unpaginated query), OFFSET pagination deep into the list and keyset
+pagination from a cursor, then requests /games through the app.
+
+Usage: python benchmarks/bench_lobby.py [games]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+fd, DB_PATH = tempfile.mkstemp(suffix='.db')
+os.close(fd)
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+
+from sqlalchemy import insert, tuple_
+
+from app import create_app, db, engine
+from app.games import LOBBY_PAGE_SIZE
+from app.models import Game, GamePlayer, User
+
+GAMES = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+RUNS = 20
+
+
+def seed(host_id):
+    start = datetime.utcnow() - timedelta(seconds=GAMES)
+    games = [
+        {'name': f'game{i}', 'max_tiles': 10, 'max_players': 12, 'status': 'waiting',
+         'created_by': host_id, 'created_at': start + timedelta(seconds=i), 'current_round': 0,
+         'dice1': 0, 'dice2': 0, 'round_phase': 'waiting', 'version': 0, 'player_count': 1}
+        for i in range(GAMES)
+    ]
+    db.session.execute(insert(Game), games)
+    db.session.execute(insert(GamePlayer), [
+        {'game_id': i + 1, 'user_id': host_id, 'tiles_mask': engine.full_mask(10), 'score': 0,
+         'is_out': False, 'has_submitted': False, 'round_score': 0}
+        for i in range(GAMES)
+    ])
+    db.session.commit()
+
+
+def timed(fn):
+    fn()
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        fn()
+    return (time.perf_counter() - start) / RUNS * 1000
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        host = User(username='host', password_hash='x')
+        viewer = User(username='viewer', password_hash='x')
+        db.session.add_all([host, viewer])
+        db.session.commit()
+        viewer_id = viewer.id
+        seed(host.id)
+
+        waiting = Game.query.filter(Game.status == 'waiting')
+        ordered = waiting.order_by(Game.created_at.desc(), Game.id.desc())
+        middle = ordered.offset(GAMES // 2).first()
+
+        def unpaginated():
+            db.session.expire_all()
+            return Game.query.filter_by(status='waiting').order_by(Game.created_at.desc()).all()
+
+        def offset_page():
+            return ordered.offset(GAMES // 2).limit(LOBBY_PAGE_SIZE + 1).all()
+
+        def keyset_page():
+            return ordered.filter(
+                tuple_(Game.created_at, Game.id) < (middle.created_at, middle.id)
+            ).limit(LOBBY_PAGE_SIZE + 1).all()
+
+        assert [g.id for g in offset_page()][1:] == [g.id for g in keyset_page()][:-1]
+
+        print(f'{GAMES} waiting games, page size {LOBBY_PAGE_SIZE}, mean of {RUNS} runs')
+        print(f'  all games         {timed(unpaginated):9.2f} ms')
+        print(f'  offset page       {timed(offset_page):9.2f} ms  (offset {GAMES // 2})')
+        print(f'  keyset page       {timed(keyset_page):9.2f} ms')
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(viewer_id)
+        sess['_fresh'] = True
+
+    def first_page():
+        assert client.get('/games').status_code == 200
+
+    cursor = f'{middle.created_at.isoformat()}~{middle.id}'
+
+    def deep_page():
+        assert client.get('/games', query_string={'before': cursor}).status_code == 200
+
+    print(f'  GET /games        {timed(first_page):9.2f} ms')
+    print(f'  GET /games?before {timed(deep_page):9.2f} ms')
+    os.unlink(DB_PATH)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""Login throughput versus game-action latency during a login spike.
+
+A threaded local server handles LOGINS clients logging in back to back
+while one player keeps playing a game. Each mode reports logins per
+second, rejected ("busy") logins, which the client retries after
+BUSY_BACKOFF seconds, and the p50/p99 latency of the
+player's game actions. Modes: hashing inline on the request thread,
+hashing on a one-thread pool, and the same pool with a short queue that
+turns logins away.
+
+Usage: python benchmarks/bench_login_load.py [logins] [seconds]
+"""
+import http.client
+import json
+import logging
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from werkzeug.security import generate_password_hash
+from werkzeug.serving import make_server
+
+from app import create_app, db, engine
+from app.models import Game, GamePlayer, User
+
+BUSY_BACKOFF = 0.5
+MODES = (
+    ('inline', {'PASSWORD_HASH_WORKERS': '0'}),
+    ('pool of 1', {'PASSWORD_HASH_WORKERS': '1', 'PASSWORD_HASH_QUEUE': '32'}),
+    ('queue of 4', {'PASSWORD_HASH_WORKERS': '1', 'PASSWORD_HASH_QUEUE': '4'}),
+)
+
+
+def request(port, method, path, cookie=None, body=''):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+    if cookie:
+        headers['Cookie'] = cookie
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    data = response.read()
+    conn.close()
+    return response, data
+
+
+def setup(app, logins):
+    password_hash = generate_password_hash('spike', app.config['PASSWORD_HASH_METHOD'])
+    with app.app_context():
+        users = [User(username=f'spike{i}', password_hash=password_hash) for i in range(logins + 1)]
+        db.session.add_all(users)
+        db.session.flush()
+        game = Game(name='Spike', max_tiles=12, max_players=12, created_by=users[0].id,
+                    status='waiting', player_count=1)
+        game.players.append(GamePlayer(user_id=users[0].id, tiles_mask=engine.full_mask(12)))
+        db.session.add(game)
+        db.session.commit()
+        return game.id, users[0].id
+
+
+def spike(port, username, stop, counts):
+    while not stop.is_set():
+        response, _ = request(port, 'POST', '/login', body=f'username={username}&password=spike')
+        ok = response.status == 302 and '/login' not in response.getheader('Location')
+        counts['ok' if ok else 'busy'] += 1
+        if not ok:
+            time.sleep(BUSY_BACKOFF)
+
+
+def play(port, db_path, game_id, user_id, cookie, stop, latencies):
+    reader = sqlite3.connect(db_path, timeout=60)
+
+    def timed(path, body=''):
+        start = time.perf_counter()
+        request(port, 'POST', path, cookie, body)
+        latencies.append(time.perf_counter() - start)
+
+    timed(f'/games/{game_id}/start')
+    while not stop.is_set():
+        _, data = request(port, 'GET', f'/games/{game_id}/state', cookie)
+        state = json.loads(data)
+        if state['status'] == 'finished':
+            reader.execute('UPDATE games SET status = ?, round_phase = ?, current_round = 0 WHERE id = ?',
+                           ('waiting', 'waiting', game_id))
+            reader.execute('UPDATE game_players SET tiles_mask = ?, is_out = 0, has_submitted = 0 '
+                           'WHERE game_id = ?', (engine.full_mask(12), game_id))
+            reader.commit()
+            timed(f'/games/{game_id}/start')
+        elif state['phase'] == 'rolling':
+            timed(f'/games/{game_id}/roll')
+        elif state['phase'] == 'round_end':
+            timed(f'/games/{game_id}/next-round')
+        elif state['phase'] == 'flipping':
+            mask = reader.execute('SELECT tiles_mask FROM game_players WHERE game_id = ? AND user_id = ?',
+                                  (game_id, user_id)).fetchone()[0]
+            flips = engine.legal_flips(mask, state['dice1'] + state['dice2'])
+            if flips:
+                tiles = ','.join(str(t) for t in engine.mask_to_tiles(flips[-1]))
+                timed(f'/games/{game_id}/flip', f'tiles={tiles}')
+            else:
+                timed(f'/games/{game_id}/pass')
+    reader.close()
+
+
+def run(label, settings, logins, seconds):
+    fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+    os.environ.update(settings)
+    app = create_app()
+    game_id, user_id = setup(app, logins)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+    response, _ = request(port, 'POST', '/login', body='username=spike0&password=spike')
+    cookie = response.getheader('Set-Cookie').split(';')[0]
+
+    stop = threading.Event()
+    counts = {'ok': 0, 'busy': 0}
+    latencies = []
+    threads = [threading.Thread(target=spike, args=(port, f'spike{i + 1}', stop, counts))
+               for i in range(logins)]
+    threads.append(threading.Thread(target=play, args=(port, db_path, game_id, user_id, cookie, stop, latencies)))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    server.shutdown()
+
+    ordered = sorted(latencies)
+    print(f'{label:<11} {counts["ok"] / seconds:6.1f} logins/s  {counts["busy"]:5d} busy  '
+          f'action p50={statistics.median(ordered) * 1000:7.1f} ms  '
+          f'p99={ordered[int(len(ordered) * 0.99)] * 1000:7.1f} ms  ({len(ordered)} actions)')
+    os.unlink(db_path)
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    print(f'{logins} clients logging in for {seconds:.0f}s on {os.cpu_count()} CPU(s)')
+    for label, settings in MODES:
+        run(label, settings, logins, seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Cost of request instrumentation and of scraping /metrics.
+
+Times the raw counter and histogram updates done per request, then polls
+/games/<id>/state with the slow-request profiler off and on (its
+threshold set high enough that no profile is written, so only sampling
+is measured). Finally times /metrics merging the files of WORKERS
+gunicorn workers.
+
+Usage: python benchmarks/bench_metrics.py [polls] [workers]
+"""
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import create_app, db, engine
+from app.metrics import LATENCY_BUCKETS, labels, metrics
+from app.models import Game, GamePlayer, User
+
+POLLS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+WORKERS = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+
+def make_app(profile, metrics_dir):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    os.environ['GAME_STATE_STORE'] = 'memory'
+    os.environ['METRICS_DIR'] = metrics_dir
+    os.environ['PROFILE_SLOW_REQUESTS'] = '60' if profile else '0'
+    os.environ['PROFILE_DIR'] = metrics_dir
+    app = create_app()
+    with app.app_context():
+        user = User(username='metrics', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        game = Game(name='Metrics', max_tiles=10, max_players=12, created_by=user.id,
+                    status='playing', round_phase='rolling', current_round=1, player_count=1)
+        game.players.append(GamePlayer(user_id=user.id, tiles_mask=engine.full_mask(10)))
+        db.session.add(game)
+        db.session.commit()
+        ids = game.id, user.id
+    return app, path, ids
+
+
+def poll_latencies(app, game_id, user_id):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+    url = f'/games/{game_id}/state'
+    client.get(url)
+    latencies = []
+    for _ in range(POLLS):
+        start = time.perf_counter()
+        assert client.get(url).status_code == 200
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def describe(latencies):
+    ordered = sorted(latencies)
+    return f'p50 {statistics.median(ordered):.3f} ms  p99 {ordered[int(len(ordered) * 0.99)]:.3f} ms'
+
+
+def main():
+    label = labels(endpoint='games.game_state')
+    observe = timeit.timeit(
+        lambda: metrics.observe('http_request_duration_seconds', label, 0.003, LATENCY_BUCKETS),
+        number=100000) * 10
+    inc = timeit.timeit(lambda: metrics.inc('db_queries_total', label), number=100000) * 10
+    print(f'histogram observe {observe:.2f} us, counter inc {inc:.2f} us')
+
+    metrics_dir = tempfile.mkdtemp()
+    paths = []
+    for profile in (False, True):
+        app, path, (game_id, user_id) = make_app(profile, metrics_dir)
+        paths.append(path)
+        print(f'GET /state, profiler {"on " if profile else "off"}  '
+              f'{describe(poll_latencies(app, game_id, user_id))}')
+
+    snapshot = metrics.snapshot()
+    for worker in range(WORKERS):
+        with open(os.path.join(metrics_dir, f'metrics-{100000 + worker}.json'), 'w') as f:
+            json.dump(snapshot, f)
+    client = app.test_client()
+    start = time.perf_counter()
+    for _ in range(100):
+        body = client.get('/metrics').get_data()
+    elapsed = (time.perf_counter() - start) / 100 * 1000
+    print(f'GET /metrics over {WORKERS + 1} worker files  {elapsed:.2f} ms  ({len(body)} bytes)')
+    shutil.rmtree(metrics_dir)
+    for path in paths:
+        os.unlink(path)
+
+
+if __name__ == '__main__':
+    main()
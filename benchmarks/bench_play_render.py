@@ -0,0 +1,70 @@
+"""Render time and payload size: full /games/<id>/play versus the board fragment.
+
+Usage: python benchmarks/bench_play_render.py [players] [iterations]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+fd, DB_PATH = tempfile.mkstemp(suffix='.db')
+os.close(fd)
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+
+from app import create_app, db, engine
+from app.models import Game, GamePlayer, User
+
+
+def setup(app, players):
+    with app.app_context():
+        users = [User(username=f'render{i}', password_hash='x') for i in range(players)]
+        db.session.add_all(users)
+        db.session.flush()
+        game = Game(name='Render', max_tiles=12, max_players=12, created_by=users[0].id,
+                    status='playing', current_round=3, round_phase='flipping', dice1=4, dice2=5)
+        db.session.add(game)
+        db.session.flush()
+        for i, user in enumerate(users):
+            db.session.add(GamePlayer(game_id=game.id, user_id=user.id, score=i * 7,
+                                      tiles_mask=engine.full_mask(12) & ~(1 << i),
+                                      has_submitted=i % 2 == 0))
+        db.session.commit()
+        return game.id, users[1].id
+
+
+def measure(client, path, iterations):
+    client.get(path)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        response = client.get(path)
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.status_code
+    return elapsed / iterations, len(response.data)
+
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+
+    app = create_app()
+    game_id, user_id = setup(app, players)
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+
+    full_time, full_bytes = measure(client, f'/games/{game_id}/play', iterations)
+    board_time, board_bytes = measure(client, f'/games/{game_id}/play/board', iterations)
+
+    print(f'{players} players, {iterations} requests each')
+    print(f'  full page:  {full_time * 1000:6.2f} ms  {full_bytes:6d} bytes')
+    print(f'  fragment:   {board_time * 1000:6.2f} ms  {board_bytes:6d} bytes')
+    print(f'  saving:     {(1 - board_time / full_time) * 100:5.1f}% time, '
+          f'{(1 - board_bytes / full_bytes) * 100:5.1f}% bytes per refresh')
+    os.unlink(DB_PATH)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Check that the games routes issue a fixed number of SQL queries.
+
+Counts the statements each route executes for games of 1 to 12 players
+and exits non-zero if any route's count grows with the player count.
+Flip and pass each act in a game of their own where the host still has
+to move. In the pass game everyone else is already out, so the pass ends
+the round whatever the player count. Any action that flashes an error
+fails the run.
+
+Usage: python benchmarks/bench_query_counts.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+fd, DB_PATH = tempfile.mkstemp(suffix='.db')
+os.close(fd)
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+
+from sqlalchemy import event
+
+from app import create_app, db, engine
+from app.models import Game, GamePlayer, User
+
+PLAYER_COUNTS = (1, 4, 12)
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+
+def make_game(host, players, status, phase, prefix, others_out=False):
+    users = [host] + [User(username=f'{prefix}{i}', password_hash='x') for i in range(players - 1)]
+    db.session.add_all(users)
+    db.session.flush()
+    game = Game(name=prefix, max_tiles=10, max_players=12, created_by=users[0].id,
+                status=status, current_round=1, round_phase=phase, dice1=3, dice2=4, player_count=players,
+                winner_id=users[0].id if status == 'finished' else None)
+    db.session.add(game)
+    db.session.flush()
+    db.session.add_all(GamePlayer(game_id=game.id, user_id=u.id, tiles_mask=engine.full_mask(10),
+                                  is_out=others_out and u is not host, has_submitted=others_out and u is not host)
+                       for u in users)
+    return game.id
+
+
+def routes(waiting_id, playing_id, passing_id, finished_id):
+    return [
+        ('list_games', 'GET', '/games'),
+        ('view_game', 'GET', f'/games/{waiting_id}'),
+        ('play_game', 'GET', f'/games/{playing_id}/play'),
+        ('play_board', 'GET', f'/games/{playing_id}/play/board'),
+        ('game_state', 'GET', f'/games/{playing_id}/state'),
+        ('game_results', 'GET', f'/games/{finished_id}/results'),
+        ('flip_tiles', 'POST', f'/games/{playing_id}/flip'),
+        ('pass_turn', 'POST', f'/games/{passing_id}/pass'),
+    ]
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+
+    counts = {}
+    for players in PLAYER_COUNTS:
+        with app.app_context():
+            host = User(username=f'host{players}', password_hash='x')
+            waiting_id = make_game(host, players, 'waiting', 'waiting', f'w{players}_')
+            playing_id = make_game(host, players, 'playing', 'flipping', f'p{players}_')
+            passing_id = make_game(host, players, 'playing', 'flipping', f's{players}_', others_out=True)
+            finished_id = make_game(host, players, 'finished', 'finished', f'f{players}_')
+            db.session.commit()
+            host_id = host.id
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(host_id)
+            sess['_fresh'] = True
+
+        for name, method, path in routes(waiting_id, playing_id, passing_id, finished_id):
+            counter.count = 0
+            if method == 'GET':
+                response = client.get(path)
+            else:
+                response = client.post(path, data={'tiles': '3,4'})
+            assert response.status_code in (200, 302), (name, response.status_code)
+            with client.session_transaction() as sess:
+                errors = [message for category, message in sess.pop('_flashes', []) if category == 'error']
+            assert not errors, (name, errors)
+            counts.setdefault(name, []).append(counter.count)
+
+    failed = False
+    print('queries per request for ' + ', '.join(f'{n} players' for n in PLAYER_COUNTS))
+    for name, values in counts.items():
+        constant = len(set(values)) == 1
+        failed = failed or not constant
+        print(f'  {name:<13} {" ".join(f"{v:3d}" for v in values)}  {"ok" if constant else "GROWS"}')
+    os.unlink(DB_PATH)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
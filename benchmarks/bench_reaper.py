@@ -0,0 +1,155 @@
+"""Measure the live tables before and after archiving finished games.
+
+Seeds FINISHED finished games and 200 games still in play, all shared by
+one player, then times the lobby and a game lookup. Runs the reaper to
+move the finished games into the archive tables and times them again,
+along with the results page served from the archive. Then checks that
+games can still be archived after SQLite has reused the ids of archived
+players' rows.
+
+Usage: python benchmarks/bench_reaper.py [finished]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+fd, DB_PATH = tempfile.mkstemp(suffix='.db')
+os.close(fd)
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+os.environ['GAME_REAPER_INTERVAL'] = '0'
+os.environ['BOT_WORKERS'] = '0'
+
+from sqlalchemy import insert, select
+
+from app import create_app, db
+from app.games import load_game
+from app.models import ArchivedGame, ArchivedGamePlayer, Game, GamePlayer, User
+from app.reaper import archive_games, reap_games
+
+FINISHED = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+LIVE = 200
+PLAYERS = 4
+RUNS = 50
+
+
+def new_game(user_id, finished_at, players):
+    game = Game(name='reuse', max_tiles=10, max_players=12, status='finished', round_phase='finished',
+                created_by=user_id, winner_id=user_id, created_at=finished_at, updated_at=finished_at,
+                current_round=1, player_count=len(players))
+    game.players = [GamePlayer(user_id=p, tiles_mask=0, score=10) for p in players]
+    db.session.add(game)
+    db.session.commit()
+    return game.id, sorted(p.id for p in game.players)
+
+
+def check_reused_player_ids(user_ids):
+    # The newest game is never archived, so an empty game follows each one.
+    old = datetime.utcnow() - timedelta(days=2)
+    first, first_ids = new_game(user_ids[0], old, user_ids[:2])
+    new_game(user_ids[0], old, [])
+    assert archive_games(datetime.utcnow(), 10) == 1
+
+    second, second_ids = new_game(user_ids[0], old, user_ids[:2])
+    assert second_ids == first_ids, 'player ids were not reused'
+    new_game(user_ids[0], old, [])
+    assert archive_games(datetime.utcnow(), 10) == 2
+    archived = db.session.execute(select(ArchivedGamePlayer.game_id, ArchivedGamePlayer.user_id)
+                                  .where(ArchivedGamePlayer.game_id.in_([first, second]))
+                                  .order_by(ArchivedGamePlayer.id)).all()
+    assert archived == [(first, user_ids[0]), (first, user_ids[1]),
+                        (second, user_ids[0]), (second, user_ids[1])]
+    print('archived again after player ids were reused')
+
+
+def seed(user_ids):
+    now = datetime.utcnow()
+    start = now - timedelta(days=2, seconds=FINISHED)
+    games = [
+        {'name': f'game{i}', 'max_tiles': 10, 'max_players': 12,
+         'status': 'finished' if i < FINISHED else 'playing',
+         'round_phase': 'finished' if i < FINISHED else 'rolling',
+         'created_by': user_ids[0], 'winner_id': user_ids[0] if i < FINISHED else None,
+         'created_at': start + timedelta(seconds=i),
+         'updated_at': start + timedelta(seconds=i) if i < FINISHED else now,
+         'current_round': 5, 'dice1': 0, 'dice2': 0, 'version': 0, 'player_count': PLAYERS}
+        for i in range(FINISHED + LIVE)
+    ]
+    db.session.execute(insert(Game), games)
+    db.session.execute(insert(GamePlayer), [
+        {'game_id': i + 1, 'user_id': user_id, 'tiles_mask': 0, 'score': 40, 'is_out': False,
+         'has_submitted': False, 'round_score': 0}
+        for i in range(FINISHED + LIVE) for user_id in user_ids
+    ])
+    db.session.commit()
+
+
+def timed(fn):
+    fn()
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        fn()
+    return (time.perf_counter() - start) / RUNS * 1000
+
+
+def measure(app, client, label):
+    with app.app_context():
+        games, players = Game.query.count(), GamePlayer.query.count()
+
+        def lookup():
+            load_game(FINISHED + LIVE // 2)
+            db.session.rollback()
+
+        lookup_ms = timed(lookup)
+
+    def lobby():
+        assert client.get('/games').status_code == 200
+
+    print(f'{label}: {games} games, {players} game_players rows live')
+    print(f'  GET /games        {timed(lobby):8.2f} ms')
+    print(f'  game lookup       {lookup_ms:8.2f} ms')
+
+
+def main():
+    app = create_app()
+    app.config['GAME_REAPER_BATCH'] = 2000
+    with app.app_context():
+        users = [User(username=f'player{i}', password_hash='x') for i in range(PLAYERS)]
+        db.session.add_all(users)
+        db.session.commit()
+        user_ids = [u.id for u in users]
+        seed(user_ids)
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_ids[0])
+        sess['_fresh'] = True
+
+    print(f'{FINISHED} finished and {LIVE} playing games of {PLAYERS} players, mean of {RUNS} runs')
+    measure(app, client, 'before')
+
+    with app.app_context():
+        start = time.perf_counter()
+        counts = reap_games()
+        elapsed = time.perf_counter() - start
+        archived = ArchivedGame.query.count()
+    print(f'reaper: archived {counts["archived"]} games in {elapsed:.2f} s '
+          f'({counts["archived"] / elapsed:,.0f} games/s), {archived} in archive')
+
+    measure(app, client, 'after')
+
+    def results():
+        assert client.get('/games/1/results').status_code == 200
+
+    print(f'  archived results  {timed(results):8.2f} ms')
+
+    with app.app_context():
+        check_reused_player_ids(user_ids)
+    os.unlink(DB_PATH)
+
+
+if __name__ == '__main__':
+    main()
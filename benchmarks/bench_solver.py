@@ -0,0 +1,82 @@
+"""Build time and lookup latency of the optimal-move table.
+
+Times building the table by dynamic programming, memory-mapping the
+written file, a raw table lookup, Solver.hint, and the /games/<id>/hint
+endpoint through the test client, for 10- and 12-tile boards.
+
+Usage: python benchmarks/bench_solver.py
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+fd, DB_PATH = tempfile.mkstemp(suffix='.db')
+os.close(fd)
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+TABLE_PATH = DB_PATH + '.solver'
+os.environ['SOLVER_TABLE'] = TABLE_PATH
+
+from app import create_app, db, engine, solver as solver_module
+from app.models import Game, GamePlayer, User
+from app.solver import SolverTable, solver
+
+LOOKUPS = 1000000
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    build = timed(solver_module.build, 5)
+    best, expected = solver_module.build()
+    solver_module.write(TABLE_PATH, best, expected)
+    load = timed(lambda: SolverTable.load(TABLE_PATH), 50)
+    print(f'build table         {build * 1000:8.1f} ms  ({solver_module.TABLE_BYTES} bytes)')
+    print(f'mmap table          {load * 1e6:8.1f} us')
+
+    app = create_app()
+    table = solver.table
+    for max_tiles in (10, 12):
+        mask = engine.full_mask(max_tiles) & ~engine.tiles_to_mask([1, 4])
+        lookup = timeit.timeit(lambda: table.best_flip(mask, 9), number=LOOKUPS) / LOOKUPS
+        hint = timeit.timeit(lambda: solver.hint(mask, 9), number=LOOKUPS) / LOOKUPS
+        print(f'{max_tiles} tiles: lookup {lookup * 1e9:6.0f} ns  hint {hint * 1e9:6.0f} ns  '
+              f'expected score from full board {table.expected_score(engine.full_mask(max_tiles)):.2f}')
+
+    with app.app_context():
+        user = User(username='solver', password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        game = Game(name='Solver', max_tiles=12, max_players=12, created_by=user.id, status='playing',
+                    round_phase='flipping', current_round=1, dice1=4, dice2=5, player_count=1)
+        game.players.append(GamePlayer(user_id=user.id, tiles_mask=engine.full_mask(12)))
+        db.session.add(game)
+        db.session.commit()
+        game_id, user_id = game.id, user.id
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+    response = client.get(f'/games/{game_id}/hint')
+    assert response.status_code == 200, response.status_code
+    request = timed(lambda: client.get(f'/games/{game_id}/hint'), 500)
+    print(f'GET /hint           {request * 1e6:8.1f} us  -> {response.get_json()}')
+
+    os.unlink(TABLE_PATH)
+    os.unlink(DB_PATH)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""Compare 3-second polling of /games/<id>/state with the SSE push channel.
+
+Runs the app on a local threaded server and measures requests/sec for
+polling, event delivery rate for push, and DB queries per connected player.
+The idle cost of push is sampled with the streams open: one watcher per
+process checks every watched game's version, however many players wait.
+
+Usage: python benchmarks/bench_state_push.py [players] [changes]
+"""
+import http.client
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+fd, DB_PATH = tempfile.mkstemp(suffix='.db')
+os.close(fd)
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+os.environ['GAME_WAITERS_MAX'] = '0'
+
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+from werkzeug.serving import make_server
+
+from app import create_app, db, engine
+from app.events import game_events
+from app.games import build_game_state
+from app.models import Game, GamePlayer, User
+
+POLL_INTERVAL = 3.0
+WINDOW = 60.0
+IDLE_SAMPLE = 3.0
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        self._lock = threading.Lock()
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, *args):
+        with self._lock:
+            self.count += 1
+
+    def reset(self):
+        with self._lock:
+            self.count = 0
+
+
+def setup(app, players):
+    password_hash = generate_password_hash('bench', method='pbkdf2:sha256:1')
+    with app.app_context():
+        users = [User(username=f'bench{i}', password_hash=password_hash) for i in range(players)]
+        db.session.add_all(users)
+        db.session.flush()
+        game = Game(name='Bench', max_tiles=10, max_players=12, created_by=users[0].id,
+                    status='playing', current_round=1, round_phase='rolling')
+        db.session.add(game)
+        db.session.flush()
+        for user in users:
+            db.session.add(GamePlayer(game_id=game.id, user_id=user.id,
+                                      tiles_mask=engine.full_mask(10)))
+        db.session.commit()
+        return game.id, [u.username for u in users]
+
+
+def login(port, username):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    conn.request('POST', '/login', body=f'username={username}&password=bench',
+                 headers={'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.getheader('Set-Cookie').split(';')[0]
+
+
+def bench_polling(port, game_id, cookies, rounds=50):
+    def poll(cookie):
+        conn = http.client.HTTPConnection('127.0.0.1', port)
+        for _ in range(rounds):
+            conn.request('GET', f'/games/{game_id}/state', headers={'Cookie': cookie})
+            conn.getresponse().read()
+        conn.close()
+
+    threads = [threading.Thread(target=poll, args=(cookie,)) for cookie in cookies]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return rounds * len(cookies) / (time.perf_counter() - start)
+
+
+def open_stream(port, game_id, cookie):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    conn.request('GET', f'/games/{game_id}/events', headers={'Cookie': cookie})
+    response = conn.getresponse()
+    while response.readline().strip():
+        pass
+    return conn, response
+
+
+def bench_push(app, counter, port, game_id, cookies, changes):
+    counter.reset()
+    streams = [open_stream(port, game_id, cookie) for cookie in cookies]
+    open_queries = counter.count / len(cookies)
+
+    received = [0] * len(streams)
+    with app.app_context():
+        final = db.session.get(Game, game_id).version + changes
+
+    # Changes close together may reach a stream as one event; stop at the last version.
+    def consume(index, response):
+        while True:
+            line = response.readline()
+            if not line:
+                return
+            if line.startswith(b'data:'):
+                received[index] += 1
+                if json.loads(line[5:]).get('version') == final:
+                    return
+
+    threads = [threading.Thread(target=consume, args=(i, response), daemon=True)
+               for i, (_, response) in enumerate(streams)]
+    for thread in threads:
+        thread.start()
+
+    counter.reset()
+    start = time.perf_counter()
+    with app.app_context():
+        for i in range(changes):
+            game = db.session.get(Game, game_id)
+            players = GamePlayer.query.filter_by(game_id=game_id).all()
+            game.dice1 = i % 6 + 1
+            game.dice2 = 6 - i % 6
+            game.version += 1
+            state = build_game_state(game, players)
+            db.session.commit()
+            game_events.publish(game_id, state)
+            time.sleep(0.002)
+    for thread in threads:
+        thread.join(timeout=30)
+    elapsed = time.perf_counter() - start
+    change_queries = counter.count / changes
+
+    counter.reset()
+    time.sleep(IDLE_SAMPLE)
+    idle_queries = counter.count * WINDOW / IDLE_SAMPLE
+
+    for conn, _ in streams:
+        conn.close()
+    return open_queries, change_queries, sum(received) / elapsed, idle_queries
+
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    changes = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    app = create_app()
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+    game_id, usernames = setup(app, players)
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    cookies = [login(port, username) for username in usernames]
+
+    counter.reset()
+    poll_rps = bench_polling(port, game_id, cookies)
+    poll_queries = counter.count / (50 * players)
+
+    open_queries, change_queries, push_rate, idle_queries = bench_push(
+        app, counter, port, game_id, cookies, changes)
+
+    poll_per_player = WINDOW / POLL_INTERVAL * poll_queries
+    push_per_player = open_queries + idle_queries / players
+
+    print(f'players per game: {players}')
+    print(f'polling: {poll_rps:8.0f} requests/sec, {poll_queries:.1f} queries/request')
+    print(f'push:    {push_rate:8.0f} events/sec delivered, {open_queries:.1f} queries/stream open, '
+          f'{change_queries:.1f} queries/change shared by all players')
+    print(f'DB queries per connected player per {WINDOW:.0f}s idle: '
+          f'polling {poll_per_player:.0f}, push {push_per_player:.0f}')
+    print(f'push watcher: {idle_queries:.0f} queries per worker per {WINDOW:.0f}s idle, '
+          f'however many streams are open')
+
+    server.shutdown()
+    os.unlink(DB_PATH)
+
+
+if __name__ == '__main__':
+    main()
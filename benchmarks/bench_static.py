@@ -0,0 +1,81 @@
+"""Compare the static files a page load costs before and after the asset build.
+
+Signs in, fetches the lobby page and every static file it links, and then
+loads the page again as a browser would: a file whose response may be
+kept (max-age) is taken from the cache, any other is revalidated with a
+conditional request. Does this with the plain static files and again
+after build-assets has fingerprinted and precompressed them, reporting
+the bytes of a cold load and the static requests of a repeat load.
+
+Usage: python benchmarks/bench_static.py [page]
+"""
+import os
+import re
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+fd, DB_PATH = tempfile.mkstemp(suffix='.db')
+os.close(fd)
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+os.environ['GAME_REAPER_INTERVAL'] = '0'
+os.environ['TOURNAMENT_TICK'] = '0'
+os.environ['BOT_WORKERS'] = '0'
+
+from app import create_app
+from app.assets import BUILD_DIR, build, static_assets
+
+PAGE = sys.argv[1] if len(sys.argv) > 1 else '/'
+LINK = re.compile(r'(?:href|src)="(/static/[^"]+)"')
+HEADERS = {'Accept-Encoding': 'gzip, br'}
+
+
+def load(client):
+    links = sorted(set(LINK.findall(client.get(PAGE).get_data(as_text=True))))
+    cold, cache = 0, {}
+    for url in links:
+        response = client.get(url, headers=HEADERS)
+        cold += len(response.get_data())
+        cache[url] = response
+
+    requests = revalidated = 0
+    for url, response in cache.items():
+        if response.cache_control.max_age and not response.cache_control.no_cache:
+            continue
+        requests += 1
+        again = client.get(url, headers={**HEADERS, 'If-None-Match': response.headers.get('ETag', '')})
+        revalidated += again.status_code == 304
+    return len(links), cold, requests, revalidated
+
+
+def report(label, result):
+    files, cold, requests, revalidated = result
+    print(f'  {label:22} {files:3} files  cold load {cold:8} bytes  '
+          f'repeat load {requests:3} requests ({revalidated} not modified)')
+
+
+def main():
+    app = create_app()
+    client = app.test_client()
+    client.post('/signup', data={'username': 'bench', 'password': 'benchmark', 'confirm_password': 'benchmark'})
+    client.post('/login', data={'username': 'bench', 'password': 'benchmark'})
+
+    output = os.path.join(app.static_folder, BUILD_DIR)
+    existing = os.path.exists(output)
+    shutil.rmtree(output, ignore_errors=True)
+    static_assets.load()
+    print(f'static files linked from {PAGE}')
+    report('plain static files', load(client))
+    build(app.static_folder)
+    static_assets.load()
+    report('fingerprinted, compressed', load(client))
+
+    if not existing:
+        shutil.rmtree(output, ignore_errors=True)
+    os.unlink(DB_PATH)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Compare the tournament's bulk roll with rolling every table on its own.
+
+Seats PLAYERS * TABLES bots in one tournament and times a scheduler tick,
+which rolls for every table with one UPDATE and logs the rolls with one
+INSERT ... SELECT, against rolling each table through run_game_action as
+a host would. Reports the time and the number of SQL statements per roll
+of the whole tournament, and checks that both leave the same dice and
+move log behind.
+
+Usage: python benchmarks/bench_tournament.py [tables]
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+fd, DB_PATH = tempfile.mkstemp(suffix='.db')
+os.close(fd)
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+os.environ['GAME_REAPER_INTERVAL'] = '0'
+os.environ['TOURNAMENT_TICK'] = '0'
+os.environ['BOT_WORKERS'] = '0'
+
+from sqlalchemy import event, func, insert, select, update
+
+from app import create_app, db, rules
+from app.games import run_game_action
+from app.models import Game, GameMove, Tournament, TournamentEntry, User
+from app.tournaments import roll_tournament, seat_tables
+
+TABLES = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+PLAYERS = 4
+RUNS = 5
+DICE = (3, 4)
+
+
+def seed():
+    db.session.execute(insert(User), [{'username': f'Bot {i}', 'password_hash': '!', 'is_bot': True}
+                                      for i in range(TABLES * PLAYERS)])
+    tournament = Tournament(name='bench', created_by=1, status='playing', table_size=PLAYERS,
+                            player_count=TABLES * PLAYERS)
+    db.session.add(tournament)
+    db.session.flush()
+    db.session.execute(insert(TournamentEntry), [{'tournament_id': tournament.id, 'user_id': user_id}
+                                                 for user_id in range(1, TABLES * PLAYERS + 1)])
+    seat_tables(tournament)
+    db.session.commit()
+    return tournament.id
+
+
+def reset(tournament_id):
+    db.session.execute(update(Game).where(Game.tournament_id == tournament_id)
+                       .values(round_phase='rolling', dice1=0, dice2=0))
+    db.session.commit()
+    db.session.remove()
+
+
+def bulk_roll(tournament_id):
+    seen = db.session.scalar(select(Tournament.roll_count).where(Tournament.id == tournament_id))
+    roll_tournament(tournament_id, seen, datetime.utcnow(), DICE)
+
+
+def table_rolls(tournament_id):
+    game_ids = db.session.scalars(select(Game.id).where(Game.tournament_id == tournament_id)).all()
+    db.session.remove()
+    for game_id in game_ids:
+        run_game_action(game_id, lambda game, players: rules.roll(game, players, *DICE))
+        db.session.remove()
+
+
+def measure(step, tournament_id, statements):
+    total = 0
+    counted = 0
+    for _ in range(RUNS):
+        reset(tournament_id)
+        statements.clear()
+        start = time.perf_counter()
+        step(tournament_id)
+        total += time.perf_counter() - start
+        counted += len(statements)
+        db.session.remove()
+    return total / RUNS * 1000, counted / RUNS
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        tournament_id = seed()
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+
+        print(f'{TABLES} tables of {PLAYERS} bots, {RUNS} rolls each')
+        ms, count = measure(bulk_roll, tournament_id, statements)
+        print(f'  one bulk roll        {ms:9.2f} ms  {count:7.0f} statements')
+        bulk_moves = db.session.scalar(select(func.count()).select_from(GameMove).where(GameMove.kind == 'roll'))
+
+        ms, count = measure(table_rolls, tournament_id, statements)
+        print(f'  a roll per table     {ms:9.2f} ms  {count:7.0f} statements')
+        table_moves = db.session.scalar(select(func.count()).select_from(GameMove).where(GameMove.kind == 'roll'))
+
+        assert bulk_moves == table_moves - bulk_moves == TABLES * RUNS
+        dice = db.session.execute(select(Game.dice1, Game.dice2).distinct()
+                                  .where(Game.tournament_id == tournament_id)).all()
+        assert dice == [DICE]
+    os.unlink(DB_PATH)
+
+
+if __name__ == '__main__':
+    main()
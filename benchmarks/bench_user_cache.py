@@ -0,0 +1,92 @@
+"""Poll-endpoint latency with and without the user cache.
+
+Every player of a playing game polls /games/<id>/state, which is served
+from the in-memory game-state store so that loading the logged-in user is
+the only database work left on the request. Reports p50/p99 latency,
+queries per poll and the cache hit ratio for each cache mode.
+
+Usage: python benchmarks/bench_user_cache.py [players] [polls]
+"""
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import event
+
+from app import create_app, db, engine
+from app.models import Game, GamePlayer, User
+from app.users import user_cache
+
+
+def make_app(size, shared):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    os.environ['GAME_STATE_STORE'] = 'memory'
+    os.environ['USER_CACHE_SIZE'] = str(size)
+    os.environ['USER_CACHE_SHARED'] = shared
+    return create_app(), path
+
+
+def setup(app, players):
+    with app.app_context():
+        users = [User(username=f'cache{i}', password_hash='x') for i in range(players)]
+        db.session.add_all(users)
+        db.session.flush()
+        game = Game(name='Cache', max_tiles=10, max_players=12, created_by=users[0].id,
+                    status='playing', round_phase='rolling', current_round=1, player_count=players)
+        game.players.extend(GamePlayer(user_id=u.id, tiles_mask=engine.full_mask(10)) for u in users)
+        db.session.add(game)
+        db.session.commit()
+        return game.id, [u.id for u in users]
+
+
+def client_for(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+    return client
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    polls = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    shared_dir = tempfile.mkdtemp(dir='/dev/shm' if os.path.isdir('/dev/shm') else None)
+
+    for label, size, shared in (('no cache', 0, ''), ('local', 4096, ''), ('shared', 0, shared_dir)):
+        app, path = make_app(size, shared)
+        game_id, user_ids = setup(app, players)
+        clients = [client_for(app, user_id) for user_id in user_ids]
+        queries = []
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', lambda *args: queries.append(1))
+
+        latencies = []
+        for _ in range(polls):
+            for client in clients:
+                start = time.perf_counter()
+                response = client.get(f'/games/{game_id}/state')
+                latencies.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.status_code
+
+        stats = user_cache.stats()
+        print(f'{label:<9} p50={statistics.median(latencies) * 1000:6.3f} ms  '
+              f'p99={percentile(latencies, 0.99) * 1000:6.3f} ms  '
+              f'queries/poll={len(queries) / len(latencies):5.3f}  hit ratio={stats["hit_ratio"]:.3f}')
+        os.unlink(path)
+    shutil.rmtree(shared_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""Server capacity with all-bot games.
+
+Creates GAMES games seated entirely with bots, starts them and lets the
+bot worker pool play them to the end, while a human in a separate game
+keeps polling /state. Reports games and actions per second and the
+human's poll latency, idle and under bot load, for each pool size.
+
+Usage: python benchmarks/load_bots.py [games] [bots per game] [pool sizes, e.g. 1,4]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import func
+
+from app import create_app, db, engine, rules
+from app.bots import bot_runner
+from app.models import Game, GamePlayer, User
+
+
+def make_app(workers):
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + path
+    os.environ['BOT_WORKERS'] = str(workers)
+    return create_app(), path
+
+
+def setup(app, games, bots):
+    with app.app_context():
+        bot_users = [User(username=f'Bot {i + 1}', password_hash='!', is_bot=True) for i in range(bots)]
+        human = User(username='human', password_hash='x')
+        db.session.add_all(bot_users + [human])
+        db.session.flush()
+
+        game_ids = []
+        for g in range(games):
+            game = Game(name=f'Bots {g}', max_tiles=10, max_players=12, created_by=bot_users[0].id,
+                        status='waiting', player_count=bots)
+            game.players.extend(GamePlayer(user_id=u.id) for u in bot_users)
+            rules.start(game, game.players)
+            db.session.add(game)
+            db.session.flush()
+            game_ids.append(game.id)
+
+        probe = Game(name='Probe', max_tiles=10, max_players=12, created_by=human.id, status='playing',
+                     round_phase='rolling', current_round=1, player_count=1)
+        probe.players.append(GamePlayer(user_id=human.id, tiles_mask=engine.full_mask(10)))
+        db.session.add(probe)
+        db.session.commit()
+        return game_ids, probe.id, human.id
+
+
+def poll(app, game_id, user_id, stop, latencies):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(user_id)
+        sess['_fresh'] = True
+    while not stop.is_set():
+        start = time.perf_counter()
+        client.get(f'/games/{game_id}/state')
+        latencies.append(time.perf_counter() - start)
+        time.sleep(0.005)
+
+
+def probe_latency(app, game_id, user_id, duration):
+    stop = threading.Event()
+    latencies = []
+    thread = threading.Thread(target=poll, args=(app, game_id, user_id, stop, latencies))
+    thread.start()
+    time.sleep(duration)
+    stop.set()
+    thread.join()
+    return latencies
+
+
+def describe(latencies):
+    ordered = sorted(latencies)
+    return (f'p50={statistics.median(ordered) * 1000:6.2f} ms  '
+            f'p99={ordered[int(len(ordered) * 0.99)] * 1000:6.2f} ms')
+
+
+def run(games, bots, workers):
+    app, path = make_app(workers)
+    game_ids, probe_id, human_id = setup(app, games, bots)
+    idle = probe_latency(app, probe_id, human_id, 2)
+
+    stop = threading.Event()
+    busy = []
+    prober = threading.Thread(target=poll, args=(app, probe_id, human_id, stop, busy))
+    start = time.perf_counter()
+    for game_id in game_ids:
+        bot_runner.schedule(game_id)
+    prober.start()
+
+    with app.app_context():
+        while True:
+            finished = Game.query.filter(Game.id.in_(game_ids), Game.status == 'finished').count()
+            db.session.remove()
+            if finished == games:
+                break
+            time.sleep(0.1)
+        elapsed = time.perf_counter() - start
+        actions = db.session.query(func.sum(Game.version)).filter(Game.id.in_(game_ids)).scalar()
+    stop.set()
+    prober.join()
+
+    print(f'{workers} bot worker(s): {games / elapsed:7.1f} games/s  {actions / elapsed:7.1f} actions/s  '
+          f'({games} games in {elapsed:.1f} s)')
+    print(f'  human poll idle       {describe(idle)}')
+    print(f'  human poll with bots {describe(busy)}')
+    os.unlink(path)
+
+
+def main():
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    bots = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    pools = [int(n) for n in sys.argv[3].split(',')] if len(sys.argv) > 3 else [1, 4]
+
+    print(f'{games} all-bot games of {bots} bots on {os.cpu_count()} CPU(s)')
+    for workers in pools:
+        run(games, bots, workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+"""Database load test for the engine profile.
+
+Runs WORKERS server processes against one SQLite file, the way gunicorn
+does in run_app.sh, and has every player of GAMES concurrent games poll
+/state and submit their turns until all games finish. Each profile gets a
+fresh database and reports requests per second, turn latency and any
+failed requests ("database is locked" surfaces as HTTP 500).
+
+The "before" profile skips the pragmas and uses SQLAlchemy's default pool
+(5 + 10 overflow); "after" uses the defaults from create_app.
+
+Usage: python benchmarks/load_db.py [games] [players] [workers]
+"""
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+PROFILES = {
+    'before': {'SQLITE_JOURNAL_MODE': '', 'SQLITE_SYNCHRONOUS': '', 'SQLITE_BUSY_TIMEOUT': '',
+               'DATABASE_POOL_SIZE': '5', 'DATABASE_MAX_OVERFLOW': '10'},
+    'after': {},
+}
+ENGINE_SETTINGS = ('SQLITE_JOURNAL_MODE', 'SQLITE_SYNCHRONOUS', 'SQLITE_BUSY_TIMEOUT',
+                   'DATABASE_POOL_SIZE', 'DATABASE_MAX_OVERFLOW')
+
+
+def serve(ports):
+    from werkzeug.serving import make_server
+    from app import create_app
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    logging.getLogger('app').setLevel(logging.CRITICAL)
+    server = make_server('127.0.0.1', 0, create_app(), threaded=True)
+    ports.put(server.server_port)
+    server.serve_forever()
+
+
+def request(port, method, path, cookie=None, body=''):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+    if cookie:
+        headers['Cookie'] = cookie
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    data = response.read()
+    conn.close()
+    return response, data
+
+
+def setup(games, players):
+    from werkzeug.security import generate_password_hash
+    from app import create_app, db, engine
+    from app.models import Game, GamePlayer, User
+
+    app = create_app()
+    password_hash = generate_password_hash('load', method='pbkdf2:sha256:1')
+    with app.app_context():
+        users = [User(username=f'load{i}', password_hash=password_hash) for i in range(players)]
+        db.session.add_all(users)
+        db.session.flush()
+        game_ids = []
+        for g in range(games):
+            game = Game(name=f'Load {g}', max_tiles=12, max_players=12, created_by=users[0].id,
+                        status='waiting', player_count=players)
+            game.players.extend(GamePlayer(user_id=u.id, tiles_mask=engine.full_mask(12)) for u in users)
+            db.session.add(game)
+            db.session.flush()
+            game_ids.append(game.id)
+        db.session.commit()
+        user_ids = [u.id for u in users]
+        db.engine.dispose()
+    return game_ids, user_ids
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failures = {}
+        self.turns = []
+
+    def record(self, status, elapsed=None):
+        with self.lock:
+            self.requests += 1
+            if status >= 500:
+                self.failures[status] = self.failures.get(status, 0) + 1
+            if elapsed is not None:
+                self.turns.append(elapsed)
+
+
+def player(db_path, ports, index, game_id, user_id, cookie, is_host, stats, deadline):
+    from app import engine
+
+    reader = sqlite3.connect(db_path, timeout=60)
+    port = ports[index % len(ports)]
+
+    def call(method, path, body='', turn=False):
+        start = time.perf_counter()
+        response, data = request(port, method, path, cookie, body)
+        stats.record(response.status, time.perf_counter() - start if turn else None)
+        return response, data
+
+    if is_host:
+        call('POST', f'/games/{game_id}/start')
+
+    while time.monotonic() < deadline:
+        response, data = call('GET', f'/games/{game_id}/state')
+        if response.status != 200:
+            time.sleep(0.05)
+            continue
+        state = json.loads(data)
+        if state['status'] == 'finished':
+            break
+        phase = state['phase']
+        if phase == 'rolling' and is_host:
+            call('POST', f'/games/{game_id}/roll', turn=True)
+        elif phase == 'round_end' and is_host:
+            call('POST', f'/games/{game_id}/next-round', turn=True)
+        elif phase == 'flipping':
+            mask, is_out, submitted = reader.execute(
+                'SELECT tiles_mask, is_out, has_submitted FROM game_players '
+                'WHERE game_id = ? AND user_id = ?', (game_id, user_id)).fetchone()
+            if is_out or submitted:
+                time.sleep(0.01)
+                continue
+            flips = engine.legal_flips(mask, state['dice1'] + state['dice2'])
+            if flips:
+                tiles = ','.join(str(t) for t in engine.mask_to_tiles(flips[-1]))
+                call('POST', f'/games/{game_id}/flip', f'tiles={tiles}', turn=True)
+            else:
+                call('POST', f'/games/{game_id}/pass', turn=True)
+        else:
+            time.sleep(0.01)
+    reader.close()
+
+
+def login(port, username):
+    response, _ = request(port, 'POST', '/login', body=f'username={username}&password=load')
+    return response.getheader('Set-Cookie').split(';')[0]
+
+
+def run_profile(name, games, players, workers):
+    fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = 'sqlite:///' + db_path
+    for key in ENGINE_SETTINGS:
+        os.environ.pop(key, None)
+    os.environ.update(PROFILES[name])
+
+    game_ids, user_ids = setup(games, players)
+
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    processes = [context.Process(target=serve, args=(queue,), daemon=True) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    ports = [queue.get() for _ in processes]
+    cookies = [login(ports[0], f'load{i}') for i in range(players)]
+
+    stats = Stats()
+    deadline = time.monotonic() + 300
+    threads = []
+    for g, game_id in enumerate(game_ids):
+        for p, user_id in enumerate(user_ids):
+            threads.append(threading.Thread(target=player, args=(
+                db_path, ports, g * players + p, game_id, user_id, cookies[p], p == 0, stats, deadline)))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    for process in processes:
+        process.terminate()
+        process.join()
+    reader = sqlite3.connect(db_path)
+    finished = reader.execute("SELECT COUNT(*) FROM games WHERE status = 'finished'").fetchone()[0]
+    reader.close()
+    for suffix in ('', '-wal', '-shm', '-journal'):
+        if os.path.exists(db_path + suffix):
+            os.unlink(db_path + suffix)
+
+    turns = sorted(stats.turns) or [0]
+    failures = ', '.join(f'{count} x HTTP {status}' for status, count in stats.failures.items()) or 'none'
+    print(f'{name:<7} {stats.requests / elapsed:8.1f} req/s  {len(turns) / elapsed:7.1f} turns/s  '
+          f'turn p50 {turns[len(turns) // 2] * 1000:7.1f} ms  '
+          f'p99 {turns[int(len(turns) * 0.99)] * 1000:7.1f} ms  '
+          f'{finished}/{games} games finished  failures: {failures}')
+
+
+def main():
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    players = int(sys.argv[2]) if len(sys.argv) > 2 else 6
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    print(f'{games} games x {players} players on {workers} server processes')
+    for name in PROFILES:
+        run_profile(name, games, players, workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+"""Play complete multiplayer games over HTTP and report server capacity.
+
+Each simulated player is an asyncio client with its own session. It signs
+up and logs in, then the host of every table creates a game, the others
+join, and the host starts it. Players follow the game through long polls
+of /games/<id>/state, waiting a random think time before they roll, flip,
+pass or start the next round. They flip the tiles suggested by /hint.
+
+By default a gunicorn server is started on a fresh SQLite database with
+the settings from run_app.sh; pass --url to load an already running
+server instead. Reports games and requests per second, p50/p95/p99
+latency and errors per route, and the optimistic-lock conflicts counted
+on /metrics, and writes everything to a JSON file so runs can be
+compared over time. game_state latency includes the long-poll wait.
+
+Needs aiohttp (pip install -r benchmarks/requirements.txt).
+
+Usage: python benchmarks/load_games.py [--tables 20] [--players 4] [--think 0.5]
+       [--workers 4] [--url http://127.0.0.1:8000] [--output results.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import defaultdict
+from datetime import datetime
+
+import aiohttp
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+PASSWORD = 'load-test'
+CONFLICTS = re.compile(r'^game_action_conflicts_total\{outcome="(\w+)"\} ([\d.]+)$', re.M)
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.games_finished = 0
+
+    async def request(self, session, route, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            async with session.request(method, url, allow_redirects=False, **kwargs) as response:
+                body = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.errors[route] += 1
+            raise
+        self.latencies[route].append((time.perf_counter() - start) * 1000)
+        if response.status >= 500:
+            self.errors[route] += 1
+        return response, body
+
+    def summary(self):
+        routes = {}
+        for route in sorted(set(self.latencies) | set(self.errors)):
+            ordered = sorted(self.latencies[route])
+            routes[route] = {
+                'count': len(ordered),
+                'errors': self.errors[route],
+                'p50_ms': percentile(ordered, 0.50),
+                'p95_ms': percentile(ordered, 0.95),
+                'p99_ms': percentile(ordered, 0.99),
+            }
+        return routes
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 2)
+
+
+async def think(mean):
+    if mean > 0:
+        await asyncio.sleep(random.expovariate(1 / mean))
+
+
+class Player:
+    def __init__(self, base, name, recorder, think_time):
+        self.base = base
+        self.name = name
+        self.recorder = recorder
+        self.think_time = think_time
+        self.session = aiohttp.ClientSession(
+            cookie_jar=aiohttp.CookieJar(unsafe=True),
+            timeout=aiohttp.ClientTimeout(total=120))
+
+    async def call(self, route, method, path, **kwargs):
+        return await self.recorder.request(self.session, route, method, self.base + path, **kwargs)
+
+    async def sign_in(self):
+        form = {'username': self.name, 'password': PASSWORD, 'confirm_password': PASSWORD}
+        await self.call('signup', 'POST', '/signup', data=form)
+        while True:
+            response, _ = await self.call('login', 'POST', '/login', data=form)
+            # the password hasher flashes a busy message and redirects back to /login
+            if response.status == 302 and '/login' not in response.headers['Location']:
+                return
+            await asyncio.sleep(0.5)
+
+    async def create_game(self, players):
+        response, _ = await self.call('create_game', 'POST', '/games/create', data={
+            'name': f'table {self.name}', 'max_tiles': '10', 'max_players': str(players)})
+        return int(re.search(r'/games/(\d+)', response.headers['Location']).group(1))
+
+    async def play(self, game_id, is_host):
+        version = 0
+        while True:
+            response, body = await self.call('game_state', 'GET', f'/games/{game_id}/state',
+                                             params={'since': version})
+            if response.status != 200:
+                return
+            state = json.loads(body)
+            version = state['version']
+
+            if state['status'] != 'playing':
+                return state['status']
+            if state['phase'] == 'rolling' and is_host:
+                await think(self.think_time)
+                await self.call('roll_dice', 'POST', f'/games/{game_id}/roll')
+            elif state['phase'] == 'round_end' and is_host:
+                await think(self.think_time)
+                await self.call('next_round', 'POST', f'/games/{game_id}/next-round')
+            elif state['phase'] == 'flipping':
+                response, body = await self.call('game_hint', 'GET', f'/games/{game_id}/hint')
+                if response.status != 200:
+                    continue
+                hint = json.loads(body)
+                await think(self.think_time)
+                if hint['pass']:
+                    await self.call('pass_turn', 'POST', f'/games/{game_id}/pass')
+                else:
+                    await self.call('flip_tiles', 'POST', f'/games/{game_id}/flip',
+                                    data={'tiles': ','.join(map(str, hint['tiles']))})
+
+    async def close(self):
+        await self.session.close()
+
+
+async def run_table(base, table, args, recorder, run_id):
+    await asyncio.sleep(random.uniform(0, args.ramp))
+    players = [Player(base, f'load{run_id}-{table}-{seat}', recorder, args.think)
+               for seat in range(args.players)]
+    try:
+        await asyncio.gather(*(p.sign_in() for p in players))
+        host, guests = players[0], players[1:]
+        game_id = await host.create_game(args.players)
+        for guest in guests:
+            await think(args.think)
+            await guest.call('join_game', 'POST', f'/games/{game_id}/join')
+        await host.call('start_game', 'POST', f'/games/{game_id}/start')
+
+        results = await asyncio.gather(*(p.play(game_id, p is host) for p in players))
+        if results[0] == 'finished':
+            recorder.games_finished += 1
+    finally:
+        await asyncio.gather(*(p.close() for p in players))
+
+
+def read_conflicts(base):
+    try:
+        with urllib.request.urlopen(base + '/metrics', timeout=10) as response:
+            text = response.read().decode()
+    except OSError:
+        return {}
+    return {outcome: float(value) for outcome, value in CONFLICTS.findall(text)}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, workdir):
+    port = free_port()
+    env = dict(os.environ,
+               DATABASE_URL='sqlite:///' + os.path.join(workdir, 'load.db'),
+               METRICS_DIR=os.path.join(workdir, 'metrics'),
+               GAME_STATE_STORE=os.path.join(workdir, 'state'),
+               BOT_WORKERS='0',
+               GAME_REAPER_INTERVAL='0')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-w', str(args.workers), '-k', 'gthread',
+         '--threads', str(args.threads), '-b', f'127.0.0.1:{port}', 'wsgi:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(base + '/login', timeout=1)
+            return server, base
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise SystemExit('gunicorn did not start')
+
+
+async def run(base, args):
+    recorder = Recorder()
+    run_id = f'{int(time.time())}{random.randrange(1000)}'
+    before = read_conflicts(base)
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(
+        *(run_table(base, table, args, recorder, run_id) for table in range(args.tables)),
+        return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    after = read_conflicts(base)
+
+    routes = recorder.summary()
+    requests = sum(r['count'] for r in routes.values())
+    errors = sum(r['errors'] for r in routes.values())
+    actions = sum(routes.get(route, {}).get('count', 0)
+                  for route in ('roll_dice', 'flip_tiles', 'pass_turn', 'next_round'))
+    retried = after.get('retried', 0) - before.get('retried', 0)
+    gave_up = after.get('gave_up', 0) - before.get('gave_up', 0)
+    return {
+        'started_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'config': {'tables': args.tables, 'players': args.players, 'think': args.think,
+                   'ramp': args.ramp, 'workers': args.workers, 'threads': args.threads,
+                   'url': args.url},
+        'elapsed_s': round(elapsed, 2),
+        'games_finished': recorder.games_finished,
+        'tables_failed': sum(isinstance(o, BaseException) for o in outcomes),
+        'games_per_s': round(recorder.games_finished / elapsed, 3),
+        'requests_per_s': round(requests / elapsed, 1),
+        'actions_per_s': round(actions / elapsed, 1),
+        'errors': errors,
+        'error_rate': round(errors / requests, 5) if requests else None,
+        'lock_retries': retried,
+        'lock_failures': gave_up,
+        'lock_retry_rate': round(retried / actions, 5) if actions else None,
+        'routes': routes,
+    }
+
+
+def report(result):
+    print(f'{result["games_finished"]}/{result["config"]["tables"]} games of '
+          f'{result["config"]["players"]} players in {result["elapsed_s"]} s, '
+          f'think {result["config"]["think"]} s')
+    print(f'  {result["games_per_s"]} games/s  {result["requests_per_s"]} requests/s  '
+          f'{result["actions_per_s"]} actions/s')
+    print(f'  errors {result["errors"]} (rate {result["error_rate"]})  '
+          f'lock retries {result["lock_retries"]:.0f} (rate {result["lock_retry_rate"]})  '
+          f'lock failures {result["lock_failures"]:.0f}')
+    print(f'  {"route":<12} {"count":>7} {"errors":>6} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+    for route, stats in result['routes'].items():
+        print(f'  {route:<12} {stats["count"]:>7} {stats["errors"]:>6} {stats["p50_ms"]!s:>8} '
+              f'{stats["p95_ms"]!s:>8} {stats["p99_ms"]!s:>8}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python benchmarks/load_games.py', description=__doc__.split('\n')[0])
+    parser.add_argument('--tables', type=int, default=20, help='concurrent games')
+    parser.add_argument('--players', type=int, default=4, help='players per game')
+    parser.add_argument('--think', type=float, default=0.5, help='mean think time in seconds')
+    parser.add_argument('--ramp', type=float, default=5, help='seconds over which tables start')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers to start')
+    parser.add_argument('--threads', type=int, default=32, help='threads per gunicorn worker')
+    parser.add_argument('--url', help='load this server instead of starting one')
+    parser.add_argument('--output', help='JSON results file (default benchmarks/results/load_games-<time>.json)')
+    args = parser.parse_args(argv)
+
+    workdir = server = None
+    base = args.url.rstrip('/') if args.url else None
+    if not base:
+        workdir = tempfile.mkdtemp()
+        server, base = start_server(args, workdir)
+    try:
+        result = asyncio.run(run(base, args))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+            shutil.rmtree(workdir)
+
+    report(result)
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'results',
+        f'load_games-{datetime.utcnow():%Y%m%d-%H%M%S}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f'results written to {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""Concurrency stress test for turn resolution.
+
+Every player of a 12-seat game submits a flip or pass at the same instant
+through a threaded local server, round after round, and the final scores
+are checked against the tiles each player had left. A submission the
+server turned away (it redirects with an error flash) is counted as a
+rejection and submitted again on the next pass.
+
+Usage: python benchmarks/stress_turns.py [players] [games]
+"""
+import http.client
+import logging
+import os
+import sys
+import tempfile
+import threading
+from collections import Counter
+from http.cookies import SimpleCookie
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+fd, DB_PATH = tempfile.mkstemp(suffix='.db')
+os.close(fd)
+os.environ['DATABASE_URL'] = 'sqlite:///' + DB_PATH
+
+from werkzeug.security import generate_password_hash
+from werkzeug.serving import make_server
+
+from app import create_app, db, engine
+from app.models import Game, GamePlayer, User
+
+
+def post(port, cookie, path, body=''):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    conn.request('POST', path, body=body, headers={
+        'Cookie': cookie, 'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response
+
+
+def error_flashes(app, response):
+    # Game actions redirect whether they worked or not; a rejection leaves an error flash in the session.
+    morsel = SimpleCookie(response.getheader('Set-Cookie', '')).get(app.config['SESSION_COOKIE_NAME'])
+    if morsel is None:
+        return []
+    session = app.session_interface.get_signing_serializer(app).loads(morsel.value)
+    return [message for category, message in session.get('_flashes', []) if category == 'error']
+
+
+def login(port, username):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    conn.request('POST', '/login', body=f'username={username}&password=stress',
+                 headers={'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    conn.close()
+    return response.getheader('Set-Cookie').split(';')[0]
+
+
+def setup(app, players, games):
+    password_hash = generate_password_hash('stress', method='pbkdf2:sha256:1')
+    with app.app_context():
+        users = [User(username=f'stress{i}', password_hash=password_hash) for i in range(players)]
+        db.session.add_all(users)
+        db.session.flush()
+        game_ids = []
+        for g in range(games):
+            game = Game(name=f'Stress {g}', max_tiles=12, max_players=12,
+                        created_by=users[0].id, status='waiting')
+            db.session.add(game)
+            db.session.flush()
+            db.session.add_all(GamePlayer(game_id=game.id, user_id=u.id, tiles_mask=engine.full_mask(12))
+                               for u in users)
+            game_ids.append(game.id)
+        db.session.commit()
+        return game_ids, [u.username for u in users]
+
+
+def snapshot(app, game_id):
+    with app.app_context():
+        game = db.session.get(Game, game_id)
+        players = GamePlayer.query.filter_by(game_id=game_id).order_by(GamePlayer.id).all()
+        result = (game.status, game.round_phase, game.get_dice_total(),
+                  [(p.user_id, p.tiles_mask, p.is_out, p.has_submitted, p.score, p.round_score)
+                   for p in players])
+        db.session.remove()
+        return result
+
+
+def play(app, port, game_id, cookies, errors, rejections):
+    host = cookies[0]
+    post(port, host, f'/games/{game_id}/start')
+    expected = {}
+    barrier = threading.Barrier(len(cookies))
+
+    while True:
+        status, phase, total, players = snapshot(app, game_id)
+        if status == 'finished':
+            break
+        if phase == 'rolling':
+            post(port, host, f'/games/{game_id}/roll')
+            continue
+        if phase == 'round_end':
+            for user_id, mask, is_out, _, score, round_score in players:
+                previous = expected.get(user_id, 0)
+                if round_score != (0 if mask == 0 else engine.mask_sum(mask)):
+                    errors.append(f'game {game_id}: player {user_id} round score {round_score} '
+                                  f'does not match tiles {engine.mask_to_tiles(mask)}')
+                if score != previous + round_score:
+                    errors.append(f'game {game_id}: player {user_id} score {score} != '
+                                  f'{previous} + {round_score}')
+                expected[user_id] = score
+            post(port, host, f'/games/{game_id}/next-round')
+            continue
+
+        def submit(cookie, player):
+            _, mask, is_out, submitted, _, _ = player
+            barrier.wait()
+            if is_out or submitted:
+                return
+            flips = engine.legal_flips(mask, total)
+            if flips:
+                tiles = ','.join(str(t) for t in engine.mask_to_tiles(flips[-1]))
+                response = post(port, cookie, f'/games/{game_id}/flip', f'tiles={tiles}')
+            else:
+                response = post(port, cookie, f'/games/{game_id}/pass')
+            if response.status != 302:
+                errors.append(f'game {game_id}: submission returned HTTP {response.status}')
+                return
+            rejections.update(error_flashes(app, response))
+            rejections['submissions'] += 1
+
+        threads = [threading.Thread(target=submit, args=(cookie, player))
+                   for cookie, player in zip(cookies, players)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    status, phase, _, players = snapshot(app, game_id)
+    for user_id, _, _, _, score, round_score in players:
+        if score != expected.get(user_id, 0) + round_score:
+            errors.append(f'game {game_id}: final score {score} for player {user_id} is inconsistent')
+
+
+def main():
+    players = int(sys.argv[1]) if len(sys.argv) > 1 else 12
+    games = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    app = create_app()
+    game_ids, usernames = setup(app, players, games)
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+    cookies = [login(port, username) for username in usernames]
+
+    errors = []
+    rejections = Counter()
+    threads = [threading.Thread(target=play, args=(app, port, game_id, cookies, errors, rejections))
+               for game_id in game_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        rounds = sum(db.session.get(Game, game_id).current_round for game_id in game_ids)
+    server.shutdown()
+    os.unlink(DB_PATH)
+
+    submissions = rejections.pop('submissions', 0)
+    print(f'{games} games x {players} players, {rounds} rounds played')
+    print(f'{submissions} submissions, {submissions - sum(rejections.values())} accepted, '
+          f'{sum(rejections.values())} rejected')
+    for message, count in rejections.most_common():
+        print(f'  {count:6} {message}')
+    if errors:
+        print('\n'.join(errors))
+        sys.exit(1)
+    print('all scores consistent')
+
+
+if __name__ == '__main__':
+    main()
@@ -49,6 +49,11 @@ if [ $? -ne 0 ]; then
     exit 1
 fi
 
+# Build the optimal-move table used for hints
+echo ""
+echo "Building hint table..."
+python -m app.solver instance/solver.bin
+
 # Create .env file if it doesn't exist
 if [ ! -f ".env" ]; then
     echo ""
@@ -19,5 +19,19 @@ if [ -f ".env" ]; then
     export $(grep -v '^#' .env | xargs)
 fi
 
+# Start request metrics from zero for this set of workers
+if [ -n "$METRICS_DIR" ]; then
+    rm -f "$METRICS_DIR"/metrics-*.json
+fi
+
+# Serve game state and event streams from the ASGI sidecar
+if [ -n "$ASGI_PORT" ]; then
+    uvicorn asgi:app --host 127.0.0.1 --port "$ASGI_PORT" --no-access-log &
+    trap 'kill $!' EXIT
+fi
+
+# Fingerprint and precompress the static files
+flask --app app build-assets > /dev/null
+
 # Run the Flask application with gunicorn
-gunicorn -w 4 -b 0.0.0.0:8000 wsgi:app
+gunicorn -w 4 -k gthread --threads 32 -b 0.0.0.0:8000 wsgi:app
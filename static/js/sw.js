@@ -1,17 +1,13 @@
-const CACHE_NAME = 'shut-the-box-v6';
-const urlsToCache = [
-    '/static/css/style.css',
-    '/static/manifest.json',
-    '/static/icons/icon-192.png',
-    '/static/icons/icon-512.png'
-];
+// ASSET_VERSION and PRECACHE are prepended by the /sw.js route.
+const ASSET_CACHE = 'shut-the-box-assets-' + ASSET_VERSION;
+const PAGE_CACHE = 'shut-the-box-pages-' + ASSET_VERSION;
+const LOBBY_PAGES = ['/', '/games', '/tournaments', '/leaderboard'];
 
 self.addEventListener('install', function(event) {
     event.waitUntil(
-        caches.open(CACHE_NAME)
+        caches.open(ASSET_CACHE)
             .then(function(cache) {
-                console.log('Opened cache');
-                return cache.addAll(urlsToCache);
+                return cache.addAll(PRECACHE);
             })
             .catch(function(err) {
                 console.log('Cache install failed:', err);
@@ -20,38 +16,94 @@ self.addEventListener('install', function(event) {
     self.skipWaiting();
 });
 
+function cacheable(response) {
+    return response && response.status === 200 && response.type === 'basic' && !response.redirected &&
+        !/no-store/.test(response.headers.get('Cache-Control') || '');
+}
+
+// Versioned assets never change under the same URL, so a cached copy is always right.
+function cacheFirst(request) {
+    return caches.open(ASSET_CACHE).then(function(cache) {
+        return cache.match(request).then(function(cached) {
+            return cached || fetch(request).then(function(response) {
+                if (cacheable(response)) {
+                    cache.put(request, response.clone());
+                }
+                return response;
+            });
+        });
+    });
+}
+
+function networkFirst(request) {
+    return fetch(request)
+        .then(function(response) {
+            if (cacheable(response)) {
+                var copy = response.clone();
+                caches.open(ASSET_CACHE).then(function(cache) {
+                    cache.put(request, copy);
+                });
+            }
+            return response;
+        })
+        .catch(function() {
+            return caches.match(request);
+        });
+}
+
+// Lobby pages show the last copy straight away while a fresh one is fetched for next time.
+function staleWhileRevalidate(event) {
+    var request = event.request;
+    return caches.open(PAGE_CACHE).then(function(cache) {
+        return cache.match(request).then(function(cached) {
+            var fresh = fetch(request).then(function(response) {
+                if (cacheable(response)) {
+                    return cache.put(request, response.clone()).then(function() {
+                        return response;
+                    });
+                }
+                return cache.delete(request).then(function() {
+                    return response;
+                });
+            });
+            if (cached) {
+                event.waitUntil(fresh.catch(function() {}));
+                return cached;
+            }
+            return fresh;
+        });
+    });
+}
+
 self.addEventListener('fetch', function(event) {
     if (event.request.method !== 'GET') {
         return;
     }
-    
+
+    var url = new URL(event.request.url);
+    if (url.origin !== self.location.origin) {
+        return;
+    }
+
     if (event.request.mode === 'navigate') {
-        event.respondWith(fetch(event.request));
+        if (LOBBY_PAGES.indexOf(url.pathname) !== -1) {
+            event.respondWith(staleWhileRevalidate(event));
+        }
         return;
     }
-    
-    event.respondWith(
-        fetch(event.request)
-            .then(function(response) {
-                if (!response || response.status !== 200 || response.type !== 'basic') {
-                    return response;
-                }
-                
-                var url = new URL(event.request.url);
-                if (url.pathname.startsWith('/static/')) {
-                    var responseToCache = response.clone();
-                    caches.open(CACHE_NAME)
-                        .then(function(cache) {
-                            cache.put(event.request, responseToCache);
-                        });
-                }
-                
-                return response;
-            })
-            .catch(function() {
-                return caches.match(event.request);
-            })
-    );
+
+    if (url.pathname.startsWith('/static/dist/')) {
+        event.respondWith(cacheFirst(event.request));
+    } else if (url.pathname.startsWith('/static/')) {
+        event.respondWith(networkFirst(event.request));
+    }
+});
+
+// Pages belong to whoever was signed in; drop them when nobody is.
+self.addEventListener('message', function(event) {
+    if (event.data === 'clear-pages') {
+        event.waitUntil(caches.delete(PAGE_CACHE));
+    }
 });
 
 self.addEventListener('activate', function(event) {
@@ -59,7 +111,7 @@ self.addEventListener('activate', function(event) {
         caches.keys().then(function(cacheNames) {
             return Promise.all(
                 cacheNames.filter(function(cacheName) {
-                    return cacheName !== CACHE_NAME;
+                    return cacheName !== ASSET_CACHE && cacheName !== PAGE_CACHE;
                 }).map(function(cacheName) {
                     return caches.delete(cacheName);
                 })